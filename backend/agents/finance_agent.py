@@ -2,6 +2,7 @@
 from crewai import Agent
 from backend.config import llm
 from backend.utils.memory_manager import get_agent_memory
+from backend.utils.llm_metrics import AgentMetricsHandler
 
 finance_agent = Agent(
     role="Financial Advisor",
@@ -16,3 +17,4 @@ finance_agent = Agent(
     memory=True,
 )
 finance_agent.memory = get_agent_memory("finance")
+finance_agent.callbacks = [AgentMetricsHandler("finance")]
@@ -1,6 +1,7 @@
 from crewai import Agent
 from backend.config import llm
 from backend.utils.memory_manager import get_agent_memory
+from backend.utils.llm_metrics import AgentMetricsHandler
 
 health_agent = Agent(
     role="Health Coach",
@@ -16,3 +17,4 @@ health_agent = Agent(
 )
 
 health_agent.memory = get_agent_memory("health")
+health_agent.callbacks = [AgentMetricsHandler("health")]
@@ -2,6 +2,7 @@
 from crewai import Agent
 from backend.config import llm
 from backend.utils.memory_manager import get_agent_memory
+from backend.utils.llm_metrics import AgentMetricsHandler
 
 learning_agent = Agent(
     role="Learning Mentor",
@@ -18,4 +19,5 @@ learning_agent = Agent(
 )
 
 learning_agent.memory = get_agent_memory("learning")
+learning_agent.callbacks = [AgentMetricsHandler("learning")]
 
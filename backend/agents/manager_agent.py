@@ -2,6 +2,7 @@
 from crewai import Agent
 from backend.config import llm
 from backend.utils.memory_manager import get_agent_memory
+from backend.utils.llm_metrics import AgentMetricsHandler
 
 manager_agent = Agent(
     role="Life Coach Manager",
@@ -17,3 +18,4 @@ manager_agent = Agent(
     
 )
 manager_agent.memory = get_agent_memory("manager")
+manager_agent.callbacks = [AgentMetricsHandler("manager")]
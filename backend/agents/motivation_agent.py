@@ -3,6 +3,7 @@
 from crewai import Agent
 from backend.config import llm
 from backend.utils.memory_manager import get_agent_memory
+from backend.utils.llm_metrics import AgentMetricsHandler
 
 motivation_agent = Agent(
     role="Motivational Coach",
@@ -18,3 +19,4 @@ motivation_agent = Agent(
 
 )
 motivation_agent.memory = get_agent_memory("motivation")
+motivation_agent.callbacks = [AgentMetricsHandler("motivation")]
@@ -1,4 +1,139 @@
-from langchain_community.chat_models import ChatOllama
-from langchain.memory import ConversationBufferMemory
+import os
+import threading
 
-llm = ChatOllama(model="llama3")
+LLM_MODEL = os.getenv("LLM_MODEL", "llama3")
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+# Ollama servers to spread calls over, comma-separated; defaults to OLLAMA_BASE_URL alone
+OLLAMA_HOSTS = [h.strip() for h in os.getenv("OLLAMA_HOSTS", OLLAMA_BASE_URL).split(",") if h.strip()]
+OLLAMA_POOL_CONNECTIONS = int(os.getenv("OLLAMA_POOL_CONNECTIONS", "16"))
+OLLAMA_MAX_FAILURES = int(os.getenv("OLLAMA_MAX_FAILURES", "3"))
+OLLAMA_EJECT_SECONDS = float(os.getenv("OLLAMA_EJECT_SECONDS", "30"))
+OLLAMA_HEALTH_INTERVAL_SECONDS = float(os.getenv("OLLAMA_HEALTH_INTERVAL_SECONDS", "10"))
+# Preload the model into Ollama in the background at startup so the first request is not cold
+LLM_WARMUP = os.getenv("LLM_WARMUP", "true").lower() == "true"
+LLM_KEEP_ALIVE = os.getenv("LLM_KEEP_ALIVE", "30m")
+
+_llm = None
+_llm_lock = threading.Lock()
+
+def get_llm():
+    """
+    The shared ChatOllama client, built on first use so importing config stays cheap.
+    Calls are spread over OLLAMA_HOSTS by an OllamaPool with keep-alive sessions.
+    """
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                from backend.utils.llm_metrics import LLMMetricsHandler
+                from backend.utils.ollama_pool import OllamaPool, PooledChatOllama
+                pool = OllamaPool(
+                    OLLAMA_HOSTS,
+                    pool_connections=OLLAMA_POOL_CONNECTIONS,
+                    max_failures=OLLAMA_MAX_FAILURES,
+                    eject_seconds=OLLAMA_EJECT_SECONDS,
+                    health_interval=OLLAMA_HEALTH_INTERVAL_SECONDS
+                )
+                _llm = PooledChatOllama(
+                    model=LLM_MODEL,
+                    base_url=OLLAMA_HOSTS[0],
+                    pool=pool,
+                    callbacks=[LLMMetricsHandler()]
+                )
+    return _llm
+
+def __getattr__(name):
+    # Keeps `from backend.config import llm` working without building the client at import
+    if name == "llm":
+        return get_llm()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Background plan jobs: number of concurrent crew runs and how many may wait, per worker process
+# (job status and results are kept in the storage backend, so any worker can answer a poll)
+PLAN_JOB_WORKERS = int(os.getenv("PLAN_JOB_WORKERS", "2"))
+PLAN_JOB_QUEUE_DEPTH = int(os.getenv("PLAN_JOB_QUEUE_DEPTH", "20"))
+
+# LLM response cache: in-memory LRU in front of a JSON-file tier on disk
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", "backend/data/llm_cache")
+
+# Plan/chat storage engine: "file" (JSON files per plan and per user) or "sqlite"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "file")
+PLAN_DIR = os.getenv("PLAN_DIR", "saved_plans")
+CHAT_DIR = os.getenv("CHAT_DIR", "backend/data/chat_logs")
+SQLITE_PATH = os.getenv("SQLITE_PATH", "backend/data/lifecoach.db")
+# Chat appends are committed together once this many are pending or the interval elapses
+SQLITE_BATCH_SIZE = int(os.getenv("SQLITE_BATCH_SIZE", "64"))
+SQLITE_BATCH_INTERVAL_MS = int(os.getenv("SQLITE_BATCH_INTERVAL_MS", "50"))
+
+# Agent memory: "window" keeps the last MEMORY_WINDOW_TURNS exchanges,
+# "summary" folds older exchanges into a running LLM summary
+MEMORY_POLICY = os.getenv("MEMORY_POLICY", "window")
+MEMORY_WINDOW_TURNS = int(os.getenv("MEMORY_WINDOW_TURNS", "5"))
+MEMORY_SUMMARY_MAX_TOKENS = int(os.getenv("MEMORY_SUMMARY_MAX_TOKENS", "600"))
+# Users whose memories stay in RAM; the least recently used are spilled to disk
+MEMORY_MAX_RESIDENT_USERS = int(os.getenv("MEMORY_MAX_RESIDENT_USERS", "256"))
+MEMORY_SPILL_DIR = os.getenv("MEMORY_SPILL_DIR", "backend/data/agent_memory")
+
+# Intent routing: a domain needs at least this score to answer or be auto-routed to
+ROUTER_MIN_SCORE = float(os.getenv("ROUTER_MIN_SCORE", "0.3"))
+
+# Long-term chat retrieval: past turns injected into a chat prompt and where the per-user indexes live
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "3"))
+RETRIEVAL_MIN_SCORE = float(os.getenv("RETRIEVAL_MIN_SCORE", "0.2"))
+RETRIEVAL_INDEX_DIR = os.getenv("RETRIEVAL_INDEX_DIR", "backend/data/chat_index")
+RETRIEVAL_MAX_RESIDENT_USERS = int(os.getenv("RETRIEVAL_MAX_RESIDENT_USERS", "256"))
+
+# Full-text (BM25) search over saved plans and chat: users whose index stays in memory
+SEARCH_MAX_RESIDENT_USERS = int(os.getenv("SEARCH_MAX_RESIDENT_USERS", "256"))
+
+# Log level for the backend's loggers; every line carries the request's trace id
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# V2 manager: estimated-token budget for the expert notes it is given (0 = no limit)
+V2_CONTEXT_TOKEN_BUDGET = int(os.getenv("V2_CONTEXT_TOKEN_BUDGET", "600"))
+# Output caps (Ollama num_predict) per task, comma-separated "stage/agent=N", "stage=N" or "agent=N",
+# e.g. "v2-experts=256,finance=80"; the most specific match wins, unmatched tasks keep the model default
+TASK_NUM_PREDICT = {
+    key.strip(): int(value)
+    for key, value in (
+        item.split("=", 1) for item in os.getenv("TASK_NUM_PREDICT", "v2-experts=256,finance=80").split(",") if "=" in item
+    )
+}
+
+# Finance section: budget rule preset (50/30/20, 60/20/20, 70/20/10 or 80/20), computed in code;
+# with FINANCE_LLM_TIP the finance agent adds a one-line tip, otherwise a fixed tip is used
+FINANCE_RULE = os.getenv("FINANCE_RULE", "50/30/20")
+FINANCE_LLM_TIP = os.getenv("FINANCE_LLM_TIP", "false").lower() == "true"
+
+# Fair-share scheduler in front of the LLM: total slots, how many batch (plan) and background
+# (pre-generation) work may hold,
+# per-user limits, estimated-token budget per user per minute, and how long work may wait.
+# The scheduler lives in each worker process: with several uvicorn workers every slot count and
+# per-user limit applies per worker, so divide them by the worker count (or run a single worker)
+SCHEDULER_SLOTS = int(os.getenv("SCHEDULER_SLOTS", "3"))
+SCHEDULER_BATCH_SLOTS = int(os.getenv("SCHEDULER_BATCH_SLOTS", "2"))
+SCHEDULER_BACKGROUND_SLOTS = int(os.getenv("SCHEDULER_BACKGROUND_SLOTS", "1"))
+SCHEDULER_MAX_QUEUED = int(os.getenv("SCHEDULER_MAX_QUEUED", "32"))
+SCHEDULER_MAX_RUNNING_PER_USER = int(os.getenv("SCHEDULER_MAX_RUNNING_PER_USER", "1"))
+SCHEDULER_MAX_QUEUED_PER_USER = int(os.getenv("SCHEDULER_MAX_QUEUED_PER_USER", "4"))
+SCHEDULER_USER_TOKENS_PER_MINUTE = float(os.getenv("SCHEDULER_USER_TOKENS_PER_MINUTE", "30000"))
+SCHEDULER_MAX_WAIT_SECONDS = float(os.getenv("SCHEDULER_MAX_WAIT_SECONDS", "120"))
+
+# Workflow task graphs: how many independent steps of one plan may run at once (a plan asks the
+# scheduler for that many slots, capped at its class's share), and how many recent run traces
+# /workflow-traces keeps
+DAG_MAX_WORKERS = int(os.getenv("DAG_MAX_WORKERS", "3"))
+DAG_TRACE_HISTORY = int(os.getenv("DAG_TRACE_HISTORY", "50"))
+
+# Next-day pre-generation for users active in the last PREGEN_ACTIVE_DAYS: the off-peak window
+# (local time, may wrap midnight), how often to look for work, concurrent generations, the most
+# users per pass, and where the list of active users is kept
+PREGEN_ENABLED = os.getenv("PREGEN_ENABLED", "true").lower() == "true"
+PREGEN_WINDOW = os.getenv("PREGEN_WINDOW", "01:00-06:00")
+PREGEN_INTERVAL_SECONDS = float(os.getenv("PREGEN_INTERVAL_SECONDS", "300"))
+PREGEN_CONCURRENCY = int(os.getenv("PREGEN_CONCURRENCY", "1"))
+PREGEN_MAX_PER_RUN = int(os.getenv("PREGEN_MAX_PER_RUN", "50"))
+PREGEN_ACTIVE_DAYS = int(os.getenv("PREGEN_ACTIVE_DAYS", "7"))
+PREGEN_STATE_PATH = os.getenv("PREGEN_STATE_PATH", "backend/data/pregen_active.json")
@@ -1,21 +1,133 @@
 
-from fastapi import FastAPI, Request, HTTPException
-from pydantic import BaseModel
+import time
+IMPORT_STARTED = time.perf_counter()
+
+import json
+import logging
+from datetime import date
+from fastapi import FastAPI, Request, Response, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from pydantic import BaseModel, field_validator
 from typing import Optional, Dict
-from backend.workflows.lifecoach_workflow import generate_full_lifecoach_plan as v1_plan
-from backend.workflows.lifecoach_workflow_v2 import generate_full_lifecoach_plan as v2_plan
-from backend.agents.health_agent import health_agent
-from backend.agents.finance_agent import finance_agent
-from backend.agents.learning_agent import learning_agent
-from backend.agents.motivation_agent import motivation_agent
+from backend import registry
+from backend import config
+from backend.config import (
+    PLAN_JOB_WORKERS, PLAN_JOB_QUEUE_DEPTH, ROUTER_MIN_SCORE, RETRIEVAL_TOP_K, LLM_WARMUP, LOG_LEVEL
+)
+from backend.utils import metrics
+from backend.utils.llm_cache import llm_cache, agent_cache_key
+from backend.utils.helpers import estimate_tokens, format_history, format_turns
+from backend.utils.job_queue import JobQueue, QueueFullError
+from backend.utils.singleflight import SingleFlight, make_flight_key
+from backend.utils.scheduler import FairScheduler, AdmissionError, INTERACTIVE, BATCH
+from backend.utils.pregen import NextDayPregenerator
+from backend.workflows.dag import get_recent_traces
 from backend.utils.chat_storage import save_chat, load_chat, clear_chat
+from backend.utils.search_index import search_index
+from backend.utils.storage_backend import get_storage
 from backend.utils.plan_storage import (
     save_plan, load_plan, list_saved_plans,
-    delete_plan, update_plan
+    delete_plan, update_plan, patch_plan,
+    modify_plan_meta, load_plan_meta, make_etag, etag_matches, PlanConflictError, PlanNotPatchableError
 )
-from crewai import Task
+
+metrics.configure_logging(LOG_LEVEL)
+logger = logging.getLogger("backend.main")
 
 app = FastAPI()
+plan_jobs = JobQueue(max_workers=PLAN_JOB_WORKERS, max_queued=PLAN_JOB_QUEUE_DEPTH, store=get_storage)
+# Identical concurrent plan/chat requests share one LLM run
+inflight = SingleFlight()
+# Every LLM run waits here for a fair share of the model
+scheduler = FairScheduler(
+    slots=config.SCHEDULER_SLOTS,
+    batch_slots=config.SCHEDULER_BATCH_SLOTS,
+    background_slots=config.SCHEDULER_BACKGROUND_SLOTS,
+    max_queued=config.SCHEDULER_MAX_QUEUED,
+    max_running_per_user=config.SCHEDULER_MAX_RUNNING_PER_USER,
+    max_queued_per_user=config.SCHEDULER_MAX_QUEUED_PER_USER,
+    tokens_per_minute=config.SCHEDULER_USER_TOKENS_PER_MINUTE,
+    max_wait=config.SCHEDULER_MAX_WAIT_SECONDS
+)
+
+# Time to import this module; agents, LLM client and workflows are built later by the registry
+IMPORT_SECONDS = round(time.perf_counter() - IMPORT_STARTED, 4)
+
+@app.on_event("startup")
+def start_background_warm_up():
+    if LLM_WARMUP:
+        registry.start_warm_up()
+    if config.PREGEN_ENABLED:
+        pregenerator.start()
+
+@app.on_event("shutdown")
+def stop_pregeneration():
+    pregenerator.stop()
+
+@app.on_event("shutdown")
+def flush_storage():
+    # Runs after the pre-generator has stopped; the SQLite engine commits its buffered chat turns
+    get_storage().close()
+
+@app.middleware("http")
+async def trace_and_time_requests(request: Request, call_next):
+    trace_id = metrics.new_trace_id(request.headers.get("X-Request-ID"))
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        # Label by route template, not raw path, so user ids don't explode the label set
+        route = request.scope.get("route")
+        elapsed = time.perf_counter() - start
+        metrics.http_request_seconds.observe(
+            elapsed,
+            method=request.method,
+            route=route.path if route else "unmatched",
+            status=status
+        )
+        logger.info("%s %s -> %s in %.3fs", request.method, request.url.path, status, elapsed)
+    response.headers["X-Request-ID"] = trace_id
+    return response
+
+@app.exception_handler(AdmissionError)
+def admission_rejected(request: Request, error: AdmissionError):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": f"❌ Too many requests ({error.reason}). Try again in {error.retry_after}s."},
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+#  Prometheus metrics: request, crew, task, agent, LLM and storage latency plus token counts
+@app.get("/metrics")
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+#  Liveness: the process is up and serving
+@app.get("/healthz")
+def healthz():
+    return {
+        "status": "ok",
+        "import_seconds": IMPORT_SECONDS,
+        "build_seconds": registry.build_seconds
+    }
+
+#  Readiness: the model has been preloaded into Ollama
+@app.get("/readyz")
+def readyz():
+    if not LLM_WARMUP:
+        return {"status": "ready", **registry.readiness}
+    if registry.readiness["llm_warm"]:
+        return {"status": "ready", **registry.readiness}
+    return JSONResponse(status_code=503, content={"status": "not ready", **registry.readiness})
+
+def check_income(income: Optional[str]) -> Optional[str]:
+    # Imported here so numpy stays out of this module's import time
+    from backend.utils.finance import parse_income
+    if income is not None:
+        parse_income(income)
+    return income
 
 # Input models
 class LifePlanInput(BaseModel):
@@ -25,115 +137,636 @@ class LifePlanInput(BaseModel):
     duration: int = 1
     preferences: Optional[Dict[str, str]] = None
 
+    _check_income = field_validator("income")(check_income)
+
+class RegeneratePlanInput(BaseModel):
+    goal: Optional[str] = None
+    income: Optional[str] = None
+    learning_goal: Optional[str] = None
+    duration: Optional[int] = None
+    preferences: Optional[Dict[str, str]] = None
+
+    _check_income = field_validator("income")(check_income)
+
 class AgentChatInput(BaseModel):
     user_id: str
     agent: str
     message: str
+    use_cache: bool = True
+    auto_route: bool = True
 
-#  Keywords for basic input validation
-topic_keywords = {
-    "health": ["workout", "diet", "exercise", "fitness", "calorie", "protein", "weight", "meal"],
-    "finance": ["budget", "income", "saving", "invest", "money", "loan", "expense", "debt"],
-    "learning": ["learn", "study", "course", "dsa", "python", "machine learning", "skills", "language"],
-    "motivation": ["motivate", "lazy", "discipline", "focus", "inspire", "consistency", "mindset"]
-}
-
-#  Generate plan
-@app.post("/life-plan")
-def life_plan(input: LifePlanInput, request: Request):
-    version = request.query_params.get("v2", "false").lower()
-    use_v2 = version == "true"
-    save_name = request.query_params.get("save_name")
-    user_id = request.query_params.get("user_id")
+def plan_flight_key(input: LifePlanInput, use_v2: bool, use_cache: bool, mode: str = "daily") -> str:
+    normalize = lambda text: " ".join(text.split()).casefold()
+    return make_flight_key(
+        "life-plan",
+        "v2" if use_v2 else f"v1-{mode}",
+        normalize(input.goal),
+        normalize(input.income),
+        normalize(input.learning_goal),
+        input.duration,
+        {k: normalize(v) for k, v in (input.preferences or {}).items()} if use_v2 else None,
+        use_cache
+    )
 
+def generate_life_plan(input: LifePlanInput, use_v2: bool, use_cache: bool = True, mode: str = "daily"):
     if use_v2:
-        print("⚙️ Using V2 LifeCoach workflow with Manager Agent")
-        result = v2_plan(
+        logger.info("Using V2 LifeCoach workflow with Manager Agent")
+        return registry.get_workflow("v2").generate_full_lifecoach_plan(
             input.goal,
             input.income,
             input.learning_goal,
             input.duration,
-            input.preferences or {}
+            input.preferences or {},
+            use_cache
+        )
+
+    logger.info("Using V1 flat workflow (%s)", mode)
+    return registry.get_workflow("v1").generate_full_lifecoach_plan(
+        input.goal,
+        input.income,
+        input.learning_goal,
+        input.duration,
+        use_cache,
+        mode
+    )
+
+# Rough token cost of a plan for admission control: ~800 tokens per agent task, three tasks a day plus finance
+PLAN_TASK_TOKENS = 800
+
+def plan_cost(input: LifePlanInput) -> int:
+    return PLAN_TASK_TOKENS * (3 * input.duration + 1)
+
+def generate_next_day(inputs: dict, day: int) -> dict:
+    return registry.get_workflow("v1").generate_day(day, inputs["goal"], inputs["learning_goal"], stage="v1-pregen")
+
+# Off-peak pre-generation of the coming day for users with a recent v1 plan
+pregenerator = NextDayPregenerator(
+    scheduler,
+    generate_next_day,
+    day_cost=3 * PLAN_TASK_TOKENS,
+    state_path=config.PREGEN_STATE_PATH,
+    day_slots=config.DAG_MAX_WORKERS,
+    window=config.PREGEN_WINDOW,
+    interval=config.PREGEN_INTERVAL_SECONDS,
+    concurrency=config.PREGEN_CONCURRENCY,
+    max_per_run=config.PREGEN_MAX_PER_RUN,
+    active_days=config.PREGEN_ACTIVE_DAYS
+)
+
+def requester_id(user_id: Optional[str], request: Request) -> str:
+    # Anonymous plan requests are shared out per client address
+    if user_id:
+        return user_id
+    return f"ip:{request.client.host}" if request.client else "anonymous"
+
+def plan_meta(input: LifePlanInput, use_v2: bool, mode: str = "daily") -> dict:
+    """
+    What a saved plan was generated from: its inputs and one prompt fingerprint per section.
+    V2 writes the plan in a single manager run with the finance block appended, so it has
+    one fingerprint for the manager's plan and one for finance.
+    """
+    if use_v2:
+        sections = registry.get_workflow("v2").section_fingerprints(
+            input.goal, input.income, input.learning_goal, input.duration, input.preferences or {}
         )
     else:
-        print("⚙️ Using V1 flat workflow")
-        result = v1_plan(
-            input.goal,
-            input.income,
-            input.learning_goal,
-            input.duration
+        sections = registry.get_workflow("v1").section_fingerprints(
+            input.goal, input.income, input.learning_goal, input.duration, mode
         )
+    return {
+        "workflow": "v2" if use_v2 else "v1",
+        "mode": mode,
+        "created": date.today().isoformat(),
+        "inputs": input.dict(),
+        "sections": sections
+    }
+
+def save_generated_plan(user_id: str, save_name: str, plan, input: LifePlanInput, use_v2: bool, mode: str):
+    # Plan and generation record in one step, so neither is ever paired with the other's predecessor
+    save_plan(user_id, save_name, plan, plan_meta(input, use_v2, mode))
+    if not use_v2:
+        # The user's latest v1 plan is the one whose next day gets pre-generated
+        pregenerator.record_activity(user_id, save_name)
+
+def run_life_plan(
+    input: LifePlanInput,
+    use_v2: bool,
+    save_name: Optional[str],
+    user_id: Optional[str],
+    use_cache: bool = True,
+    mode: str = "daily",
+    requester: Optional[str] = None
+):
+    result = inflight.do(
+        plan_flight_key(input, use_v2, use_cache, mode),
+        scheduler.run, requester or user_id or "anonymous", BATCH, plan_cost(input),
+        generate_life_plan, input, use_v2, use_cache, mode, slots=config.DAG_MAX_WORKERS
+    )
 
     if save_name and user_id:
-        save_plan(user_id, save_name, result["plan"] if "plan" in result else result)
+        save_generated_plan(user_id, save_name, result["plan"] if "plan" in result else result, input, use_v2, mode)
 
     return result
 
+def get_v1_mode(request: Request) -> str:
+    # "daily": one crew per day; "batched": one task per agent for all days
+    mode = request.query_params.get("mode", "daily").lower()
+    if mode not in ("daily", "batched"):
+        raise HTTPException(status_code=400, detail="❌ mode must be 'daily' or 'batched'.")
+    return mode
+
+#  Generate plan
+@app.post("/life-plan")
+def life_plan(input: LifePlanInput, request: Request):
+    version = request.query_params.get("v2", "false").lower()
+    use_v2 = version == "true"
+    save_name = request.query_params.get("save_name")
+    user_id = request.query_params.get("user_id")
+    use_cache = request.query_params.get("use_cache", "true").lower() != "false"
+    mode = get_v1_mode(request)
+
+    return run_life_plan(input, use_v2, save_name, user_id, use_cache, mode, requester_id(user_id, request))
+
+#  Submit plan generation as a background job
+@app.post("/life-plan/jobs", status_code=202)
+def submit_life_plan_job(input: LifePlanInput, request: Request):
+    use_v2 = request.query_params.get("v2", "false").lower() == "true"
+    save_name = request.query_params.get("save_name")
+    user_id = request.query_params.get("user_id")
+    use_cache = request.query_params.get("use_cache", "true").lower() != "false"
+    mode = get_v1_mode(request)
+    requester = requester_id(user_id, request)
+    scheduler.check(requester, BATCH, plan_cost(input))
+
+    try:
+        job_id = plan_jobs.submit(run_life_plan, input, use_v2, save_name, user_id, use_cache, mode, requester)
+    except QueueFullError:
+        raise HTTPException(
+            status_code=503,
+            detail="❌ Plan queue is full. Try again shortly.",
+            headers={"Retry-After": "30"}
+        )
+    return {"job_id": job_id, "status": "queued"}
+
+#  Job status
+@app.get("/life-plan/jobs/{job_id}")
+def get_life_plan_job(job_id: str):
+    job = plan_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="❌ Job not found.")
+    job.pop("result")
+    return job
+
+#  Job result
+@app.get("/life-plan/jobs/{job_id}/result")
+def get_life_plan_job_result(job_id: str):
+    job = plan_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="❌ Job not found.")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=f"❌ Job failed: {job['error']}")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"⏳ Job is {job['status']}.")
+    return job["result"]
+
+#  Job pool stats
+@app.get("/life-plan/jobs")
+def get_life_plan_job_stats():
+    return plan_jobs.stats()
+
+def encode_event(event: dict, fmt: str) -> str:
+    if fmt == "sse":
+        return f"event: {event['event']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+    return json.dumps(event, ensure_ascii=False) + "\n"
+
+#  Stream plan sections as they complete (NDJSON by default, SSE with ?format=sse)
+@app.post("/life-plan/stream")
+def life_plan_stream(input: LifePlanInput, request: Request):
+    use_v2 = request.query_params.get("v2", "false").lower() == "true"
+    fmt = request.query_params.get("format", "ndjson").lower()
+    save_name = request.query_params.get("save_name")
+    user_id = request.query_params.get("user_id")
+    use_cache = request.query_params.get("use_cache", "true").lower() != "false"
+    mode = get_v1_mode(request)
+    requester = requester_id(user_id, request)
+    # Answer 429 now rather than after the stream has started
+    scheduler.check(requester, BATCH, plan_cost(input))
+
+    def event_stream():
+        try:
+            with scheduler.admit(requester, BATCH, plan_cost(input), config.DAG_MAX_WORKERS):
+                if use_v2:
+                    # V2 is a single manager run, so it arrives as one event
+                    plan = registry.get_workflow("v2").generate_full_lifecoach_plan(
+                        input.goal,
+                        input.income,
+                        input.learning_goal,
+                        input.duration,
+                        input.preferences or {},
+                        use_cache
+                    )["plan"]
+                    yield encode_event({"event": "plan", "plan": plan}, fmt)
+                else:
+                    events = []
+                    v1 = registry.get_workflow("v1")
+                    for event in v1.stream_full_lifecoach_plan(
+                        input.goal,
+                        input.income,
+                        input.learning_goal,
+                        input.duration,
+                        use_cache,
+                        mode
+                    ):
+                        events.append(event)
+                        yield encode_event(event, fmt)
+                    plan = v1.collect_plan(events)
+        except AdmissionError as e:
+            yield encode_event({"event": "error", "detail": f"❌ Too many requests ({e.reason}).", "retry_after": e.retry_after}, fmt)
+            return
+        except Exception as e:
+            yield encode_event({"event": "error", "detail": str(e)}, fmt)
+            return
+
+        if save_name and user_id:
+            save_generated_plan(user_id, save_name, plan, input, use_v2, mode)
+
+        yield encode_event({"event": "done", "plan": plan}, fmt)
+
+    media_type = "text/event-stream" if fmt == "sse" else "application/x-ndjson"
+    return StreamingResponse(event_stream(), media_type=media_type)
+
+#  Regenerate only the sections of a saved plan whose inputs changed, e.g. {"income": "5000"}
+@app.post("/regenerate-plan/{user_id}/{plan_name}")
+def regenerate_saved_plan(user_id: str, plan_name: str, changes: RegeneratePlanInput, request: Request, response: Response):
+    use_cache = request.query_params.get("use_cache", "true").lower() != "false"
+    plan = load_plan(user_id, plan_name)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="❌ Plan not found.")
+    meta = load_plan_meta(user_id, plan_name)
+    if not meta:
+        raise HTTPException(status_code=409, detail="❌ No generation record for this plan; generate it again with /life-plan.")
+
+    input = LifePlanInput(**{**meta["inputs"], **changes.dict(exclude_none=True)})
+    use_v2 = meta["workflow"] == "v2"
+    mode = meta.get("mode", "daily")
+    new_meta = {**plan_meta(input, use_v2, mode), "created": meta.get("created", date.today().isoformat())}
+    stale = [
+        section for section, fingerprint in new_meta["sections"].items()
+        if meta["sections"].get(section) != fingerprint
+        or not (use_v2 or (isinstance(plan, dict) and section in plan))
+    ]
+
+    if not use_v2:
+        # A pre-generated day only depends on the day sections' inputs
+        if "next_day" in meta and not any(s in stale for s in registry.get_workflow("v1").SECTIONS):
+            new_meta["next_day"] = meta["next_day"]
+
+    if stale:
+        requester = requester_id(user_id, request)
+        if use_v2 and ("plan" in stale or not isinstance(plan, str)):
+            new_plan = scheduler.run(
+                requester, BATCH, plan_cost(input), generate_life_plan, input, True, use_cache,
+                slots=config.DAG_MAX_WORKERS
+            )["plan"]
+        elif use_v2:
+            # Only the income changed: swap the finance block, keep the manager's plan
+            v2 = registry.get_workflow("v2")
+            finance = scheduler.run(
+                requester, BATCH, PLAN_TASK_TOKENS, v2.finance_plan, input.income, use_cache, "v2-finance"
+            )
+            new_plan = v2.with_finance(plan, finance)
+        else:
+            v1 = registry.get_workflow("v1")
+            # Day sections cost one task per day (daily mode), finance a single task
+            cost = PLAN_TASK_TOKENS * sum(input.duration if s in v1.SECTIONS else 1 for s in stale)
+            fresh = scheduler.run(
+                requester, BATCH, cost, v1.generate_full_lifecoach_plan,
+                input.goal, input.income, input.learning_goal, input.duration, use_cache, mode, stale,
+                slots=config.DAG_MAX_WORKERS
+            )
+            merged = {**(plan if isinstance(plan, dict) else {}), **fresh}
+            new_plan = {section: merged[section] for section in v1.PLAN_SECTIONS if section in merged}
+
+        # Fail rather than overwrite an edit made while the sections were regenerating;
+        # the plan and its new generation record are written together
+        try:
+            plan = update_plan(user_id, plan_name, new_plan, make_etag(plan), meta=new_meta)
+        except PlanConflictError as e:
+            raise precondition_failed(e)
+        if plan is None:
+            raise HTTPException(status_code=404, detail="❌ Plan not found.")
+    else:
+        # Nothing to regenerate: record the new inputs unless the plan was re-saved meanwhile
+        modify_plan_meta(user_id, plan_name, lambda current: new_meta if current == meta else None)
+
+    if not use_v2:
+        pregenerator.record_activity(user_id, plan_name)
+    response.headers["ETag"] = make_etag(plan)
+    return {
+        "plan": plan,
+        "regenerated": stale,
+        "reused": [section for section in new_meta["sections"] if section not in stale]
+    }
+
+#  One day of a saved v1 plan (today by default, or ?date=YYYY-MM-DD), served pre-generated when possible
+@app.get("/daily-plan/{user_id}/{plan_name}")
+def get_daily_plan(user_id: str, plan_name: str, request: Request, day: Optional[str] = None):
+    try:
+        target = date.fromisoformat(day) if day else date.today()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="❌ day must be a date like 2024-05-01.")
+    meta = load_plan_meta(user_id, plan_name)
+    if not meta:
+        raise HTTPException(status_code=404, detail="❌ Plan not found or has no generation record.")
+    if meta["workflow"] != "v1":
+        raise HTTPException(status_code=409, detail="❌ Daily plans are only available for v1 plans.")
+
+    pregenerator.record_activity(user_id, plan_name)
+    return pregenerator.get_day(user_id, plan_name, meta, target, requester_id(user_id, request))
+
+#  Pre-generation stats: active users, window and hit rate
+@app.get("/pregen/stats")
+def get_pregen_stats():
+    return pregenerator.stats()
+
+CHAT_AGENTS = ("health", "finance", "learning", "motivation")
+# Tokens a chat answer adds on top of the question: memory window, retrieved turns and the reply
+CHAT_OVERHEAD_TOKENS = 600
+
+def chat_cost(message: str) -> int:
+    return estimate_tokens(message) + CHAT_OVERHEAD_TOKENS
+
+def check_chat_input(input: AgentChatInput):
+    """
+    Returns (domain, None) with the agent that should answer,
+    or (None, response) with the rejection to send back.
+    The requested agent answers if the message scores high enough for its domain;
+    otherwise, with auto_route, the best-scoring domain takes over.
+    """
+    requested = input.agent.lower()
+    if requested not in CHAT_AGENTS:
+        return None, {"error": "❌ Invalid agent name. Choose from: health, finance, learning, motivation."}
+
+    ranked = registry.get_intent_router().route(input.message)
+    scores = dict(ranked)
+    if scores.get(requested, 0.0) >= ROUTER_MIN_SCORE:
+        return requested, None
+    if input.auto_route and ranked and ranked[0][1] >= ROUTER_MIN_SCORE:
+        return ranked[0][0], None
+
+    return None, {
+        "response": f"❌ Your question doesn't seem related to the {input.agent.title()} domain. Please switch to the right agent."
+    }
+
+def build_chat_context(domain: str, user_id: str, message: str):
+    """
+    Prompt context for a chat turn: the short recent window from agent memory plus the
+    top-k most relevant older turns from the user's retrieval index. Both are bounded,
+    so the prompt does not grow with the length of the user's history.
+    """
+    recent = registry.get_memory_store().history(domain, user_id)
+    recent_texts = {m.content for m in recent}
+    relevant = [
+        turn for turn in registry.get_chat_index().search(user_id, message, RETRIEVAL_TOP_K)
+        if turn.get("user") not in recent_texts
+    ]
+    return recent, relevant
+
+def render_chat_prompt(message: str, recent, relevant) -> str:
+    """
+    The chat turn as the agent sees it: retrieved turns, the recent window, then the question.
+    """
+    context = []
+    if relevant:
+        context.append(f"Relevant past conversations:\n{format_turns(relevant)}")
+    if recent:
+        context.append(f"Conversation so far:\n{format_history(recent)}")
+    if not context:
+        return message
+    return "\n\n".join(context + [f"User's new question: {message}"])
+
+def chat_cache_key(agent, user_id: str, message: str, prompt: str) -> str:
+    """
+    A bare question is shared between users; once memory or retrieved turns are part of
+    the prompt the answer is personal, so the key covers the whole prompt and the user.
+    """
+    if prompt == message:
+        return agent_cache_key(agent, message)
+    return agent_cache_key(agent, f"user:{user_id}\n{prompt}")
+
+def record_chat(user_id: str, message: Dict):
+    # Index first: a user's first lookup backfills the index from storage
+    registry.get_chat_index().add_turn(user_id, message)
+    save_chat(user_id, message)
+
 #  Chat with individual agent
 @app.post("/agent-chat")
 def agent_chat(input: AgentChatInput):
-    agent_map = {
-        "health": health_agent,
-        "finance": finance_agent,
-        "learning": learning_agent,
-        "motivation": motivation_agent
-    }
+    domain, rejection = check_chat_input(input)
+    if rejection:
+        return rejection
 
-    selected_agent = agent_map.get(input.agent.lower())
-    if not selected_agent:
-        return {"error": "❌ Invalid agent name. Choose from: health, finance, learning, motivation."}
+    # A double-submitted question attaches to the running answer instead of asking again.
+    # Context is per user, so the user is part of the key.
+    key = make_flight_key("agent-chat", input.user_id, domain, " ".join(input.message.split()), input.use_cache)
+    return inflight.do(key, answer_chat, input, domain)
 
-    keywords = topic_keywords.get(input.agent.lower(), [])
-    if not any(word in input.message.lower() for word in keywords):
-        return {
-            "response": f"❌ Your question doesn't seem related to the {input.agent.title()} domain. Please switch to the right agent."
-        }
+def answer_chat(input: AgentChatInput, domain: str):
+    from crewai import Task
 
-    task = Task(
-        description=input.message,
-        expected_output=f"A helpful, concise, and personalized answer to the user's {input.agent.lower()}-related question.",
-        agent=selected_agent
-    )
+    selected_agent = registry.get_agent(domain)
+
+    recent, relevant = build_chat_context(domain, input.user_id, input.message)
+    description = render_chat_prompt(input.message, recent, relevant)
+    cache_key = chat_cache_key(selected_agent, input.user_id, input.message, description)
+    response = llm_cache.get(cache_key) if input.use_cache else None
+
+    if response is None:
+        with scheduler.admit(input.user_id, INTERACTIVE, chat_cost(input.message)):
+            task = Task(
+                description=description,
+                expected_output=f"A helpful, concise, and personalized answer to the user's {domain}-related question.",
+                # A copy, since concurrent chats with one agent would swap each other's executor
+                agent=selected_agent.model_copy()
+            )
 
-    task.execute()
-    response = task.output.result().strip()
+            with metrics.task_seconds.time(stage="chat", agent=domain):
+                task.execute()
+        response = task.output.result().strip()
+        llm_cache.set(cache_key, response)
 
-    save_chat(input.user_id, {
+    registry.get_memory_store().remember(domain, input.user_id, input.message, response)
+
+    record_chat(input.user_id, {
         "user": input.message,
         "agent": response,
-        "type": input.agent.lower()
+        "type": domain
     })
 
-    return {"response": response}
+    return {"response": response, "agent": domain}
+
+#  Chat with individual agent, streaming tokens as server-sent events
+@app.post("/agent-chat/stream")
+def agent_chat_stream(input: AgentChatInput):
+    domain, rejection = check_chat_input(input)
+    if rejection and "error" in rejection:
+        raise HTTPException(status_code=400, detail=rejection["error"])
+    selected_agent = registry.get_agent(domain) if domain else None
+    recent, relevant = build_chat_context(domain, input.user_id, input.message) if domain else ([], [])
+    prompt = render_chat_prompt(input.message, recent, relevant)
+    cache_key = chat_cache_key(selected_agent, input.user_id, input.message, prompt) if domain else None
+    cached = llm_cache.get(cache_key) if domain and input.use_cache else None
+    if domain and cached is None:
+        scheduler.check(input.user_id, INTERACTIVE, chat_cost(input.message))
+
+    def event_stream():
+        from langchain_core.messages import SystemMessage, HumanMessage
+
+        if rejection:
+            yield encode_event({"event": "done", **rejection}, "sse")
+            return
+
+        if cached is not None:
+            registry.get_memory_store().remember(domain, input.user_id, input.message, cached)
+            record_chat(input.user_id, {
+                "user": input.message,
+                "agent": cached,
+                "type": domain
+            })
+            yield encode_event({"event": "token", "token": cached}, "sse")
+            yield encode_event({"event": "done", "response": cached, "agent": domain}, "sse")
+            return
+
+        messages = [
+            SystemMessage(content=(
+                f"You are {selected_agent.role}. {selected_agent.backstory}\n"
+                f"Your personal goal is: {selected_agent.goal}\n"
+                f"Give a helpful, concise, and personalized answer to the user's {domain}-related question."
+            ))
+        ]
+        if relevant:
+            messages.append(SystemMessage(content=f"Relevant past conversations:\n{format_turns(relevant)}"))
+        messages += [*recent, HumanMessage(content=input.message)]
+
+        chunks = []
+        try:
+            with scheduler.admit(input.user_id, INTERACTIVE, chat_cost(input.message)):
+                started = time.perf_counter()
+                for chunk in selected_agent.llm.stream(messages, config={"metadata": {"agent": domain}}):
+                    if chunk.content:
+                        chunks.append(chunk.content)
+                        yield encode_event({"event": "token", "token": chunk.content}, "sse")
+        except AdmissionError as e:
+            yield encode_event({"event": "error", "detail": f"❌ Too many requests ({e.reason}).", "retry_after": e.retry_after}, "sse")
+            return
+        except Exception as e:
+            yield encode_event({"event": "error", "detail": str(e)}, "sse")
+            return
+
+        metrics.agent_seconds.observe(time.perf_counter() - started, agent=domain)
+        response = "".join(chunks).strip()
+        llm_cache.set(cache_key, response)
+        registry.get_memory_store().remember(domain, input.user_id, input.message, response)
+        record_chat(input.user_id, {
+            "user": input.message,
+            "agent": response,
+            "type": domain
+        })
+        yield encode_event({"event": "done", "response": response, "agent": domain}, "sse")
+
+    if not domain or cached is not None:
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+    # A double-submitted question follows the running stream from its first token instead of asking again
+    key = make_flight_key("agent-chat-stream", input.user_id, domain, " ".join(input.message.split()), input.use_cache)
+    return StreamingResponse(inflight.stream(key, event_stream), media_type="text/event-stream")
+
+#  Scheduler stats: slots, queues per priority class and rejections
+@app.get("/scheduler/stats")
+def get_scheduler_stats():
+    return scheduler.stats()
+
+#  Recent plan workflow runs, newest first: per-node timings, total work and critical path
+@app.get("/workflow-traces")
+def get_workflow_traces(limit: int = 20):
+    return get_recent_traces(max(1, min(limit, 100)))
+
+#  Request coalescing stats
+@app.get("/coalescing/stats")
+def get_coalescing_stats():
+    return inflight.stats()
+
+#  LLM response cache stats
+@app.get("/llm-cache/stats")
+def get_llm_cache_stats():
+    return llm_cache.stats()
+
+#  Drop every cached LLM response
+@app.delete("/llm-cache")
+def clear_llm_cache():
+    llm_cache.clear()
+    return {"message": "✅ LLM cache cleared."}
+
+#  Ollama host pool: health, in-flight calls and latency per host
+@app.get("/llm-pool/stats")
+def get_llm_pool_stats():
+    return registry.get_llm().pool.stats()
+
+#  Agent memory stats (resident users, spills, prompt tokens added by memory)
+@app.get("/agent-memory/stats")
+def get_agent_memory_stats():
+    return registry.get_memory_store().stats()
 
 #  Load chat history
 @app.get("/chat-history/{user_id}")
-def get_chat_history(user_id: str):
-    return load_chat(user_id)
+def get_chat_history(user_id: str, offset: int = 0, limit: Optional[int] = None, newest_first: bool = False):
+    if offset < 0 or (limit is not None and limit < 0):
+        raise HTTPException(status_code=400, detail="❌ offset and limit must be non-negative.")
+    return load_chat(user_id, offset=offset, limit=limit, newest_first=newest_first)
 
 #  Clear chat history
 @app.delete("/clear-chat/{user_id}")
 def clear_chat_history(user_id: str):
     deleted = clear_chat(user_id)
+    registry.get_chat_index().drop(user_id)
     if deleted:
         return {"message": " Chat history cleared."}
     else:
         raise HTTPException(status_code=404, detail="❌ No chat history found.")
 
-#  Load a saved plan
+def conditional_json(request: Request, body: dict, etag: str):
+    # The client's cached copy is current: skip the body
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(content=body, headers={"ETag": etag})
+
+#  Full-text search over a user's saved plans and chat history, best match first; kind=plan|chat narrows it
+@app.get("/search/{user_id}")
+def search_user_content(user_id: str, q: str, limit: int = 10, kind: Optional[str] = None):
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="❌ Search query cannot be empty.")
+    if kind not in (None, "plan", "chat"):
+        raise HTTPException(status_code=400, detail="❌ kind must be 'plan' or 'chat'.")
+    return {"query": q, "results": search_index.search(user_id, q, max(1, min(limit, 100)), kind)}
+
+#  Search index stats
+@app.get("/search-index/stats")
+def get_search_index_stats():
+    return search_index.stats()
+
+#  Load a saved plan (ETag / If-None-Match aware)
 @app.get("/load-plan/{user_id}/{plan_name}")
-def load_named_plan(user_id: str, plan_name: str):
+def load_named_plan(user_id: str, plan_name: str, request: Request):
     plan = load_plan(user_id, plan_name)
     if plan:
-        return {"plan": plan}
+        return conditional_json(request, {"plan": plan}, make_etag(plan))
     else:
         raise HTTPException(status_code=404, detail="❌ Plan not found.")
 
-#  List saved plan names
+#  List saved plan names (ETag / If-None-Match aware)
 @app.get("/load-plan-names/{user_id}")
-def get_plan_names(user_id: str):
+def get_plan_names(user_id: str, request: Request):
     plans = list_saved_plans(user_id)
-    return {"plans": plans}
+    return conditional_json(request, {"plans": plans}, make_etag(plans))
 
 #  Delete saved plan
 @app.delete("/delete-plan/{user_id}/{plan_name}")
@@ -142,9 +775,35 @@ def delete_saved_plan(user_id: str, plan_name: str):
         return {"message": f"✅ Plan '{plan_name}' deleted."}
     raise HTTPException(status_code=404, detail="❌ Plan not found.")
 
-#  Update saved plan
+def precondition_failed(error: PlanConflictError):
+    return HTTPException(
+        status_code=412,
+        detail="❌ Plan was changed elsewhere. Reload it and try again.",
+        headers={"ETag": error.current_etag}
+    )
+
+#  Update saved plan (optional If-Match guards against overwriting someone else's edit)
 @app.put("/update-plan/{user_id}/{plan_name}")
-def update_saved_plan(user_id: str, plan_name: str, updated_plan: dict):
-    if update_plan(user_id, plan_name, updated_plan):
+def update_saved_plan(user_id: str, plan_name: str, updated_plan: dict, request: Request, response: Response):
+    try:
+        plan = update_plan(user_id, plan_name, updated_plan, request.headers.get("If-Match"))
+    except PlanConflictError as e:
+        raise precondition_failed(e)
+    if plan is not None:
+        response.headers["ETag"] = make_etag(plan)
         return {"message": f"✅ Plan '{plan_name}' updated."}
     raise HTTPException(status_code=404, detail="❌ Plan not found.")
+
+#  Update only some sections of a saved plan, e.g. {"finance_plan": "..."}; null removes a section
+@app.patch("/update-plan/{user_id}/{plan_name}")
+def patch_saved_plan(user_id: str, plan_name: str, sections: dict, request: Request, response: Response):
+    try:
+        plan = patch_plan(user_id, plan_name, sections, request.headers.get("If-Match"))
+    except PlanConflictError as e:
+        raise precondition_failed(e)
+    except PlanNotPatchableError:
+        raise HTTPException(status_code=409, detail="❌ This plan is plain text; replace it with PUT instead.")
+    if plan is not None:
+        response.headers["ETag"] = make_etag(plan)
+        return {"message": f"✅ Plan '{plan_name}' updated.", "plan": plan}
+    raise HTTPException(status_code=404, detail="❌ Plan not found.")
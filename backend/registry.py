@@ -0,0 +1,115 @@
+"""
+Lazy access to the expensive parts of the backend: the LLM client, the agents,
+the workflows and the chat helpers that pull in crewai, langchain, numpy or faiss.
+Nothing is imported or built until first use, so importing backend.main (and every
+uvicorn worker respawn) stays cheap. warm_up() builds it all ahead of time.
+"""
+import importlib
+import threading
+import time
+from typing import Dict
+
+AGENT_MODULES = {
+    "health": "backend.agents.health_agent",
+    "finance": "backend.agents.finance_agent",
+    "learning": "backend.agents.learning_agent",
+    "motivation": "backend.agents.motivation_agent",
+    "manager": "backend.agents.manager_agent",
+}
+
+WORKFLOW_MODULES = {
+    "v1": "backend.workflows.lifecoach_workflow",
+    "v2": "backend.workflows.lifecoach_workflow_v2",
+}
+
+_lock = threading.RLock()
+# Seconds spent on each first-use build, e.g. {"agent:health": 1.8}
+build_seconds: Dict[str, float] = {}
+readiness = {"warmup": "not started", "llm_warm": False, "error": None}
+
+
+def _timed_import(key: str, module_name: str):
+    with _lock:
+        if key not in build_seconds:
+            start = time.perf_counter()
+            module = importlib.import_module(module_name)
+            build_seconds[key] = round(time.perf_counter() - start, 4)
+            return module
+    return importlib.import_module(module_name)
+
+
+def get_llm():
+    from backend.config import get_llm as build_llm
+
+    with _lock:
+        if "llm" not in build_seconds:
+            start = time.perf_counter()
+            llm = build_llm()
+            build_seconds["llm"] = round(time.perf_counter() - start, 4)
+            return llm
+    return build_llm()
+
+
+def get_agent(name: str):
+    module = _timed_import(f"agent:{name}", AGENT_MODULES[name])
+    return getattr(module, f"{name}_agent")
+
+
+def get_workflow(version: str):
+    return _timed_import(f"workflow:{version}", WORKFLOW_MODULES[version])
+
+
+def get_memory_store():
+    return _timed_import("memory", "backend.utils.memory_manager").memory_store
+
+
+def get_chat_index():
+    return _timed_import("chat_index", "backend.utils.retrieval_memory").chat_index
+
+
+def get_intent_router():
+    return _timed_import("intent_router", "backend.utils.intent_router").intent_router
+
+
+def warm_up() -> None:
+    """
+    Build every lazy component, then ask each Ollama host to load the model into memory
+    (an empty prompt with keep_alive loads it without generating anything).
+    """
+    from backend.config import LLM_MODEL, LLM_KEEP_ALIVE
+
+    readiness["warmup"] = "running"
+    try:
+        for name in AGENT_MODULES:
+            get_agent(name)
+        for version in WORKFLOW_MODULES:
+            get_workflow(version)
+        get_memory_store()
+        get_chat_index()
+        get_intent_router().route("warm up")
+
+        # Load the model on every host in the pool; ready once at least one of them is warm
+        failed = {}
+        for host in get_llm().pool.hosts:
+            try:
+                host.session.post(
+                    f"{host.url}/api/generate",
+                    json={"model": LLM_MODEL, "prompt": "", "keep_alive": LLM_KEEP_ALIVE},
+                    timeout=300
+                ).raise_for_status()
+            except Exception as e:
+                failed[host.url] = str(e)
+        if len(failed) == len(get_llm().pool.hosts):
+            raise RuntimeError(f"No Ollama host could load the model: {failed}")
+        readiness["error"] = failed or None
+        readiness["llm_warm"] = True
+        readiness["warmup"] = "done"
+    except Exception as e:
+        readiness["warmup"] = "failed"
+        readiness["error"] = str(e)
+
+
+def start_warm_up() -> threading.Thread:
+    thread = threading.Thread(target=warm_up, name="llm-warmup", daemon=True)
+    thread.start()
+    return thread
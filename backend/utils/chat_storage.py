@@ -1,33 +1,31 @@
-import os
-import json
-from typing import List, Dict
+from typing import List, Dict, Optional
 
-CHAT_DIR = "backend/data/chat_logs"
-os.makedirs(CHAT_DIR, exist_ok=True)
-
-def get_chat_filepath(user_id: str) -> str:
-    return os.path.join(CHAT_DIR, f"{user_id}.json")
+from backend.utils.storage_backend import get_storage
+from backend.utils.metrics import storage_seconds
+from backend.utils.search_index import search_index
 
 def save_chat(user_id: str, message: Dict):
-    filepath = get_chat_filepath(user_id)
-    history = []
-    if os.path.exists(filepath):
-        with open(filepath, "r", encoding="utf-8") as f:
-            history = json.load(f)
-    history.append(message)
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(history, f, indent=2)
+    with search_index.updating(user_id) as index:
+        with storage_seconds.time(op="save_chat"):
+            get_storage().append_chat(user_id, message)
+        if index:
+            index.add_chat_turn(message)
 
-def load_chat(user_id: str) -> List[Dict]:
-    filepath = get_chat_filepath(user_id)
-    if os.path.exists(filepath):
-        with open(filepath, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return []
+def load_chat(
+    user_id: str,
+    offset: int = 0,
+    limit: Optional[int] = None,
+    newest_first: bool = False
+) -> List[Dict]:
+    """
+    Load up to `limit` messages after skipping `offset`, oldest first by default.
+    """
+    with storage_seconds.time(op="load_chat"):
+        return get_storage().load_chat(user_id, offset=offset, limit=limit, newest_first=newest_first)
 
 def clear_chat(user_id: str) -> bool:
-    filepath = get_chat_filepath(user_id)
-    if os.path.exists(filepath):
-        os.remove(filepath)
-        return True
-    return False
+    with search_index.updating(user_id) as index:
+        deleted = get_storage().clear_chat(user_id)
+        if index:
+            index.clear_chat()
+    return deleted
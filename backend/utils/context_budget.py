@@ -0,0 +1,137 @@
+"""
+Fit the expert notes handed to the v2 manager into a token budget.
+
+The manager re-writes whatever it is given, so its prompt (and llama3's CPU time)
+grows with `duration` and with how wordy the experts are. fit_context() shrinks
+the notes in up to three steps and stops as soon as they fit:
+
+1. dedupe: drop lines that repeat an earlier line of any section, ignoring case,
+   punctuation and bullet markers;
+2. compress: keep each section's most representative lines (those sharing the most
+   words with the rest of the section), in their original order, within the
+   section's share of the budget. Sections smaller than an equal share keep
+   everything and pass what they don't use on to the others;
+3. trim: a single line longer than its section's share is cut at a word boundary.
+"""
+import logging
+import re
+from collections import Counter as WordCounter
+from typing import Dict, List, Optional, Tuple
+
+from backend.utils.helpers import estimate_tokens
+from backend.utils.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+BULLET_PREFIX = re.compile(r"^\s*(?:[-*•]+|\d+[.)])\s*")
+WORD = re.compile(r"\w+")
+
+context_tokens_saved_total = Counter(
+    "lifecoach_context_tokens_saved_total", "Estimated prompt tokens removed by context budgeting.", ("label",)
+)
+
+
+def _lines(text: str) -> List[str]:
+    return [line.strip() for line in (text or "").splitlines() if line.strip()]
+
+def _normalize(line: str) -> str:
+    return " ".join(WORD.findall(BULLET_PREFIX.sub("", line).lower()))
+
+def _render(name: str, lines: List[str]) -> str:
+    return f"{name}:\n" + "\n".join(lines)
+
+def _tokens(name: str, lines: List[str]) -> int:
+    return estimate_tokens(_render(name, lines))
+
+def _dedupe(sections: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    seen = set()
+    deduped = {}
+    for name, lines in sections.items():
+        kept = []
+        for line in lines:
+            key = _normalize(line)
+            if key and key in seen:
+                continue
+            seen.add(key)
+            kept.append(line)
+        deduped[name] = kept
+    return deduped
+
+def _shares(sizes: Dict[str, int], budget: int) -> Dict[str, int]:
+    """
+    Split the budget evenly, giving what small sections don't need to the larger ones.
+    """
+    shares = {}
+    remaining = dict(sizes)
+    left = budget
+    while remaining:
+        share = left // len(remaining)
+        small = {name: size for name, size in remaining.items() if size <= share}
+        if not small:
+            shares.update({name: share for name in remaining})
+            break
+        for name, size in small.items():
+            shares[name] = size
+            left -= size
+            del remaining[name]
+    return shares
+
+def _trim(line: str, max_tokens: int) -> str:
+    words = line.split()
+    while len(words) > 1 and estimate_tokens(" ".join(words) + " …") > max_tokens:
+        words = words[:max(1, len(words) * 3 // 4)]
+    return " ".join(words) + " …"
+
+def _compress(name: str, lines: List[str], share: int) -> List[str]:
+    if _tokens(name, lines) <= share:
+        return lines
+
+    words = [set(_normalize(line).split()) for line in lines]
+    frequency = WordCounter(word for line_words in words for word in line_words)
+    # Average number of other lines each word also appears in
+    scores = [sum(frequency[w] - 1 for w in ws) / len(ws) if ws else 0.0 for ws in words]
+    order = sorted(range(len(lines)), key=lambda i: (-scores[i], i))
+
+    keep: List[int] = []
+    for i in order:
+        candidate = sorted(keep + [i])
+        if _tokens(name, [lines[j] for j in candidate]) <= share:
+            keep = candidate
+    if keep:
+        return [lines[i] for i in keep]
+
+    # Not even one line fits: keep a shortened version of the best one
+    return [_trim(lines[order[0]], max(1, share - _tokens(name, [])))]
+
+def fit_context(sections: Dict[str, str], budget: Optional[int], label: str = "context") -> Tuple[str, Dict]:
+    """
+    Render {section name: text} as one context block of at most `budget` estimated tokens
+    (no limit when budget is falsy; duplicates are dropped either way).
+    Returns the block and {"tokens_before", "tokens_after", "tokens_saved", "steps"}.
+    """
+    lines = {name: _lines(text) for name, text in sections.items()}
+    render = lambda parts: "\n\n".join(_render(name, part) for name, part in parts.items())
+    before = estimate_tokens(render(lines))
+    steps = []
+
+    fitted = _dedupe(lines)
+    if fitted != lines:
+        steps.append("dedupe")
+
+    if budget and estimate_tokens(render(fitted)) > budget:
+        # Separators and per-section rounding cost up to a token per section
+        usable = max(len(fitted), budget - len(fitted))
+        shares = _shares({name: _tokens(name, part) for name, part in fitted.items()}, usable)
+        compressed = {name: _compress(name, part, shares[name]) for name, part in fitted.items()}
+        steps.append("compress")
+        if any(part and part[-1].endswith(" …") and part[-1] not in fitted[name] for name, part in compressed.items()):
+            steps.append("trim")
+        fitted = compressed
+
+    text = render(fitted)
+    after = estimate_tokens(text)
+    saved = before - after
+    if saved > 0:
+        context_tokens_saved_total.inc(saved, label=label)
+        logger.info("%s context: %d -> %d tokens (%d saved by %s)", label, before, after, saved, "+".join(steps))
+    return text, {"tokens_before": before, "tokens_after": after, "tokens_saved": saved, "steps": steps}
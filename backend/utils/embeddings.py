@@ -0,0 +1,46 @@
+import re
+import zlib
+
+import numpy as np
+
+EMBEDDING_DIM = 512
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Function words carry no topic signal and would make unrelated texts look alike
+STOPWORDS = frozenset(
+    "a an the i me my we you your it is am are was be been do does did to of in on at for with "
+    "and or but so if how what which who when where why should can could would will shall "
+    "this that these those there some any about into from by as get got".split()
+)
+
+
+def _features(text: str) -> list[str]:
+    words = [w for w in _WORD_RE.findall(text.lower()) if w not in STOPWORDS]
+    features = list(words)
+    features.extend(f"{a} {b}" for a, b in zip(words, words[1:]))
+    for word in words:
+        padded = f"#{word}#"
+        features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return features
+
+
+def embed_text(text: str, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """
+    Local, model-free embedding: words, word bigrams and character trigrams
+    hashed into `dim` buckets, L2-normalized so inner product is cosine similarity.
+    Uses crc32 rather than hash() so vectors are stable across processes.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature in _features(text):
+        vector[zlib.crc32(feature.encode("utf-8")) % dim] += 1.0
+    norm = np.linalg.norm(vector)
+    if norm:
+        vector /= norm
+    return vector
+
+
+def embed_texts(texts: list[str], dim: int = EMBEDDING_DIM) -> np.ndarray:
+    if not texts:
+        return np.zeros((0, dim), dtype=np.float32)
+    return np.vstack([embed_text(text, dim) for text in texts])
@@ -0,0 +1,100 @@
+"""
+Cross-process coordination for files shared by several uvicorn workers.
+
+file_lock() takes an exclusive advisory lock (fcntl.flock) on a lock file, which
+holds against other threads of this process as well as other processes. Where
+fcntl is missing (Windows) it only holds within the process.
+
+A lock file can also carry a generation counter: a fixed-width number bumped by
+every writer while it holds the lock. Another process reads it without locking
+and compares it with the generation its in-memory copy was built from. A
+mismatch means something else changed the data and the copy must be rebuilt.
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+GENERATION_WIDTH = 20
+
+_thread_locks: Dict[str, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _thread_lock(path: str) -> threading.Lock:
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(path, threading.Lock())
+
+@contextmanager
+def file_lock(path: str, blocking: bool = True):
+    """
+    Hold an exclusive lock on `path` (created if missing); yields its file descriptor.
+    With blocking=False yields None instead of waiting when someone else holds it.
+    Not re-entrant: taking the same lock again in the same thread deadlocks.
+    """
+    thread_lock = _thread_lock(path)
+    if not thread_lock.acquire(blocking):
+        yield None
+        return
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            acquired = True
+            if fcntl is not None:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    acquired = False
+            yield fd if acquired else None
+        finally:
+            # Closing the descriptor releases the flock
+            os.close(fd)
+    finally:
+        thread_lock.release()
+
+def read_generation(path: str) -> int:
+    """
+    The generation stored in a lock file; 0 if it has never been bumped.
+    """
+    try:
+        with open(path, "rb") as f:
+            raw = f.read(GENERATION_WIDTH)
+    except FileNotFoundError:
+        return 0
+    return int(raw) if raw.strip() else 0
+
+def bump_generation(fd: int) -> int:
+    """
+    Increment the generation in a lock file held with file_lock(); returns the new value.
+    A single fixed-width pwrite, so readers never see a partial number.
+    """
+    raw = os.pread(fd, GENERATION_WIDTH, 0)
+    generation = (int(raw) if raw.strip() else 0) + 1
+    os.pwrite(fd, b"%0*d" % (GENERATION_WIDTH, generation), 0)
+    return generation
+
+def write_json_atomic(filepath: str, data, **dump_kwargs) -> None:
+    """
+    Write to a uniquely named temp file, fsync it and rename it over the target,
+    so readers in any process see either the old or the new file, never a partial one.
+    """
+    tmp_path = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, **dump_kwargs)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,292 @@
+import os
+import json
+from contextlib import contextmanager
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional
+
+from backend.utils.file_lock import bump_generation, file_lock, read_generation, write_json_atomic
+from backend.utils.storage_backend import StorageBackend
+
+
+def _read_lines(filepath: str) -> Iterator[bytes]:
+    with open(filepath, "rb") as f:
+        for line in f:
+            yield line
+
+def _read_lines_reversed(filepath: str, block_size: int = 8192) -> Iterator[bytes]:
+    """
+    Yield the file's lines last-to-first, reading fixed-size blocks from the end
+    so only as much of the file is read as the caller consumes.
+    """
+    with open(filepath, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        remainder = b""
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            lines = (f.read(read_size) + remainder).split(b"\n")
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                yield line
+        yield remainder
+
+
+LOCK_DIR_NAME = ".locks"
+JOB_DIR_NAME = ".jobs"
+
+
+class FileStorageBackend(StorageBackend):
+    """
+    The original layout: one JSON file per plan under `plan_dir/<user_id>/`
+    and one JSONL chat log per user under `chat_dir`. Plan metadata lives in
+    `plan_dir/<user_id>/.meta/`, out of the way of the plan listing, and background
+    job records in `plan_dir/.jobs/<job_id>.json`.
+
+    Safe to share between worker processes: files are replaced by atomic renames,
+    and every write to a user's plans or chat holds that user's lock file
+    (`plan_dir/.locks/<user_id>.lock`), which also carries the user's generation.
+    """
+
+    def __init__(self, plan_dir: str = "saved_plans", chat_dir: str = "backend/data/chat_logs"):
+        self.plan_dir = plan_dir
+        self.chat_dir = chat_dir
+        self.lock_dir = os.path.join(plan_dir, LOCK_DIR_NAME)
+        self.job_dir = os.path.join(plan_dir, JOB_DIR_NAME)
+        self._created_dirs = set()
+
+    def _ensure_dir(self, directory: str) -> str:
+        if directory not in self._created_dirs:
+            os.makedirs(directory, exist_ok=True)
+            self._created_dirs.add(directory)
+        return directory
+
+    # --- Locking ---
+    def get_lock_filepath(self, user_id: str) -> str:
+        return os.path.join(self.lock_dir, f"{user_id}.lock")
+
+    @contextmanager
+    def _locked(self, user_id: str):
+        """
+        Hold the user's lock; yields the lock file's descriptor.
+        """
+        self._ensure_dir(self.lock_dir)
+        with file_lock(self.get_lock_filepath(user_id)) as fd:
+            yield fd
+
+    @contextmanager
+    def _writing(self, user_id: str):
+        """
+        Hold the user's lock across a write and bump their generation.
+        """
+        with self._locked(user_id) as fd:
+            yield
+            bump_generation(fd)
+
+    def generation(self, user_id: str) -> int:
+        return read_generation(self.get_lock_filepath(user_id))
+
+    # --- Plans ---
+    def get_user_plan_dir(self, user_id: str) -> str:
+        return os.path.join(self.plan_dir, user_id)
+
+    def get_plan_filepath(self, user_id: str, plan_name: str) -> str:
+        return os.path.join(self.get_user_plan_dir(user_id), f"{plan_name}.json")
+
+    def save_plan(self, user_id: str, plan_name: str, plan_data: dict | str, meta: Optional[Dict] = None) -> None:
+        self._ensure_dir(self.get_user_plan_dir(user_id))
+        with self._writing(user_id):
+            write_json_atomic(self.get_plan_filepath(user_id, plan_name), plan_data, indent=2)
+            if meta is not None:
+                self._write_plan_meta(user_id, plan_name, meta)
+
+    def load_plan(self, user_id: str, plan_name: str) -> dict | str | None:
+        try:
+            with open(self.get_plan_filepath(user_id, plan_name), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def list_plans(self, user_id: str) -> List[str]:
+        directory = self.get_user_plan_dir(user_id)
+        if not os.path.isdir(directory):
+            return []
+        return [f[:-5] for f in os.listdir(directory) if f.endswith(".json")]
+
+    def delete_plan(self, user_id: str, plan_name: str) -> bool:
+        with self._writing(user_id):
+            try:
+                os.remove(self.get_plan_filepath(user_id, plan_name))
+            except FileNotFoundError:
+                return False
+            try:
+                os.remove(self.get_plan_meta_filepath(user_id, plan_name))
+            except FileNotFoundError:
+                pass
+            return True
+
+    def update_plan(self, user_id: str, plan_name: str, new_plan_data: dict) -> bool:
+        return self.modify_plan(user_id, plan_name, lambda current: new_plan_data) is not None
+
+    def modify_plan(
+        self,
+        user_id: str,
+        plan_name: str,
+        modify: Callable[[dict | str], dict | str],
+        meta: Optional[Dict] = None
+    ) -> dict | str | None:
+        with self._writing(user_id):
+            current = self.load_plan(user_id, plan_name)
+            if current is None:
+                return None
+            updated = modify(current)
+            write_json_atomic(self.get_plan_filepath(user_id, plan_name), updated, indent=2)
+            if meta is not None:
+                self._write_plan_meta(user_id, plan_name, meta)
+            return updated
+
+    def get_plan_meta_filepath(self, user_id: str, plan_name: str) -> str:
+        return os.path.join(self.get_user_plan_dir(user_id), ".meta", f"{plan_name}.json")
+
+    def _write_plan_meta(self, user_id: str, plan_name: str, meta: Dict) -> None:
+        # Caller holds the user's lock
+        path = self.get_plan_meta_filepath(user_id, plan_name)
+        self._ensure_dir(os.path.dirname(path))
+        write_json_atomic(path, meta, indent=2)
+
+    def save_plan_meta(self, user_id: str, plan_name: str, meta: Dict) -> None:
+        # Metadata is not plan content, so it does not bump the generation
+        with self._locked(user_id):
+            self._write_plan_meta(user_id, plan_name, meta)
+
+    def load_plan_meta(self, user_id: str, plan_name: str) -> Optional[Dict]:
+        try:
+            with open(self.get_plan_meta_filepath(user_id, plan_name), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def modify_plan_meta(
+        self,
+        user_id: str,
+        plan_name: str,
+        modify: Callable[[Optional[Dict]], Optional[Dict]]
+    ) -> Optional[Dict]:
+        with self._locked(user_id):
+            current = self.load_plan_meta(user_id, plan_name)
+            updated = modify(current)
+            if updated is None:
+                return current
+            self._write_plan_meta(user_id, plan_name, updated)
+            return updated
+
+    def list_plan_users(self) -> List[str]:
+        if not os.path.isdir(self.plan_dir):
+            return []
+        return [
+            d for d in os.listdir(self.plan_dir)
+            if d not in (LOCK_DIR_NAME, JOB_DIR_NAME) and os.path.isdir(os.path.join(self.plan_dir, d))
+        ]
+
+    # --- Background plan jobs ---
+    def get_job_filepath(self, job_id: str) -> str:
+        return os.path.join(self.job_dir, f"{job_id}.json")
+
+    def save_job(self, job: Dict) -> None:
+        self._ensure_dir(self.job_dir)
+        with file_lock(os.path.join(self.job_dir, ".lock")):
+            write_json_atomic(self.get_job_filepath(job["job_id"]), job)
+
+    def load_job(self, job_id: str) -> Optional[Dict]:
+        try:
+            with open(self.get_job_filepath(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def delete_job(self, job_id: str) -> None:
+        try:
+            os.remove(self.get_job_filepath(job_id))
+        except FileNotFoundError:
+            pass
+
+    # --- Chat history ---
+    def get_chat_filepath(self, user_id: str) -> str:
+        return os.path.join(self.chat_dir, f"{user_id}.jsonl")
+
+    def get_legacy_chat_filepath(self, user_id: str) -> str:
+        return os.path.join(self.chat_dir, f"{user_id}.json")
+
+    def migrate_legacy_chat(self, user_id: str) -> None:
+        """
+        Convert an old whole-file JSON log into the append-only JSONL format (one message per line).
+        Any JSONL records written in the meantime are kept after the legacy ones.
+        """
+        if os.path.exists(self.get_legacy_chat_filepath(user_id)):
+            with self._writing(user_id):
+                self._migrate_legacy_chat(user_id)
+
+    def _migrate_legacy_chat(self, user_id: str) -> None:
+        # Caller holds the user's lock; another worker may have migrated the log while we waited
+        legacy_path = self.get_legacy_chat_filepath(user_id)
+        if not os.path.exists(legacy_path):
+            return
+
+        with open(legacy_path, "r", encoding="utf-8") as f:
+            history = json.load(f)
+
+        filepath = self.get_chat_filepath(user_id)
+        tmp_path = f"{filepath}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as out:
+            for message in history:
+                out.write(json.dumps(message, ensure_ascii=False) + "\n")
+            if os.path.exists(filepath):
+                with open(filepath, "r", encoding="utf-8") as f:
+                    out.writelines(f)
+        os.replace(tmp_path, filepath)
+        os.remove(legacy_path)
+
+    def append_chat(self, user_id: str, message: Dict) -> None:
+        self._ensure_dir(self.chat_dir)
+        with self._writing(user_id):
+            self._migrate_legacy_chat(user_id)
+            with open(self.get_chat_filepath(user_id), "a", encoding="utf-8") as f:
+                f.write(json.dumps(message, ensure_ascii=False) + "\n")
+
+    def load_chat(
+        self,
+        user_id: str,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        newest_first: bool = False
+    ) -> List[Dict]:
+        self.migrate_legacy_chat(user_id)
+        filepath = self.get_chat_filepath(user_id)
+        if not os.path.exists(filepath):
+            return []
+
+        lines = _read_lines_reversed(filepath) if newest_first else _read_lines(filepath)
+        records = (line for line in lines if line.strip())
+        stop = offset + limit if limit is not None else None
+        return [json.loads(line) for line in islice(records, offset, stop)]
+
+    def clear_chat(self, user_id: str) -> bool:
+        deleted = False
+        with self._writing(user_id):
+            for filepath in (self.get_chat_filepath(user_id), self.get_legacy_chat_filepath(user_id)):
+                if os.path.exists(filepath):
+                    os.remove(filepath)
+                    deleted = True
+        return deleted
+
+    def list_chat_users(self) -> List[str]:
+        if not os.path.isdir(self.chat_dir):
+            return []
+        users = set()
+        for name in os.listdir(self.chat_dir):
+            if name.endswith(".jsonl"):
+                users.add(name[:-6])
+            elif name.endswith(".json"):
+                users.add(name[:-5])
+        return sorted(users)
@@ -0,0 +1,117 @@
+"""
+Budget arithmetic for the finance section, done in code instead of by the LLM.
+
+parse_income() turns what users type ("50000", "₹50,000/month", "1.2 lakh",
+"50k", "6 LPA") into a monthly amount in rupees, or raises IncomeError.
+budget_breakdown() splits a whole array of incomes by a rule preset in one
+numpy pass, rounding to whole rupees so each row adds up to its income.
+"""
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Rule name -> (category, percent of income); percents add up to 100
+RULE_PRESETS: Dict[str, Tuple[Tuple[str, int], ...]] = {
+    "50/30/20": (("Essentials", 50), ("Wants", 30), ("Savings", 20)),
+    "60/20/20": (("Essentials", 60), ("Wants", 20), ("Savings", 20)),
+    "70/20/10": (("Living costs", 70), ("Savings", 20), ("Debt & giving", 10)),
+    "80/20": (("Spending", 80), ("Savings", 20)),
+}
+
+MAX_MONTHLY_INCOME = 1e9
+
+_MULTIPLIERS = {
+    "k": 1e3, "thousand": 1e3,
+    "l": 1e5, "lac": 1e5, "lacs": 1e5, "lakh": 1e5, "lakhs": 1e5, "lpa": 1e5,
+    "cr": 1e7, "crore": 1e7, "crores": 1e7,
+    "m": 1e6, "mn": 1e6, "million": 1e6,
+}
+_AMOUNT = re.compile(r"(-\s*)?(\d+(?:\.\d+)?)\s*(" + "|".join(sorted(_MULTIPLIERS, key=len, reverse=True)) + r")?\b", re.I)
+_CURRENCY = re.compile(r"₹|\brs\.?|\binr\b|\brupees?\b", re.I)
+_YEARLY = re.compile(r"\b(?:per\s+(?:year|annum)|a\s+year|yearly|annual(?:ly)?|lpa|p\.?a)\b|/\s*(?:year|yr)\b", re.I)
+
+
+class IncomeError(ValueError):
+    """Raised when an income string is not a single positive amount."""
+
+
+def parse_income(text: str) -> float:
+    """
+    Monthly income in rupees from free text. Yearly amounts ("per year", "LPA") are divided by 12.
+    """
+    cleaned = _CURRENCY.sub(" ", str(text or ""))
+    cleaned = re.sub(r"(?<=\d),(?=\d)", "", cleaned)
+    matches = _AMOUNT.findall(cleaned)
+    if not matches:
+        raise IncomeError(f"income {text!r} has no amount; use a monthly figure like 50000 or 1.2 lakh")
+    if len(matches) > 1:
+        raise IncomeError(f"income {text!r} has more than one amount; give a single monthly figure")
+
+    negative, number, unit = matches[0]
+    if negative:
+        raise IncomeError(f"income {text!r} must be positive")
+    amount = float(number) * _MULTIPLIERS.get(unit.lower(), 1.0)
+    if _YEARLY.search(cleaned):
+        amount /= 12
+    if amount <= 0 or amount > MAX_MONTHLY_INCOME:
+        raise IncomeError(f"income {text!r} is outside the supported range")
+    return amount
+
+def budget_breakdown(incomes: Sequence[float], rule: str = "50/30/20") -> np.ndarray:
+    """
+    Whole-rupee amounts per category for each income: shape (len(incomes), len(categories)).
+    Largest-remainder rounding keeps every row's sum equal to its rounded income.
+    """
+    if rule not in RULE_PRESETS:
+        raise ValueError(f"Unknown budget rule {rule!r}; expected one of {', '.join(RULE_PRESETS)}")
+    shares = np.array([percent for _, percent in RULE_PRESETS[rule]], dtype=np.float64) / 100
+    totals = np.rint(np.asarray(incomes, dtype=np.float64))
+
+    raw = totals[:, np.newaxis] * shares[np.newaxis, :]
+    amounts = np.floor(raw)
+    leftover = (totals - amounts.sum(axis=1)).astype(np.int64)
+    # Give the leftover rupees to the categories with the largest fractional parts
+    rank = np.argsort(np.argsort(-(raw - amounts), axis=1, kind="stable"), axis=1)
+    amounts += rank < leftover[:, np.newaxis]
+    return amounts.astype(np.int64)
+
+def format_inr(amount: float) -> str:
+    """
+    ₹ with Indian digit grouping, e.g. ₹12,34,567.
+    """
+    digits = str(int(round(amount)))
+    head, tail = digits[:-3], digits[-3:]
+    groups = []
+    while len(head) > 2:
+        groups.insert(0, head[-2:])
+        head = head[:-2]
+    if head:
+        groups.insert(0, head)
+    return "₹" + ",".join(groups + [tail])
+
+def default_tip(amounts: Dict[str, int]) -> str:
+    savings = amounts.get("Savings")
+    if savings:
+        return f"Automate it: move {format_inr(savings)} to savings or an index-fund SIP on payday, before you spend."
+    return "Automate it: move your savings on payday, before you spend."
+
+def format_budget(income: float, amounts: Sequence[int], rule: str = "50/30/20", tip: Optional[str] = None) -> str:
+    """
+    The finance section: one bullet per category plus a tip.
+    """
+    categories = RULE_PRESETS[rule]
+    by_category = {name: int(amount) for (name, _), amount in zip(categories, amounts)}
+    lines = [f"• Monthly income: {format_inr(income)} ({rule} rule)"]
+    lines += [f"• {name} ({percent}%): {format_inr(by_category[name])}" for name, percent in categories]
+    lines.append(f"• Tip: {tip or default_tip(by_category)}")
+    return "\n".join(lines)
+
+def finance_plans(incomes: Sequence[str], rule: str = "50/30/20", tips: Optional[Sequence[Optional[str]]] = None) -> List[str]:
+    """
+    Finance sections for many raw income strings with one vectorized breakdown.
+    """
+    monthly = [parse_income(income) for income in incomes]
+    rows = budget_breakdown(monthly, rule)
+    tips = tips or [None] * len(monthly)
+    return [format_budget(income, row, rule, tip) for income, row, tip in zip(monthly, rows, tips)]
@@ -0,0 +1,31 @@
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count for llama-style tokenizers (about 4 characters per token).
+    Good enough for budgeting and metrics without loading a tokenizer.
+    """
+    if not text:
+        return 0
+    return max(1, (len(text) + 3) // 4)
+
+def format_history(messages) -> str:
+    """
+    Render langchain chat messages as a plain User/Coach transcript.
+    """
+    lines = []
+    for message in messages:
+        speaker = {"human": "User", "ai": "Coach"}.get(message.type, "Summary")
+        lines.append(f"{speaker}: {message.content}")
+    return "\n".join(lines)
+
+def format_turns(turns: list[dict], max_chars: int = 600) -> str:
+    """
+    Render retrieved turns for a prompt, clipping long replies so the context stays bounded.
+    """
+    lines = []
+    for turn in turns:
+        reply = turn.get("agent", "")
+        if len(reply) > max_chars:
+            reply = reply[:max_chars].rstrip() + "…"
+        lines.append(f"User: {turn.get('user', '')}\nCoach: {reply}")
+    return "\n\n".join(lines)
@@ -0,0 +1,165 @@
+import re
+import threading
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from backend.utils.embeddings import EMBEDDING_DIM, embed_text, embed_texts
+
+# Whole words, each also matching the inflections in KEYWORD_INFLECTIONS ("workout" -> "workouts");
+# other word forms are listed explicitly, so "fat" never matches "father" nor "exam" "example"
+DOMAIN_KEYWORDS: Dict[str, List[str]] = {
+    "health": [
+        "workout", "diet", "exercise", "exercising", "fitness", "calorie", "protein", "weight", "meal",
+        "gym", "run", "running", "runner", "jog", "jogging", "cardio", "muscle", "fat", "sleep", "nutrition",
+        "eat", "eating", "food", "yoga", "stretch", "injury", "injuries", "injured", "health", "healthy",
+        "abs", "bmi", "lift", "squat", "vegan", "keto",
+    ],
+    "finance": [
+        "budget", "income", "saving", "save", "invest", "investment", "money", "loan", "expense", "debt",
+        "salary", "salaries", "emi", "credit", "stock", "mutual fund", "sip", "tax", "rent", "spend", "spent",
+        "retire", "retirement", "emergency fund", "finance", "financial", "rupee", "₹", "insurance",
+        "portfolio", "pay off",
+    ],
+    "learning": [
+        "learn", "study", "studies", "studied", "studying", "course", "dsa", "python", "machine learning",
+        "skill", "language", "tutorial", "books", "textbook", "exam", "certificate", "certification",
+        "coding", "program", "programming", "programmer", "algorithm", "data science", "interview prep",
+        "lecture", "revise", "revising", "revision", "javascript", "sql", "read", "practice problem",
+    ],
+    "motivation": [
+        "motivate", "motivating", "motivation", "motivational", "lazy", "discipline", "focus", "inspire",
+        "inspiring", "inspiration", "consistent", "consistency", "mindset", "procrastinate",
+        "procrastinating", "procrastination", "burnout", "burn out", "burned out", "burnt out", "give up",
+        "giving up", "stuck", "habit", "confidence", "confident", "overwhelm", "distract", "distraction",
+        "willpower", "momentum", "demotivated", "demotivating", "productive", "productivity",
+    ],
+}
+KEYWORD_INFLECTIONS = ("s", "es", "d", "ed", "ing", "er", "ers", "ly")
+
+# A few labeled examples per domain for the nearest-neighbour fallback
+SEED_EXAMPLES: Dict[str, List[str]] = {
+    "health": [
+        "how do I lose belly fat", "what should I eat after the gym", "best routine to build muscle",
+        "how many calories should I eat", "is running every day good for me", "I want to get in shape",
+        "suggest a high protein breakfast", "my back hurts after lifting", "how can I sleep better",
+        "home exercises without equipment", "what is a healthy dinner", "how to gain weight healthily",
+        "should I take a break from training", "how long do muscles need to recover",
+    ],
+    "finance": [
+        "how should I split my salary", "should I pay off my credit card first", "where to put my savings",
+        "how much should I keep as emergency fund", "is it worth buying a house or renting",
+        "how do I start investing with little money", "I spend too much every month",
+        "help me plan my monthly budget", "how do I reduce my loan interest", "what is a good SIP amount",
+        "how to save for retirement", "track my expenses better",
+    ],
+    "learning": [
+        "how do I get better at coding", "roadmap for data science", "which course should I take for web development",
+        "how to prepare for a coding interview", "best way to memorize vocabulary", "teach me recursion",
+        "how to learn a new language fast", "what should I study first for machine learning",
+        "recommend books on statistics", "how many hours should I study daily", "explain dynamic programming",
+        "how to pass my exams",
+    ],
+    "motivation": [
+        "I keep putting things off", "I feel like giving up", "how do I stay on track",
+        "I can't get out of bed in the morning", "how do I build good habits", "I feel stuck in life",
+        "how to stop scrolling my phone all day", "I lose interest after a few days",
+        "how to believe in myself", "I feel overwhelmed by everything", "how to keep going when it's hard",
+        "I need a push to start", "nothing works so I want to stop trying",
+        "my excitement always fades quickly",
+    ],
+}
+
+DOMAINS = list(DOMAIN_KEYWORDS)
+
+
+def _compile_matcher(keywords: Dict[str, List[str]]) -> re.Pattern:
+    """
+    One regex with a named group per domain, so a single pass finds every keyword hit.
+    A keyword must start and end on a word boundary, allowing one of KEYWORD_INFLECTIONS
+    before the end; symbols such as "₹" only need the left one.
+    """
+    inflections = "(?:" + "|".join(KEYWORD_INFLECTIONS) + ")?"
+    groups = []
+    for domain, words in keywords.items():
+        ordered = sorted(words, key=len, reverse=True)
+        alternatives = [f"(?:{'|'.join(re.escape(w) for w in ordered if w[-1].isalnum())}){inflections}(?![a-z0-9])"]
+        alternatives += [re.escape(w) for w in ordered if not w[-1].isalnum()]
+        groups.append(f"(?P<{domain}>{'|'.join(alternatives)})")
+    return re.compile(r"(?<![a-z0-9])(?:" + "|".join(groups) + ")", re.IGNORECASE)
+
+
+class IntentRouter:
+    """
+    Ranks the four coaching domains for a message.
+    Stage 1 counts keyword hits with one compiled regex; when that is conclusive
+    (exactly one domain matched) it is the answer. Otherwise stage 2 scores each
+    domain by its best cosine similarity among the message's nearest labeled
+    examples in a FAISS index, blended with any keyword hits.
+    """
+
+    def __init__(self, keywords: Dict[str, List[str]], examples: Dict[str, List[str]], neighbours: int = 5):
+        self.matcher = _compile_matcher(keywords)
+        self.examples = examples
+        self.neighbours = neighbours
+        self._index = None
+        self._labels: List[str] = []
+        self._lock = threading.Lock()
+
+    def _classifier(self):
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    import faiss
+
+                    texts, labels = [], []
+                    for domain, samples in self.examples.items():
+                        texts.extend(samples)
+                        labels.extend([domain] * len(samples))
+                    index = faiss.IndexFlatIP(EMBEDDING_DIM)
+                    index.add(embed_texts(texts))
+                    self._labels = labels
+                    self._index = index
+        return self._index
+
+    def keyword_hits(self, message: str) -> Dict[str, int]:
+        hits: Dict[str, int] = {}
+        for match in self.matcher.finditer(message):
+            hits[match.lastgroup] = hits.get(match.lastgroup, 0) + 1
+        return hits
+
+    def classify(self, message: str) -> Dict[str, float]:
+        index = self._classifier()
+        similarities, ids = index.search(embed_text(message)[np.newaxis, :], self.neighbours)
+        scores: Dict[str, float] = {}
+        for similarity, idx in zip(similarities[0], ids[0]):
+            if idx < 0:
+                continue
+            domain = self._labels[idx]
+            scores[domain] = max(scores.get(domain, 0.0), float(similarity))
+        return scores
+
+    def route(self, message: str) -> List[Tuple[str, float]]:
+        """
+        Returns (domain, score) pairs, best first. Scores are in [0, 1].
+        """
+        hits = self.keyword_hits(message)
+        total = sum(hits.values())
+
+        if len(hits) == 1:
+            scores = {domain: 1.0 for domain in hits}
+        else:
+            similarity = self.classify(message)
+            scores = {}
+            for domain in DOMAINS:
+                if total:
+                    score = 0.6 * hits.get(domain, 0) / total + 0.4 * similarity.get(domain, 0.0)
+                else:
+                    score = similarity.get(domain, 0.0)
+                if score > 0:
+                    scores[domain] = round(score, 4)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+intent_router = IntentRouter(DOMAIN_KEYWORDS, SEED_EXAMPLES)
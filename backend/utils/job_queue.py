@@ -0,0 +1,103 @@
+import contextvars
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from backend.utils.storage_backend import StorageBackend
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class JobQueue:
+    """
+    Bounded worker pool for long-running plan generation.
+    At most `max_workers` jobs run at once and at most `max_queued` wait for a worker;
+    finished jobs are kept (oldest evicted first) so clients can poll for the result.
+
+    Jobs run in the worker process that accepted them, but every change to a job's
+    record is written through to `store()`, so a poll answered by any worker sees it.
+    The limits and stats count this process's jobs only.
+    """
+
+    def __init__(self, max_workers: int, max_queued: int, store: Callable[[], StorageBackend], max_finished: int = 500):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+        self._store = store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="plan-job")
+        self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> str:
+        """
+        Queue `fn(*args, **kwargs)` and return its job id immediately.
+        Raises QueueFullError if too many jobs are already waiting.
+        """
+        with self._lock:
+            queued = sum(1 for job in self._jobs.values() if job["status"] == "queued")
+            if queued >= self.max_queued:
+                raise QueueFullError(f"{queued} jobs already waiting")
+
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "status": "queued",
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "result": None,
+                "error": None,
+            }
+            self._store().save_job(self._jobs[job_id])
+            self._prune()
+
+        # Run in a copy of the caller's context so the request's trace id follows the job
+        context = contextvars.copy_context()
+        self._executor.submit(context.run, self._run, job_id, fn, args, kwargs)
+        return job_id
+
+    def _run(self, job_id: str, fn: Callable, args, kwargs) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+            job["status"] = "running"
+            job["started_at"] = time.time()
+            self._store().save_job(job)
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            with self._lock:
+                job.update(status="failed", error=str(e), finished_at=time.time())
+                self._store().save_job(job)
+            return
+        with self._lock:
+            job.update(status="done", result=result, finished_at=time.time())
+            self._store().save_job(job)
+
+    def _prune(self) -> None:
+        finished = [jid for jid, job in self._jobs.items() if job["status"] in ("done", "failed")]
+        for jid in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[jid]
+            self._store().delete_job(jid)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """
+        Return a copy of the job record (including its result), or None if unknown.
+        Looks in the shared store, so jobs accepted by other workers are found too.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                return dict(job)
+        return self._store().load_job(job_id)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+            for job in self._jobs.values():
+                counts[job["status"]] += 1
+        return {"max_workers": self.max_workers, "max_queued": self.max_queued, **counts}
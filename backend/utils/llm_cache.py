@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from backend.utils.file_lock import bump_generation, file_lock, read_generation
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Collapse whitespace and case so trivially different prompts share an entry.
+    """
+    return re.sub(r"\s+", " ", prompt).strip().casefold()
+
+
+def make_cache_key(model: str, role: str, prompt: str) -> str:
+    raw = "\x1f".join([model, role, normalize_prompt(prompt)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Two-tier cache of LLM completions keyed by (model, agent role, normalized prompt).
+    Entries live in an in-memory LRU and in one JSON file per key under `cache_dir`;
+    both tiers expire entries after `ttl_seconds`.
+    clear() bumps a generation in `cache_dir/.lock`; other worker processes see it
+    on their next lookup and empty their in-memory tier too.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int, cache_dir: str):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.cache_dir = cache_dir
+        self._memory: "OrderedDict[str, tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0}
+        self._generation = read_generation(self._lock_path())
+
+    def _lock_path(self) -> str:
+        return os.path.join(self.cache_dir, ".lock")
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        generation = read_generation(self._lock_path())
+        with self._lock:
+            if generation != self._generation:
+                # Another worker cleared the cache
+                self._memory.clear()
+                self._generation = generation
+            entry = self._memory.get(key)
+            if entry and entry[1] > now:
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return entry[0]
+            self._memory.pop(key, None)
+
+        value = self._read_disk(key, now)
+        with self._lock:
+            if value is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["disk_hits"] += 1
+            self._remember(key, value[0], value[1])
+        return value[0]
+
+    def set(self, key: str, value: str) -> None:
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._remember(key, value, expires_at)
+            self._counters["writes"] += 1
+        self._write_disk(key, value, expires_at)
+
+    def _remember(self, key: str, value: str, expires_at: float) -> None:
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key: str, now: float):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if entry.get("expires_at", 0) <= now:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry["value"], entry["expires_at"]
+
+    def _write_disk(self, key: str, value: str, expires_at: float) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"value": value, "expires_at": expires_at}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def clear(self) -> None:
+        with file_lock(self._lock_path()) as fd:
+            with self._lock:
+                self._memory.clear()
+            for shard in os.listdir(self.cache_dir):
+                shard_dir = os.path.join(self.cache_dir, shard)
+                if not os.path.isdir(shard_dir):
+                    continue
+                for name in os.listdir(shard_dir):
+                    os.remove(os.path.join(shard_dir, name))
+            generation = bump_generation(fd)
+        with self._lock:
+            self._generation = generation
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self._counters)
+            size = len(self._memory)
+        lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        return {
+            **counters,
+            "memory_entries": size,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def _build_llm_cache() -> LLMCache:
+    from backend.config import LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL_SECONDS, LLM_CACHE_DIR
+
+    return LLMCache(
+        max_entries=LLM_CACHE_MAX_ENTRIES,
+        ttl_seconds=LLM_CACHE_TTL_SECONDS,
+        cache_dir=LLM_CACHE_DIR
+    )
+
+
+llm_cache = _build_llm_cache()
+
+
+def agent_cache_key(agent, prompt: str) -> str:
+    """
+    Cache key for `prompt` sent to `agent` (anything with .role and .llm).
+    """
+    from backend.config import LLM_MODEL
+
+    model = getattr(agent.llm, "model", LLM_MODEL)
+    return make_cache_key(model, agent.role, prompt)
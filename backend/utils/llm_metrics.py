@@ -0,0 +1,120 @@
+import contextvars
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from backend.utils.helpers import estimate_tokens
+from backend.utils.metrics import (
+    agent_seconds, llm_call_seconds, prompt_tokens_total, completion_tokens_total
+)
+
+logger = logging.getLogger(__name__)
+
+# The agent whose executor is running in this context; LLM calls are attributed to it
+current_agent: contextvars.ContextVar[str] = contextvars.ContextVar("current_agent", default="none")
+
+
+class AgentMetricsHandler(BaseCallbackHandler):
+    """
+    Times one agent's executor runs and marks the agent as current while it runs.
+    Attached through Agent(callbacks=...), which crewai hands to the executor chain only,
+    so nested LLM calls are counted by the LLMMetricsHandler on the shared client instead.
+    """
+
+    def __init__(self, agent_name: str):
+        self.agent_name = agent_name
+        self._runs: Dict[UUID, Tuple[float, contextvars.Token]] = {}
+        self._lock = threading.Lock()
+
+    def on_chain_start(self, serialized, inputs, *, run_id: UUID, parent_run_id: Optional[UUID] = None, **kwargs: Any):
+        token = current_agent.set(self.agent_name)
+        with self._lock:
+            self._runs[run_id] = (time.perf_counter(), token)
+
+    def _finish(self, run_id: UUID) -> Optional[float]:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return None
+        started, token = run
+        try:
+            current_agent.reset(token)
+        except ValueError:
+            # Ended in a different context than it started; nothing to restore
+            pass
+        return time.perf_counter() - started
+
+    def on_chain_end(self, outputs, *, run_id: UUID, **kwargs: Any):
+        elapsed = self._finish(run_id)
+        if elapsed is not None:
+            agent_seconds.observe(elapsed, agent=self.agent_name)
+            logger.info("agent %s finished in %.2fs", self.agent_name, elapsed)
+
+    def on_chain_error(self, error, *, run_id: UUID, **kwargs: Any):
+        self._finish(run_id)
+
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """
+    Times every LLM round-trip and counts prompt/completion tokens per agent.
+    The agent comes from the call's metadata ("agent") or else the current agent.
+    Token counts use Ollama's prompt_eval_count/eval_count when present, otherwise estimate_tokens.
+    """
+
+    def __init__(self):
+        self._calls: Dict[UUID, Tuple[float, str, int]] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, metadata: Optional[Dict], prompt_estimate: int):
+        agent = (metadata or {}).get("agent") or current_agent.get()
+        with self._lock:
+            self._calls[run_id] = (time.perf_counter(), agent, prompt_estimate)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, metadata: Optional[Dict] = None, **kwargs: Any):
+        self._start(run_id, metadata, sum(estimate_tokens(prompt) for prompt in prompts))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, metadata: Optional[Dict] = None, **kwargs: Any):
+        self._start(run_id, metadata, sum(estimate_tokens(str(m.content)) for batch in messages for m in batch))
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any):
+        with self._lock:
+            call = self._calls.pop(run_id, None)
+        if call is None:
+            return
+        started, agent, prompt_estimate = call
+        elapsed = time.perf_counter() - started
+
+        prompt_tokens, completion_tokens = 0, 0
+        for generations in response.generations:
+            for generation in generations:
+                info = generation.generation_info or {}
+                prompt_tokens += info.get("prompt_eval_count") or 0
+                completion_tokens += info.get("eval_count") or estimate_tokens(generation.text)
+        prompt_tokens = prompt_tokens or prompt_estimate
+
+        llm_call_seconds.observe(elapsed, agent=agent)
+        prompt_tokens_total.inc(prompt_tokens, agent=agent)
+        completion_tokens_total.inc(completion_tokens, agent=agent)
+        logger.info(
+            "llm call for %s: %.2fs, %d prompt + %d completion tokens",
+            agent, elapsed, prompt_tokens, completion_tokens
+        )
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs: Any):
+        with self._lock:
+            call = self._calls.pop(run_id, None)
+        logger.warning("llm call for %s failed: %s", call[1] if call else "unknown", error)
+
+
+def agent_label(agent) -> str:
+    """
+    The short name an agent's metrics are recorded under ("health", "manager", ...), falling back to its role.
+    """
+    for handler in getattr(agent, "callbacks", None) or []:
+        if isinstance(handler, AgentMetricsHandler):
+            return handler.agent_name
+    return agent.role
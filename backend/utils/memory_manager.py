@@ -1,12 +1,242 @@
-from langchain.memory import ConversationBufferMemory
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+
+from langchain.memory import ConversationSummaryBufferMemory
 from langchain.chains.conversation.memory import ConversationBufferWindowMemory
+from langchain_core.messages import BaseMessage, messages_from_dict, messages_to_dict
+
+from backend.config import (
+    MEMORY_POLICY, MEMORY_WINDOW_TURNS, MEMORY_SUMMARY_MAX_TOKENS,
+    MEMORY_MAX_RESIDENT_USERS, MEMORY_SPILL_DIR
+)
+from backend.utils.file_lock import file_lock, write_json_atomic
+from backend.utils.helpers import estimate_tokens
+
+SHARED_USER = "_shared"
+
+
+class SummarizingMemory(ConversationSummaryBufferMemory):
+    """
+    ConversationSummaryBufferMemory that measures the buffer with estimate_tokens
+    instead of asking the LLM for a tokenizer.
+    """
+
+    def prune(self) -> None:
+        buffer = self.chat_memory.messages
+        length = sum(estimate_tokens(m.content) for m in buffer)
+        if length <= self.max_token_limit:
+            return
+        pruned = []
+        while buffer and length > self.max_token_limit:
+            message = buffer.pop(0)
+            length -= estimate_tokens(message.content)
+            pruned.append(message)
+        self.moving_summary_buffer = self.predict_new_summary(pruned, self.moving_summary_buffer)
+
 
-memory_store = {}
+class AgentMemoryStore:
+    """
+    Conversation memory per (user_id, agent), bounded in three ways:
+    each memory keeps a window or a summary rather than the full history,
+    at most `max_resident_users` users stay in RAM (least recently used first out),
+    and evicted users are written to `spill_dir` and restored on their next call.
 
-def get_agent_memory(agent_name: str):
-    if agent_name not in memory_store:
-        memory_store[agent_name] = ConversationBufferMemory(
+    Two kinds of lock: a per-user (striped) lock held for everything touching one
+    user's memories, including the LLM call that summarization makes, and a short
+    store-wide lock for the LRU bookkeeping only. A user is only evicted if their
+    lock is free, so a memory is never spilled halfway through an update.
+
+    Spill files are shared by worker processes: they are read, merged and replaced
+    atomically under `<user>.lock`, so spills of one user from two workers keep both.
+    """
+
+    def __init__(self, policy: str, window_turns: int, summary_max_tokens: int,
+                 max_resident_users: int, spill_dir: str, lock_stripes: int = 64):
+        if policy not in ("window", "summary"):
+            raise ValueError(f"Unknown memory policy: {policy!r} (expected 'window' or 'summary')")
+        self.policy = policy
+        self.window_turns = window_turns
+        self.summary_max_tokens = summary_max_tokens
+        self.max_resident_users = max_resident_users
+        self.spill_dir = spill_dir
+        self._users: "OrderedDict[str, Dict[str, object]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._user_locks = [threading.Lock() for _ in range(lock_stripes)]
+        self._counters = {"spills": 0, "restores": 0, "prompt_calls": 0, "prompt_tokens": 0, "max_prompt_tokens": 0}
+
+    def _build(self):
+        if self.policy == "summary":
+            from backend.config import llm
+            return SummarizingMemory(
+                llm=llm,
+                max_token_limit=self.summary_max_tokens,
+                memory_key="chat_history",
+                return_messages=True,
+            )
+        return ConversationBufferWindowMemory(
+            k=self.window_turns,
             memory_key="chat_history",
             return_messages=True,
         )
-    return memory_store[agent_name]
+
+    def _spill_path(self, user_id: str) -> str:
+        return os.path.join(self.spill_dir, f"{user_id}.json")
+
+    def _spill_lock_path(self, user_id: str) -> str:
+        return os.path.join(self.spill_dir, f"{user_id}.lock")
+
+    def _read_spill(self, path: str) -> Dict[str, Dict]:
+        # Caller holds the user's spill lock; a missing or unreadable file counts as empty
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _spill(self, user_id: str, memories: Dict[str, object]) -> None:
+        path = self._spill_path(user_id)
+        data = {
+            agent: {
+                "messages": messages_to_dict(memory.chat_memory.messages),
+                "summary": getattr(memory, "moving_summary_buffer", ""),
+            }
+            for agent, memory in memories.items()
+        }
+        # Another worker may have spilled the same user since: keep its turns ahead of ours
+        with file_lock(self._spill_lock_path(user_id)):
+            for agent, saved in self._read_spill(path).items():
+                if agent not in data:
+                    data[agent] = saved
+                    continue
+                messages = saved.get("messages", []) + data[agent]["messages"]
+                if self.policy == "window":
+                    messages = messages[-2 * self.window_turns:]
+                summary = "\n".join(part for part in (saved.get("summary", ""), data[agent]["summary"]) if part)
+                data[agent] = {"messages": messages, "summary": summary}
+            write_json_atomic(path, data)
+        with self._lock:
+            self._counters["spills"] += 1
+
+    def _restore(self, user_id: str) -> Dict[str, object]:
+        path = self._spill_path(user_id)
+        if not os.path.exists(path):
+            return {}
+        with file_lock(self._spill_lock_path(user_id)):
+            data = self._read_spill(path)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+        memories = {}
+        for agent, saved in data.items():
+            memory = self._build()
+            memory.chat_memory.messages = messages_from_dict(saved.get("messages", []))
+            if hasattr(memory, "moving_summary_buffer"):
+                memory.moving_summary_buffer = saved.get("summary", "")
+            memories[agent] = memory
+        if data:
+            with self._lock:
+                self._counters["restores"] += 1
+        return memories
+
+    def _user_lock(self, user_id: str) -> threading.Lock:
+        return self._user_locks[hash(user_id) % len(self._user_locks)]
+
+    def _evict(self) -> List:
+        """
+        Pop least recently used users until the store fits, skipping the shared memories
+        (referenced by the agent objects) and users whose lock is busy. Returns
+        (user, memories) pairs whose user lock is held; the caller spills and releases them.
+        Caller holds self._lock.
+        """
+        evicted = []
+        for user_id in list(self._users):
+            if len(self._users) <= self.max_resident_users:
+                break
+            if user_id == SHARED_USER:
+                continue
+            lock = self._user_lock(user_id)
+            if not lock.acquire(blocking=False):
+                continue
+            evicted.append((user_id, self._users.pop(user_id), lock))
+        return evicted
+
+    def _get(self, agent_name: str, user_id: str):
+        # Caller holds the user's lock
+        with self._lock:
+            memories = self._users.get(user_id)
+        if memories is None:
+            memories = self._restore(user_id)
+            with self._lock:
+                self._users[user_id] = memories
+
+        with self._lock:
+            self._users.move_to_end(user_id)
+            evicted = self._evict()
+        for evicted_user, evicted_memories, lock in evicted:
+            try:
+                if evicted_memories:
+                    self._spill(evicted_user, evicted_memories)
+            finally:
+                lock.release()
+
+        if agent_name not in memories:
+            memories[agent_name] = self._build()
+        return memories[agent_name]
+
+    def get(self, agent_name: str, user_id: str = SHARED_USER):
+        with self._user_lock(user_id):
+            return self._get(agent_name, user_id)
+
+    def history(self, agent_name: str, user_id: str) -> List[BaseMessage]:
+        """
+        Messages this memory adds to the next prompt. Records how many tokens they cost.
+        """
+        with self._user_lock(user_id):
+            memory = self._get(agent_name, user_id)
+            messages = memory.load_memory_variables({})["chat_history"]
+        tokens = sum(estimate_tokens(m.content) for m in messages)
+        with self._lock:
+            self._counters["prompt_calls"] += 1
+            self._counters["prompt_tokens"] += tokens
+            self._counters["max_prompt_tokens"] = max(self._counters["max_prompt_tokens"], tokens)
+        return messages
+
+    def remember(self, agent_name: str, user_id: str, user_message: str, reply: str) -> None:
+        # Only this user's lock: with the summary policy save_context makes an LLM call
+        with self._user_lock(user_id):
+            memory = self._get(agent_name, user_id)
+            memory.save_context({"input": user_message}, {"output": reply})
+            if isinstance(memory, ConversationBufferWindowMemory):
+                # The window only limits what is loaded; drop older turns so RAM stays flat too
+                del memory.chat_memory.messages[:-2 * self.window_turns]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self._counters)
+            resident = len(self._users)
+        calls = counters["prompt_calls"]
+        return {
+            "policy": self.policy,
+            "resident_users": resident,
+            "max_resident_users": self.max_resident_users,
+            **counters,
+            "avg_prompt_tokens": round(counters["prompt_tokens"] / calls, 1) if calls else 0.0,
+        }
+
+
+memory_store = AgentMemoryStore(
+    policy=MEMORY_POLICY,
+    window_turns=MEMORY_WINDOW_TURNS,
+    summary_max_tokens=MEMORY_SUMMARY_MAX_TOKENS,
+    max_resident_users=MEMORY_MAX_RESIDENT_USERS,
+    spill_dir=MEMORY_SPILL_DIR,
+)
+
+def get_agent_memory(agent_name: str, user_id: str = SHARED_USER):
+    return memory_store.get(agent_name, user_id)
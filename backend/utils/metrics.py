@@ -0,0 +1,175 @@
+"""
+In-process metrics in the Prometheus text format, plus the per-request trace id.
+
+Histograms and counters are plain locked dicts keyed by label values; render()
+produces the exposition text served on /metrics. The trace id lives in a context
+variable so log lines written anywhere during a request (including worker threads
+that copy the context) carry it.
+"""
+import contextvars
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Seconds; LLM stages run from under a second to several minutes
+LATENCY_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+trace_id_var: contextvars.ContextVar[str] = contextvars.ContextVar("trace_id", default="-")
+
+_registry: List["_Metric"] = []
+_registry_lock = threading.Lock()
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _render_value(self, key, value) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_value(self, key, state) -> List[str]:
+        lines = []
+        for bound, count in zip(self.buckets, state["counts"]):
+            labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+            lines.append(f"{self.name}_bucket{labels} {count}")
+        labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+        lines.append(f"{self.name}_bucket{labels} {state['count']}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {round(state['sum'], 6)}")
+        lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state['count']}")
+        return lines
+
+
+def render() -> str:
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+#  Metrics recorded across the backend
+http_request_seconds = Histogram(
+    "lifecoach_http_request_seconds", "HTTP request latency by route and status.", ("method", "route", "status")
+)
+crew_kickoff_seconds = Histogram(
+    "lifecoach_crew_kickoff_seconds", "Wall time of each Crew.kickoff by workflow stage.", ("stage",)
+)
+task_seconds = Histogram(
+    "lifecoach_task_seconds", "Wall time of each task by workflow stage and agent.", ("stage", "agent")
+)
+agent_seconds = Histogram(
+    "lifecoach_agent_seconds", "Wall time of each agent run (one task execution or streamed chat).", ("agent",)
+)
+llm_call_seconds = Histogram(
+    "lifecoach_llm_call_seconds", "Latency of each LLM round-trip by calling agent.", ("agent",)
+)
+prompt_tokens_total = Counter(
+    "lifecoach_prompt_tokens_total", "Prompt tokens sent to the LLM by agent.", ("agent",)
+)
+completion_tokens_total = Counter(
+    "lifecoach_completion_tokens_total", "Completion tokens generated by the LLM by agent.", ("agent",)
+)
+storage_seconds = Histogram(
+    "lifecoach_storage_seconds", "Storage I/O latency by operation.", ("op",)
+)
+
+
+def new_trace_id(incoming: Optional[str] = None) -> str:
+    """
+    Use the caller's X-Request-ID when it looks sane, otherwise mint one; bind it to the current context.
+    """
+    trace_id = incoming if incoming and len(incoming) <= 64 and incoming.isprintable() else uuid.uuid4().hex[:16]
+    trace_id_var.set(trace_id)
+    return trace_id
+
+
+class TraceIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = trace_id_var.get()
+        return True
+
+
+def configure_logging(level: str = "INFO") -> None:
+    """
+    Route the backend's log lines through one handler whose format includes the trace id.
+    """
+    logger = logging.getLogger("backend")
+    if any(isinstance(f, TraceIdFilter) for h in logger.handlers for f in h.filters):
+        return
+    handler = logging.StreamHandler()
+    handler.addFilter(TraceIdFilter())
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(trace_id)s] %(name)s: %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
@@ -0,0 +1,58 @@
+"""
+Import the file-based plans and chat logs into the SQLite storage engine.
+
+    python -m backend.utils.migrate_storage [--db PATH] [--plan-dir DIR] [--chat-dir DIR]
+
+Each user is imported in one transaction. Re-running the migration replaces
+plans with the same name and that user's chat history rather than duplicating them.
+"""
+import argparse
+
+from backend import config
+from backend.utils.file_storage import FileStorageBackend
+from backend.utils.sqlite_storage import SQLiteStorageBackend
+
+
+def migrate(source: FileStorageBackend, target: SQLiteStorageBackend) -> dict:
+    users = sorted(set(source.list_plan_users()) | set(source.list_chat_users()))
+    totals = {"users": 0, "plans": 0, "messages": 0}
+
+    for user_id in users:
+        plans = {}
+        for plan_name in source.list_plans(user_id):
+            plan = source.load_plan(user_id, plan_name)
+            if plan is not None:
+                plans[plan_name] = plan
+        messages = source.load_chat(user_id)
+
+        target.import_user(user_id, plans, messages)
+        for plan_name in plans:
+            meta = source.load_plan_meta(user_id, plan_name)
+            if meta is not None:
+                target.save_plan_meta(user_id, plan_name, meta)
+        totals["users"] += 1
+        totals["plans"] += len(plans)
+        totals["messages"] += len(messages)
+
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import file-based plans and chats into SQLite.")
+    parser.add_argument("--db", default=config.SQLITE_PATH)
+    parser.add_argument("--plan-dir", default=config.PLAN_DIR)
+    parser.add_argument("--chat-dir", default=config.CHAT_DIR)
+    args = parser.parse_args()
+
+    source = FileStorageBackend(plan_dir=args.plan_dir, chat_dir=args.chat_dir)
+    target = SQLiteStorageBackend(db_path=args.db)
+    try:
+        totals = migrate(source, target)
+    finally:
+        target.close()
+
+    print(f"✅ Imported {totals['plans']} plans and {totals['messages']} messages for {totals['users']} users into {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+A pool of Ollama servers behind the one ChatOllama client every agent shares.
+
+Each host keeps its own requests.Session, so connections are reused instead of
+opened per call. A call goes to the healthy host with the lowest expected wait,
+(in-flight calls + 1) × EWMA time-to-first-byte, so both busy and slow boxes
+get less traffic. A host that fails `max_failures` calls in a row is ejected for
+`eject_seconds`. A background thread probes every host's /api/tags: a failing
+probe ejects a host early and a passing probe brings an ejected host back.
+"""
+import contextvars
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from langchain_community.chat_models import ChatOllama
+from langchain_community.llms.ollama import OllamaEndpointNotFoundError
+
+logger = logging.getLogger(__name__)
+
+# Output cap (Ollama num_predict) for calls made in this context; None keeps the model default
+num_predict_var: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("num_predict", default=None)
+
+
+class NoHealthyHostError(Exception):
+    """Raised when every host in the pool failed the call."""
+
+
+class OllamaHost:
+    def __init__(self, url: str, pool_connections: int):
+        self.url = url.rstrip("/")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_connections)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.in_flight = 0
+        self.ewma_ttfb: Optional[float] = None
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.calls = 0
+        self.failures = 0
+
+    def available(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+
+class OllamaPool:
+    def __init__(
+        self,
+        urls: List[str],
+        pool_connections: int = 16,
+        max_failures: int = 3,
+        eject_seconds: float = 30.0,
+        health_interval: float = 10.0,
+        ewma_alpha: float = 0.3
+    ):
+        if not urls:
+            raise ValueError("OllamaPool needs at least one host")
+        self.hosts = [OllamaHost(url, pool_connections) for url in urls]
+        self.max_failures = max_failures
+        self.eject_seconds = eject_seconds
+        self.health_interval = health_interval
+        self.ewma_alpha = ewma_alpha
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        if health_interval > 0 and len(self.hosts) > 1:
+            threading.Thread(target=self._health_loop, name="ollama-health", daemon=True).start()
+
+    def _expected_wait(self, host: OllamaHost, default_ttfb: float) -> float:
+        ttfb = host.ewma_ttfb if host.ewma_ttfb is not None else default_ttfb
+        return (host.in_flight + 1) * ttfb
+
+    def _choose(self, exclude: List[OllamaHost]) -> Optional[OllamaHost]:
+        now = time.monotonic()
+        candidates = [h for h in self.hosts if h not in exclude and h.available(now)]
+        if not candidates:
+            # Everything is ejected: try the host that comes back soonest rather than failing outright
+            candidates = sorted((h for h in self.hosts if h not in exclude), key=lambda h: h.ejected_until)[:1]
+        if not candidates:
+            return None
+        # Unmeasured hosts are assumed as fast as the fastest measured one, so they get tried
+        known = [h.ewma_ttfb for h in candidates if h.ewma_ttfb is not None]
+        default_ttfb = min(known) if known else 1.0
+        return min(candidates, key=lambda h: (self._expected_wait(h, default_ttfb), h.in_flight))
+
+    @contextmanager
+    def acquire(self, exclude: Optional[List[OllamaHost]] = None):
+        """
+        Reserve the best host for one call; yields None when every host is excluded.
+        """
+        with self._lock:
+            host = self._choose(exclude or [])
+            if host:
+                host.in_flight += 1
+                host.calls += 1
+        try:
+            yield host
+        finally:
+            if host:
+                with self._lock:
+                    host.in_flight -= 1
+
+    def record_success(self, host: OllamaHost, ttfb: float) -> None:
+        with self._lock:
+            host.consecutive_failures = 0
+            host.ejected_until = 0.0
+            if host.ewma_ttfb is None:
+                host.ewma_ttfb = ttfb
+            else:
+                host.ewma_ttfb = self.ewma_alpha * ttfb + (1 - self.ewma_alpha) * host.ewma_ttfb
+
+    def record_failure(self, host: OllamaHost, error: Exception) -> None:
+        with self._lock:
+            host.failures += 1
+            host.consecutive_failures += 1
+            if host.consecutive_failures >= self.max_failures:
+                if host.available(time.monotonic()):
+                    logger.warning("ejecting ollama host %s for %.0fs: %s", host.url, self.eject_seconds, error)
+                host.ejected_until = time.monotonic() + self.eject_seconds
+
+    def _health_loop(self) -> None:
+        while not self._stop.wait(self.health_interval):
+            for host in self.hosts:
+                try:
+                    host.session.get(f"{host.url}/api/tags", timeout=5).raise_for_status()
+                except requests.RequestException as e:
+                    with self._lock:
+                        was_available = host.available(time.monotonic())
+                        host.ejected_until = max(host.ejected_until, time.monotonic() + self.eject_seconds)
+                    if was_available:
+                        logger.warning("ollama host %s failed health check: %s", host.url, e)
+                else:
+                    with self._lock:
+                        if host.ejected_until:
+                            logger.info("ollama host %s is healthy again", host.url)
+                        host.ejected_until = 0.0
+                        host.consecutive_failures = 0
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "hosts": [
+                    {
+                        "url": h.url,
+                        "healthy": h.available(now),
+                        "in_flight": h.in_flight,
+                        "ewma_ttfb_ms": round(h.ewma_ttfb * 1000, 1) if h.ewma_ttfb is not None else None,
+                        "calls": h.calls,
+                        "failures": h.failures,
+                        "ejected_for_seconds": round(max(0.0, h.ejected_until - now), 1),
+                    }
+                    for h in self.hosts
+                ]
+            }
+
+    def close(self) -> None:
+        self._stop.set()
+        for host in self.hosts:
+            host.session.close()
+
+
+class PooledChatOllama(ChatOllama):
+    """
+    ChatOllama whose HTTP calls go through an OllamaPool. base_url stays the first host
+    and only names the API path; the pool decides which server actually answers.
+    A call that fails before streaming starts is retried once on each other host.
+    """
+
+    pool: Any = None
+
+    def _create_stream(
+        self,
+        api_url: str,
+        payload: Any,
+        stop: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> Iterator[str]:
+        if self.stop is not None and stop is not None:
+            raise ValueError("`stop` found in both the input and default params.")
+        elif self.stop is not None:
+            stop = self.stop
+
+        # Same request body as ChatOllama builds
+        params = self._default_params
+        for key in self._default_params:
+            if key in kwargs:
+                params[key] = kwargs[key]
+        if "options" in kwargs:
+            params["options"] = kwargs["options"]
+        else:
+            params["options"] = {
+                **params["options"],
+                "stop": stop,
+                **{k: v for k, v in kwargs.items() if k not in self._default_params},
+            }
+            if num_predict_var.get() is not None:
+                params["options"]["num_predict"] = num_predict_var.get()
+        if payload.get("messages"):
+            request_payload = {"messages": payload.get("messages", []), **params}
+        else:
+            request_payload = {"prompt": payload.get("prompt"), "images": payload.get("images", []), **params}
+
+        path = api_url[len(self.base_url.rstrip("/")):]
+        headers = {"Content-Type": "application/json", **(self.headers if isinstance(self.headers, dict) else {})}
+        return self._stream_from_pool(path, headers, request_payload)
+
+    def _stream_from_pool(self, path: str, headers: Dict, request_payload: Dict) -> Iterator[str]:
+        tried: List[OllamaHost] = []
+        last_error: Optional[Exception] = None
+        while True:
+            with self.pool.acquire(exclude=tried) as host:
+                if host is None:
+                    if isinstance(last_error, OllamaEndpointNotFoundError):
+                        raise last_error
+                    raise NoHealthyHostError(f"All Ollama hosts failed; last error: {last_error}")
+                tried.append(host)
+
+                start = time.perf_counter()
+                try:
+                    response = host.session.post(
+                        url=host.url + path, headers=headers, json=request_payload, stream=True, timeout=self.timeout
+                    )
+                except requests.RequestException as e:
+                    self.pool.record_failure(host, e)
+                    last_error = e
+                    continue
+
+                if response.status_code != 200:
+                    # Read the error body before closing: a streamed response has none afterwards
+                    details = response.text
+                    response.close()
+                    if response.status_code == 404:
+                        last_error = OllamaEndpointNotFoundError(
+                            "Ollama call failed with status code 404. "
+                            "Maybe your model is not found "
+                            f"and you should pull the model with `ollama pull {self.model}`."
+                        )
+                    else:
+                        last_error = ValueError(
+                            f"Ollama call failed with status code {response.status_code} on {host.url}."
+                            f" Details: {details}"
+                        )
+                        # A rejected request is not the host's fault, and another host would reject it too
+                        if 400 <= response.status_code < 500:
+                            raise last_error
+                    self.pool.record_failure(host, last_error)
+                    continue
+
+                self.pool.record_success(host, time.perf_counter() - start)
+                response.encoding = "utf-8"
+                try:
+                    # The host stays reserved (in_flight) until the whole stream is read
+                    yield from response.iter_lines(decode_unicode=True)
+                except requests.RequestException as e:
+                    self.pool.record_failure(host, e)
+                    raise
+                finally:
+                    response.close()
+                return
@@ -1,65 +1,138 @@
-
-import os
+import hashlib
 import json
+from typing import Callable, Optional
+
+from backend.utils.storage_backend import get_storage
+from backend.utils.metrics import storage_seconds
+from backend.utils.search_index import search_index
+
+
+class PlanConflictError(Exception):
+    """Raised when an If-Match ETag no longer matches the stored plan."""
+
+    def __init__(self, current_etag: str):
+        super().__init__(f"plan changed; current ETag is {current_etag}")
+        self.current_etag = current_etag
+
 
-def get_user_plan_dir(user_id: str) -> str:
+class PlanNotPatchableError(Exception):
+    """Raised when sections are patched into a plan that was saved as plain text."""
+
+
+def make_etag(data) -> str:
+    """
+    Strong ETag over the canonical JSON form, so it is the same for equal content on every backend.
     """
-    Returns the directory path for storing user-specific plans.
-    Creates it if it doesn't exist.
+    canonical = json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return '"' + hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32] + '"'
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """
+    True if an If-Match / If-None-Match header lists this ETag (or is "*"). Weak prefixes are ignored.
     """
-    directory = f"saved_plans/{user_id}"
-    os.makedirs(directory, exist_ok=True)
-    return directory
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
 
-def save_plan(user_id: str, plan_name: str, plan_data: dict | str) -> None:
+def save_plan(user_id: str, plan_name: str, plan_data: dict | str, meta: Optional[dict] = None) -> None:
     """
-    Save a plan (dict or str) as a JSON file for the user.
+    Save a plan (dict or str) for the user, and with `meta` its generation record in the same step.
     """
-    directory = get_user_plan_dir(user_id)
-    path = os.path.join(directory, f"{plan_name}.json")
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(plan_data, f, ensure_ascii=False, indent=2)
+    with search_index.updating(user_id) as index:
+        with storage_seconds.time(op="save_plan"):
+            get_storage().save_plan(user_id, plan_name, plan_data, meta)
+        if index:
+            index.set_plan(plan_name, plan_data)
 
 def load_plan(user_id: str, plan_name: str) -> dict | str | None:
     """
     Load a saved plan (returns dict or str depending on how it was saved).
     """
-    path = os.path.join(get_user_plan_dir(user_id), f"{plan_name}.json")
-    if not os.path.exists(path):
-        return None
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except json.JSONDecodeError:
-        return None
+    with storage_seconds.time(op="load_plan"):
+        return get_storage().load_plan(user_id, plan_name)
 
 def list_saved_plans(user_id: str) -> list[str]:
     """
-    List all saved plan names (excluding .json extension) for a user.
+    List all saved plan names for a user.
     """
-    directory = get_user_plan_dir(user_id)
-    return [f[:-5] for f in os.listdir(directory) if f.endswith(".json")]
+    return get_storage().list_plans(user_id)
 
 
 def delete_plan(user_id: str, plan_name: str) -> bool:
     """
-    Delete a specific saved plan file.
+    Delete a specific saved plan.
     Returns True if deleted, False if it didn't exist.
     """
-    path = os.path.join(get_user_plan_dir(user_id), f"{plan_name}.json")
-    if os.path.exists(path):
-        os.remove(path)
-        return True
-    return False
+    with search_index.updating(user_id) as index:
+        deleted = get_storage().delete_plan(user_id, plan_name)
+        if index:
+            index.remove_plan(plan_name)
+    return deleted
+
+def save_plan_meta(user_id: str, plan_name: str, meta: dict) -> None:
+    """
+    Record how a plan was generated: its inputs and a fingerprint per section.
+    """
+    get_storage().save_plan_meta(user_id, plan_name, meta)
+
+def load_plan_meta(user_id: str, plan_name: str) -> dict | None:
+    return get_storage().load_plan_meta(user_id, plan_name)
+
+def modify_plan_meta(user_id: str, plan_name: str, modify: Callable[[Optional[dict]], Optional[dict]]) -> dict | None:
+    """
+    Read, change and write a plan's metadata atomically; `modify` returns None to leave it as is.
+    """
+    return get_storage().modify_plan_meta(user_id, plan_name, modify)
 
-def update_plan(user_id: str, plan_name: str, new_plan_data: dict) -> bool:
+def _check_if_match(current, if_match: Optional[str]) -> None:
+    if if_match is not None and not etag_matches(if_match, make_etag(current)):
+        raise PlanConflictError(make_etag(current))
+
+def update_plan(
+    user_id: str,
+    plan_name: str,
+    new_plan_data: dict | str,
+    if_match: Optional[str] = None,
+    meta: Optional[dict] = None
+) -> dict | str | None:
+    """
+    Replace an existing plan with new data (and with `meta` its generation record, in the same step).
+    Returns the stored plan, or None if the plan does not exist.
+    With if_match, raises PlanConflictError unless the stored plan still has that ETag.
+    """
+    def replace(current):
+        _check_if_match(current, if_match)
+        return new_plan_data
+
+    with search_index.updating(user_id) as index:
+        with storage_seconds.time(op="update_plan"):
+            plan = get_storage().modify_plan(user_id, plan_name, replace, meta)
+        if index and plan is not None:
+            index.set_plan(plan_name, plan)
+    return plan
+
+def patch_plan(user_id: str, plan_name: str, sections: dict, if_match: Optional[str] = None) -> dict | None:
     """
-    Update an existing plan with new data.
-    Returns True if updated, False if the plan does not exist.
+    Set the given sections (e.g. {"finance_plan": "..."}) and leave the rest of the plan as is;
+    a section set to None is removed. Read, merge and write happen atomically.
+    Returns the merged plan, or None if the plan does not exist.
     """
-    path = os.path.join(get_user_plan_dir(user_id), f"{plan_name}.json")
-    if os.path.exists(path):
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(new_plan_data, f, ensure_ascii=False, indent=2)
-        return True
-    return False
+    def merge(current):
+        _check_if_match(current, if_match)
+        if not isinstance(current, dict):
+            raise PlanNotPatchableError(f"plan '{plan_name}' is plain text and has no sections")
+        merged = dict(current)
+        for section, value in sections.items():
+            if value is None:
+                merged.pop(section, None)
+            else:
+                merged[section] = value
+        return merged
+
+    with search_index.updating(user_id) as index:
+        with storage_seconds.time(op="patch_plan"):
+            plan = get_storage().modify_plan(user_id, plan_name, merge)
+        if index and plan is not None:
+            index.set_plan(plan_name, plan)
+    return plan
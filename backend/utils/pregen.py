@@ -0,0 +1,272 @@
+"""
+Next-day plan pre-generation.
+
+Users come back each morning for that day's part of their v1 plan. The
+pre-generator remembers each active user's latest plan. During an off-peak window
+it generates the coming day's sections ahead of time as background work in the
+fair scheduler, so it only gets slots that no chat or plan request is waiting for.
+The result is kept in the plan's meta record (stored with the plan, deleted with it)
+and served straight from storage when the user asks for that day.
+
+With several worker processes, each one records the users it served and merges
+them into the shared state file when it flushes. Only one worker at a time runs
+a pass, so a user's day is not generated once per worker.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from backend.utils.file_lock import file_lock, write_json_atomic
+from backend.utils.metrics import Counter
+from backend.utils.plan_storage import load_plan_meta, modify_plan_meta
+from backend.utils.scheduler import AdmissionError, BACKGROUND, BATCH, INTERACTIVE
+
+logger = logging.getLogger(__name__)
+
+pregen_requests_total = Counter(
+    "lifecoach_pregen_requests_total", "Daily plan requests by whether the day was pre-generated.", ("result",)
+)
+pregen_jobs_total = Counter(
+    "lifecoach_pregen_jobs_total", "Background next-day generations by outcome.", ("outcome",)
+)
+
+
+def parse_window(window: str) -> Tuple[int, int]:
+    """
+    "HH:MM-HH:MM" as minutes since midnight; the window may wrap past midnight.
+    """
+    start, end = window.split("-")
+    to_minutes = lambda hhmm: int(hhmm.split(":")[0]) * 60 + int(hhmm.split(":")[1])
+    return to_minutes(start.strip()), to_minutes(end.strip())
+
+def program_day(meta: Dict, day: date) -> int:
+    """
+    Which day of the program `day` is, counting the day the plan was generated as day 1.
+    """
+    created = date.fromisoformat(meta.get("created") or day.isoformat())
+    return max(1, (day - created).days + 1)
+
+
+class NextDayPregenerator:
+    def __init__(
+        self,
+        scheduler,
+        generate_day: Callable[[Dict, int], Dict],
+        day_cost: int,
+        state_path: str,
+        day_slots: int = 1,
+        window: str = "01:00-06:00",
+        interval: float = 300.0,
+        concurrency: int = 1,
+        max_per_run: int = 50,
+        active_days: int = 7
+    ):
+        self.scheduler = scheduler
+        self.generate_day = generate_day
+        self.day_cost = day_cost
+        # Scheduler slots per day: its sections are generated in parallel
+        self.day_slots = day_slots
+        self.state_path = state_path
+        self.window = parse_window(window)
+        self.interval = interval
+        self.concurrency = max(1, concurrency)
+        self.max_per_run = max_per_run
+        self.active_days = active_days
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        # user id -> {"plan": latest v1 plan name, "last_seen": epoch seconds}
+        self._active: Dict[str, Dict] = self._load_state()
+        self._dirty = False
+        self._counts = {"hits": 0, "misses": 0}
+        self.last_run: Optional[Dict] = None
+
+    # --- Activity ---
+    def _load_state(self) -> Dict[str, Dict]:
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def record_activity(self, user_id: str, plan_name: str) -> None:
+        with self._lock:
+            self._active[user_id] = {"plan": plan_name, "last_seen": time.time()}
+            self._dirty = True
+
+    def flush(self) -> None:
+        """
+        Merge this worker's activity with the state file (latest last_seen wins), drop users
+        inactive for longer than active_days and write the result atomically.
+        Afterwards this worker also knows the users the other workers have seen.
+        """
+        cutoff = time.time() - self.active_days * 86400
+        with self._lock:
+            snapshot = dict(self._active)
+            dirty, self._dirty = self._dirty, False
+
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        with file_lock(f"{self.state_path}.lock"):
+            stored = self._load_state()
+            merged = dict(stored)
+            for user, entry in snapshot.items():
+                if user not in merged or merged[user]["last_seen"] < entry["last_seen"]:
+                    merged[user] = entry
+            merged = {user: entry for user, entry in merged.items() if entry["last_seen"] >= cutoff}
+            if dirty or merged != stored:
+                write_json_atomic(self.state_path, merged)
+
+        with self._lock:
+            for user, entry in merged.items():
+                if user not in self._active or self._active[user]["last_seen"] < entry["last_seen"]:
+                    self._active[user] = entry
+            for user in [user for user, entry in self._active.items() if entry["last_seen"] < cutoff]:
+                del self._active[user]
+
+    # --- Window ---
+    def in_window(self, now: Optional[datetime] = None) -> bool:
+        now = now or datetime.now()
+        minute = now.hour * 60 + now.minute
+        start, end = self.window
+        return start <= minute < end if start <= end else minute >= start or minute < end
+
+    @staticmethod
+    def target_date(now: Optional[datetime] = None) -> date:
+        # The day whose morning comes next: today before noon, tomorrow after
+        return ((now or datetime.now()) + timedelta(hours=12)).date()
+
+    # --- Generation ---
+    def _store(self, user_id: str, plan_name: str, inputs: Dict, day: date, number: int, sections: Dict) -> None:
+        # Keep the result only if the plan still exists with the inputs it was generated from;
+        # checked and written in one step, so a concurrent regenerate or overwrite is never undone
+        def add_day(meta):
+            if meta is None or meta.get("inputs") != inputs:
+                return None
+            return {**meta, "next_day": {"date": day.isoformat(), "day": number, "sections": sections}}
+
+        modify_plan_meta(user_id, plan_name, add_day)
+
+    def get_day(self, user_id: str, plan_name: str, meta: Dict, day: date, requester: str) -> Dict:
+        """
+        The sections for `day` of a saved v1 plan: pre-generated if available, otherwise generated now.
+        """
+        cached = meta.get("next_day")
+        if cached and cached.get("date") == day.isoformat():
+            pregen_requests_total.inc(result="hit")
+            with self._lock:
+                self._counts["hits"] += 1
+            return {**cached, "pregenerated": True}
+
+        pregen_requests_total.inc(result="miss")
+        with self._lock:
+            self._counts["misses"] += 1
+        number = program_day(meta, day)
+        sections = self.scheduler.run(
+            requester, BATCH, self.day_cost, self.generate_day, meta["inputs"], number, slots=self.day_slots
+        )
+        self._store(user_id, plan_name, meta["inputs"], day, number, sections)
+        return {"date": day.isoformat(), "day": number, "sections": sections, "pregenerated": False}
+
+    def _candidates(self, day: date) -> List[Tuple[str, str, Dict]]:
+        with self._lock:
+            active = sorted(self._active.items(), key=lambda item: item[1]["last_seen"], reverse=True)
+        cutoff = time.time() - self.active_days * 86400
+        candidates = []
+        for user_id, entry in active:
+            if entry["last_seen"] < cutoff or len(candidates) >= self.max_per_run:
+                break
+            meta = load_plan_meta(user_id, entry["plan"])
+            if not meta or meta.get("workflow") != "v1":
+                continue
+            if (meta.get("next_day") or {}).get("date") == day.isoformat():
+                continue
+            candidates.append((user_id, entry["plan"], meta))
+        return candidates
+
+    def _busy(self) -> bool:
+        queued = self.scheduler.stats()["queued"]
+        return bool(queued[INTERACTIVE] or queued[BATCH])
+
+    def _pregenerate(self, user_id: str, plan_name: str, meta: Dict, day: date) -> str:
+        # Leave the slot to users who are waiting right now; the next pass picks this up
+        if self._stop.is_set() or self._busy():
+            return "deferred"
+        number = program_day(meta, day)
+        try:
+            sections = self.scheduler.run(
+                f"pregen:{user_id}", BACKGROUND, self.day_cost, self.generate_day, meta["inputs"], number,
+                slots=self.day_slots
+            )
+        except AdmissionError:
+            return "deferred"
+        except Exception as e:
+            logger.warning("pre-generating %s/%s failed: %s", user_id, plan_name, e)
+            return "failed"
+        self._store(user_id, plan_name, meta["inputs"], day, number, sections)
+        return "generated"
+
+    def run_once(self, now: Optional[datetime] = None) -> Dict:
+        """
+        One pass: inside the window, pre-generate the coming day for active users that lack it.
+        """
+        now = now or datetime.now()
+        if not self.in_window(now):
+            return {"status": "outside window"}
+
+        with file_lock(f"{self.state_path}.run.lock", blocking=False) as fd:
+            if fd is None:
+                return {"status": "running in another worker"}
+            return self._run_pass(now)
+
+    def _run_pass(self, now: datetime) -> Dict:
+        day = self.target_date(now)
+        candidates = self._candidates(day)
+        outcomes = {"generated": 0, "failed": 0, "deferred": 0}
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="pregen") as pool:
+            futures = [pool.submit(self._pregenerate, user_id, plan_name, meta, day) for user_id, plan_name, meta in candidates]
+            for future in futures:
+                outcome = future.result()
+                outcomes[outcome] += 1
+                pregen_jobs_total.inc(outcome=outcome)
+
+        summary = {"status": "ran", "date": day.isoformat(), "candidates": len(candidates), **outcomes}
+        if candidates:
+            logger.info("pre-generation for %s: %s", day.isoformat(), summary)
+        self.last_run = summary
+        return summary
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                # Flush first, so the pass also covers users other workers have seen
+                self.flush()
+                self.run_once()
+            except Exception:
+                logger.exception("pre-generation pass failed")
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self._loop, name="pregen", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.flush()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hits, misses = self._counts["hits"], self._counts["misses"]
+            return {
+                "active_users": len(self._active),
+                "window": "%02d:%02d-%02d:%02d" % (self.window[0] // 60, self.window[0] % 60, self.window[1] // 60, self.window[1] % 60),
+                "in_window": self.in_window(),
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+                "last_run": self.last_run,
+            }
@@ -0,0 +1,161 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from backend.config import (
+    RETRIEVAL_INDEX_DIR, RETRIEVAL_MAX_RESIDENT_USERS, RETRIEVAL_MIN_SCORE
+)
+from backend.utils.chat_storage import load_chat
+from backend.utils.embeddings import EMBEDDING_DIM, embed_text
+from backend.utils.file_lock import bump_generation, file_lock, read_generation
+
+
+def turn_text(message: Dict) -> str:
+    return f"{message.get('user', '')}\n{message.get('agent', '')}"
+
+
+class _UserIndex:
+    def __init__(self):
+        import faiss
+
+        self.index = faiss.IndexFlatIP(EMBEDDING_DIM)
+        self.turns: List[Dict] = []
+        self.generation = 0
+
+
+class ChatRetrievalIndex:
+    """
+    Per-user FAISS index over stored chat turns, used to pull the few most
+    relevant past exchanges into a prompt instead of the whole history.
+
+    On disk each user has `<user>.vec` (raw float32 embeddings, appended per turn)
+    and `<user>.jsonl` (the matching turns), so adding a turn is two appends and
+    never a rebuild. A user's index is backfilled from chat storage the first time
+    it is needed, and only `max_resident_users` indexes are kept in memory.
+
+    Worker processes share the files: writes hold `<user>.lock` and bump the
+    generation it carries, and a resident index whose generation is behind the
+    file's is reloaded from disk before use.
+
+    Within a process each user is guarded by a striped lock, so one user's backfill,
+    embedding or wait on the lock file never holds up another user's lookups; the
+    shared lock only covers the resident-index table.
+    """
+
+    def __init__(self, index_dir: str, max_resident_users: int, min_score: float, lock_stripes: int = 64):
+        self.index_dir = index_dir
+        self.max_resident_users = max_resident_users
+        self.min_score = min_score
+        self._users: "OrderedDict[str, _UserIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._user_locks = [threading.Lock() for _ in range(lock_stripes)]
+
+    def _user_lock(self, user_id: str) -> threading.Lock:
+        return self._user_locks[hash(user_id) % len(self._user_locks)]
+
+    def _paths(self, user_id: str):
+        base = os.path.join(self.index_dir, user_id)
+        return f"{base}.vec", f"{base}.jsonl"
+
+    def _lock_path(self, user_id: str) -> str:
+        return os.path.join(self.index_dir, f"{user_id}.lock")
+
+    def _append_to_disk(self, user_id: str, vectors: np.ndarray, turns: List[Dict]) -> None:
+        os.makedirs(self.index_dir, exist_ok=True)
+        vec_path, turns_path = self._paths(user_id)
+        with open(turns_path, "a", encoding="utf-8") as f:
+            for turn in turns:
+                f.write(json.dumps(turn, ensure_ascii=False) + "\n")
+        with open(vec_path, "ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+
+    def _load(self, user_id: str, lock_fd: int) -> _UserIndex:
+        # Caller holds the user's lock file
+        user_index = _UserIndex()
+        user_index.generation = read_generation(self._lock_path(user_id))
+        vec_path, turns_path = self._paths(user_id)
+
+        if os.path.exists(vec_path) and os.path.exists(turns_path):
+            vectors = np.fromfile(vec_path, dtype=np.float32).reshape(-1, EMBEDDING_DIM)
+            with open(turns_path, "r", encoding="utf-8") as f:
+                turns = [json.loads(line) for line in f if line.strip()]
+            count = min(len(vectors), len(turns))
+            user_index.index.add(vectors[:count])
+            user_index.turns = turns[:count]
+        else:
+            history = load_chat(user_id)
+            if history:
+                vectors = np.vstack([embed_text(turn_text(m)) for m in history])
+                user_index.index.add(vectors)
+                user_index.turns = list(history)
+                self._append_to_disk(user_id, vectors, history)
+                user_index.generation = bump_generation(lock_fd)
+        return user_index
+
+    def _get(self, user_id: str, lock_fd: Optional[int] = None) -> _UserIndex:
+        # Caller holds the user's lock, and lock_fd if it already holds the user's lock file
+        with self._lock:
+            user_index = self._users.get(user_id)
+        if user_index is None or user_index.generation != read_generation(self._lock_path(user_id)):
+            if lock_fd is None:
+                with file_lock(self._lock_path(user_id)) as fd:
+                    user_index = self._load(user_id, fd)
+            else:
+                user_index = self._load(user_id, lock_fd)
+        with self._lock:
+            self._users[user_id] = user_index
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_resident_users:
+                self._users.popitem(last=False)
+        return user_index
+
+    def add_turn(self, user_id: str, message: Dict) -> None:
+        """
+        Index one new chat turn. Call before the turn is written to chat storage,
+        so a first-time backfill does not pick it up twice.
+        """
+        vector = embed_text(turn_text(message))[np.newaxis, :]
+        with self._user_lock(user_id), file_lock(self._lock_path(user_id)) as fd:
+            user_index = self._get(user_id, fd)
+            user_index.index.add(vector)
+            user_index.turns.append(message)
+            self._append_to_disk(user_id, vector, [message])
+            user_index.generation = bump_generation(fd)
+
+    def search(self, user_id: str, query: str, k: int) -> List[Dict]:
+        """
+        Up to k past turns most similar to `query`, best first, each with a "score".
+        """
+        if k <= 0:
+            return []
+        vector = embed_text(query)[np.newaxis, :]
+        with self._user_lock(user_id):
+            user_index = self._get(user_id)
+            if user_index.index.ntotal == 0:
+                return []
+            scores, ids = user_index.index.search(vector, min(k, user_index.index.ntotal))
+            return [
+                {**user_index.turns[idx], "score": round(float(score), 4)}
+                for score, idx in zip(scores[0], ids[0])
+                if idx >= 0 and score >= self.min_score
+            ]
+
+    def drop(self, user_id: str) -> None:
+        with self._user_lock(user_id), file_lock(self._lock_path(user_id)) as fd:
+            with self._lock:
+                self._users.pop(user_id, None)
+            for path in self._paths(user_id):
+                if os.path.exists(path):
+                    os.remove(path)
+            bump_generation(fd)
+
+
+chat_index = ChatRetrievalIndex(
+    index_dir=RETRIEVAL_INDEX_DIR,
+    max_resident_users=RETRIEVAL_MAX_RESIDENT_USERS,
+    min_score=RETRIEVAL_MIN_SCORE,
+)
@@ -0,0 +1,278 @@
+"""
+Admission control and fair sharing of the LLM between users.
+
+Every piece of LLM work asks the scheduler for a slot first:
+
+    with scheduler.admit(user_id, INTERACTIVE, cost_tokens):
+        ...run the agent...
+
+- Priority classes: a free slot always goes to waiting interactive work (chat) before
+  batch work (plan generation), and batch work may hold at most `batch_slots` of the
+  `slots`, so a few long plans can never occupy every slot. Background work
+  (pre-generation) comes last and may hold at most `background_slots`.
+- Weighted fair queuing: within a class, each job gets a virtual finish tag
+  max(class virtual time, user's previous finish tag) + cost / weight, and the smallest
+  tag runs next. A user submitting plans in a loop queues behind their own earlier work,
+  not in front of everyone else's.
+- Per-user limits: at most `max_running_per_user` running and `max_queued_per_user`
+  waiting jobs per class, and a token bucket of `tokens_per_minute` estimated tokens.
+- Backpressure: when a queue or bucket is full, or a job waits longer than `max_wait`,
+  AdmissionError carries a Retry-After estimate instead of letting latency grow.
+- Wide jobs: a plan whose steps run in parallel asks for several slots at once (at most
+  its class's share) and starts only when all are free; `granted_slots_var` tells the
+  plan's task graph how many steps it may run at the same time.
+"""
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from backend.utils.metrics import Counter, Histogram
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+BACKGROUND = "background"
+PRIORITY_ORDER = (INTERACTIVE, BATCH, BACKGROUND)
+
+scheduler_wait_seconds = Histogram(
+    "lifecoach_scheduler_wait_seconds", "Time LLM work waited for a scheduler slot.", ("priority",)
+)
+scheduler_rejections_total = Counter(
+    "lifecoach_scheduler_rejections_total", "LLM work turned away by admission control.", ("priority", "reason")
+)
+
+# Slots held by the admitted work running in this context; None outside admit()
+granted_slots_var: contextvars.ContextVar = contextvars.ContextVar("granted_slots", default=None)
+
+
+class AdmissionError(Exception):
+    """Raised when work is rejected; retry_after is a whole number of seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _TokenBucket:
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def seconds_until(self, cost: float, now: float) -> float:
+        self._refill(now)
+        # A job bigger than the whole bucket is admitted once the bucket is full
+        needed = min(cost, self.capacity)
+        return 0.0 if self.tokens >= needed else (needed - self.tokens) / self.rate
+
+    def take(self, cost: float) -> None:
+        self.tokens -= cost
+
+
+class _Ticket:
+    def __init__(self, user_id: str, priority: str, cost: float, slots: int, start_tag: float, finish_tag: float):
+        self.user_id = user_id
+        self.priority = priority
+        self.cost = cost
+        self.slots = slots
+        self.start_tag = start_tag
+        self.finish_tag = finish_tag
+        self.enqueued = time.monotonic()
+        self.granted = threading.Event()
+
+
+class FairScheduler:
+    def __init__(
+        self,
+        slots: int = 3,
+        batch_slots: int = 2,
+        background_slots: int = 1,
+        max_queued: int = 32,
+        max_running_per_user: int = 1,
+        max_queued_per_user: int = 4,
+        tokens_per_minute: float = 30000,
+        max_wait: float = 120.0,
+        user_weights: Optional[Dict[str, float]] = None
+    ):
+        self.slots = slots
+        self.class_slots = {
+            INTERACTIVE: slots,
+            BATCH: min(batch_slots, slots),
+            BACKGROUND: min(background_slots, batch_slots, slots),
+        }
+        self.max_queued = max_queued
+        self.max_running_per_user = max_running_per_user
+        self.max_queued_per_user = max_queued_per_user
+        self.tokens_per_minute = tokens_per_minute
+        self.max_wait = max_wait
+        self.user_weights = user_weights or {}
+
+        self._lock = threading.Lock()
+        self._queues: Dict[str, List[_Ticket]] = {p: [] for p in PRIORITY_ORDER}
+        self._running: Dict[str, int] = {p: 0 for p in PRIORITY_ORDER}
+        self._running_by_user: Dict[tuple, int] = {}
+        self._virtual_time: Dict[str, float] = {p: 0.0 for p in PRIORITY_ORDER}
+        self._last_finish: Dict[tuple, float] = {}
+        self._buckets: Dict[str, _TokenBucket] = {}
+        # EWMA of how long a job holds its slot, for Retry-After estimates
+        self._service_seconds: Dict[str, float] = {INTERACTIVE: 5.0, BATCH: 60.0, BACKGROUND: 60.0}
+        self._counts = {"admitted": 0, "rejected": 0}
+
+    # --- Admission ---
+    def _bucket(self, user_id: str) -> _TokenBucket:
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = _TokenBucket(self.tokens_per_minute / 60, self.tokens_per_minute)
+        return bucket
+
+    def _queue_retry_after(self, priority: str, ahead: int) -> int:
+        seconds = (ahead + 1) * self._service_seconds[priority] / max(1, self.class_slots[priority])
+        return max(1, min(600, math.ceil(seconds)))
+
+    def _reject(self, priority: str, reason: str, retry_after: float) -> AdmissionError:
+        self._counts["rejected"] += 1
+        scheduler_rejections_total.inc(priority=priority, reason=reason)
+        return AdmissionError(reason, max(1, math.ceil(retry_after)))
+
+    def _check_locked(self, user_id: str, priority: str, cost: float) -> None:
+        queue = self._queues[priority]
+        if len(queue) >= self.max_queued:
+            raise self._reject(priority, "queue_full", self._queue_retry_after(priority, len(queue)))
+        user_queued = sum(1 for t in queue if t.user_id == user_id)
+        if user_queued >= self.max_queued_per_user:
+            raise self._reject(priority, "user_queue_full", self._queue_retry_after(priority, user_queued))
+        wait = self._bucket(user_id).seconds_until(cost, time.monotonic())
+        if wait > 0:
+            raise self._reject(priority, "rate_limited", wait)
+
+    def check(self, user_id: str, priority: str, cost: float) -> None:
+        """
+        Raise AdmissionError if this work would be rejected right now, without queuing or charging it.
+        Lets streaming endpoints answer 429 before they start a response.
+        """
+        with self._lock:
+            self._check_locked(user_id, priority, cost)
+
+    @contextmanager
+    def admit(self, user_id: str, priority: str, cost: float, slots: int = 1):
+        """
+        Queue the work, block until it is granted `slots` slots (capped at its class's share),
+        and hold them for the body of the with-block.
+        Raises AdmissionError when rejected up front or when the wait exceeds max_wait.
+        """
+        ticket = self._enqueue(user_id, priority, cost, max(1, min(slots, self.class_slots[priority])))
+        if not ticket.granted.wait(self.max_wait):
+            with self._lock:
+                if not ticket.granted.is_set():
+                    queue = self._queues[priority]
+                    queue.remove(ticket)
+                    raise self._reject(priority, "wait_timeout", self._queue_retry_after(priority, len(queue)))
+
+        waited = time.monotonic() - ticket.enqueued
+        scheduler_wait_seconds.observe(waited, priority=priority)
+        started = time.monotonic()
+        # Set rather than reset: a streaming body may resume in a different context
+        previous = granted_slots_var.get()
+        granted_slots_var.set(ticket.slots)
+        try:
+            yield
+        finally:
+            granted_slots_var.set(previous)
+            self._release(ticket, time.monotonic() - started)
+
+    def run(self, user_id: str, priority: str, cost: float, fn, *args, slots: int = 1):
+        """
+        fn(*args) inside admitted slots.
+        """
+        with self.admit(user_id, priority, cost, slots):
+            return fn(*args)
+
+    def _enqueue(self, user_id: str, priority: str, cost: float, slots: int) -> _Ticket:
+        with self._lock:
+            self._check_locked(user_id, priority, cost)
+            self._bucket(user_id).take(cost)
+
+            key = (priority, user_id)
+            weight = self.user_weights.get(user_id, 1.0)
+            start_tag = max(self._virtual_time[priority], self._last_finish.get(key, 0.0))
+            ticket = _Ticket(user_id, priority, cost, slots, start_tag, start_tag + cost / weight)
+            self._last_finish[key] = ticket.finish_tag
+            self._queues[priority].append(ticket)
+            self._counts["admitted"] += 1
+            self._dispatch()
+        return ticket
+
+    # --- Dispatch ---
+    def _dispatch(self) -> None:
+        """
+        Grant free slots, interactive first, smallest finish tag first, skipping users at their running limit.
+        Called with the lock held.
+        """
+        while sum(self._running.values()) < self.slots:
+            free = self.slots - sum(self._running.values())
+            granted = False
+            for priority in PRIORITY_ORDER:
+                if self._running[priority] >= self.class_slots[priority]:
+                    continue
+                eligible = [
+                    t for t in self._queues[priority]
+                    if self._running_by_user.get((priority, t.user_id), 0) < self.max_running_per_user
+                ]
+                if not eligible:
+                    continue
+                ticket = min(eligible, key=lambda t: t.finish_tag)
+                # A wide job waits until all its slots are free rather than being overtaken by narrower ones
+                if ticket.slots > free or self._running[priority] + ticket.slots > self.class_slots[priority]:
+                    continue
+                self._queues[priority].remove(ticket)
+                self._running[priority] += ticket.slots
+                key = (priority, ticket.user_id)
+                self._running_by_user[key] = self._running_by_user.get(key, 0) + 1
+                # Virtual time follows the start tag of the work in service
+                self._virtual_time[priority] = max(self._virtual_time[priority], ticket.start_tag)
+                ticket.granted.set()
+                granted = True
+                break
+            if not granted:
+                return
+
+    def _release(self, ticket: _Ticket, held_seconds: float) -> None:
+        with self._lock:
+            priority = ticket.priority
+            self._running[priority] -= ticket.slots
+            key = (priority, ticket.user_id)
+            self._running_by_user[key] -= 1
+            if not self._running_by_user[key]:
+                del self._running_by_user[key]
+            self._service_seconds[priority] = 0.8 * self._service_seconds[priority] + 0.2 * held_seconds
+            self._prune(priority)
+            self._dispatch()
+
+    def _prune(self, priority: str) -> None:
+        # A user's finish tag only matters while it is ahead of the class's virtual time
+        virtual_time = self._virtual_time[priority]
+        for key in [k for k, tag in self._last_finish.items() if k[0] == priority and tag <= virtual_time]:
+            del self._last_finish[key]
+        full = [user for user, bucket in self._buckets.items() if bucket.seconds_until(bucket.capacity, time.monotonic()) == 0]
+        for user in full:
+            del self._buckets[user]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "slots": self.slots,
+                "class_slots": dict(self.class_slots),
+                "running": dict(self._running),
+                "queued": {p: len(q) for p, q in self._queues.items()},
+                "queued_users": {p: len({t.user_id for t in q}) for p, q in self._queues.items()},
+                "avg_service_seconds": {p: round(s, 2) for p, s in self._service_seconds.items()},
+                **self._counts,
+            }
@@ -0,0 +1,242 @@
+import heapq
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from backend.config import SEARCH_MAX_RESIDENT_USERS
+from backend.utils.storage_backend import get_storage
+
+TOKEN = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have i in is it its me my of on or so that the this to was "
+    "what when with you your".split()
+)
+SNIPPET_CHARS = 160
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+def plan_documents(plan_name: str, plan) -> Dict[str, Dict]:
+    """
+    One document per plan section; a plain-text plan is a single "plan" section.
+    """
+    sections = plan if isinstance(plan, dict) else {"plan": plan}
+    return {
+        f"plan:{plan_name}:{section}": {"kind": "plan", "plan": plan_name, "section": section, "text": str(text)}
+        for section, text in sections.items()
+        if text
+    }
+
+def chat_document(position: int, message: Dict) -> Dict:
+    return {
+        "kind": "chat",
+        "turn": position,
+        "message": message,
+        "text": f"{message.get('user', '')}\n{message.get('agent', '')}",
+    }
+
+
+class _UserSearchIndex:
+    """
+    Inverted index for one user: term -> {doc id: term frequency}, plus each document's length.
+    `generation` is the storage generation the index reflects.
+    """
+
+    def __init__(self, generation: int = 0):
+        self.lock = threading.Lock()
+        self.generation = generation
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.docs: Dict[str, Dict] = {}
+        self.doc_terms: Dict[str, List[str]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.plan_docs: Dict[str, List[str]] = {}
+        self.total_length = 0
+        self.chat_turns = 0
+
+    def _add(self, doc_id: str, doc: Dict) -> None:
+        self._remove(doc_id)
+        terms = Counter(tokenize(doc["text"]))
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        self.docs[doc_id] = doc
+        self.doc_terms[doc_id] = list(terms)
+        self.doc_lengths[doc_id] = sum(terms.values())
+        self.total_length += self.doc_lengths[doc_id]
+
+    def _remove(self, doc_id: str) -> None:
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self.postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self.postings[term]
+        del self.docs[doc_id]
+        self.total_length -= self.doc_lengths.pop(doc_id)
+
+    def _remove_plan(self, plan_name: str) -> None:
+        for doc_id in self.plan_docs.pop(plan_name, []):
+            self._remove(doc_id)
+
+    # --- Plans and chat ---
+    def set_plan(self, plan_name: str, plan) -> None:
+        with self.lock:
+            self._remove_plan(plan_name)
+            documents = plan_documents(plan_name, plan)
+            for doc_id, doc in documents.items():
+                self._add(doc_id, doc)
+            self.plan_docs[plan_name] = list(documents)
+
+    def remove_plan(self, plan_name: str) -> None:
+        with self.lock:
+            self._remove_plan(plan_name)
+
+    def add_chat_turn(self, message: Dict) -> None:
+        with self.lock:
+            self._add(f"chat:{self.chat_turns}", chat_document(self.chat_turns, message))
+            self.chat_turns += 1
+
+    def clear_chat(self) -> None:
+        with self.lock:
+            for doc_id in [d for d in self.docs if d.startswith("chat:")]:
+                self._remove(doc_id)
+            self.chat_turns = 0
+
+
+class PlanChatSearchIndex:
+    """
+    Per-user BM25 full-text search over saved plan sections and chat turns.
+
+    A user's index is built from storage the first time they search, then kept
+    current by the plan and chat storage facades, which call `updating()` around
+    each write. Writes for users whose index is not in memory are skipped: the
+    next build reads them from storage. Only `max_resident_users` indexes are kept.
+    Queries only touch the postings of their own terms; the one storage read per query
+    is the user's generation, and an index behind it (another worker wrote) is rebuilt.
+    """
+
+    def __init__(self, max_resident_users: int, k1: float = 1.2, b: float = 0.75, lock_stripes: int = 64):
+        self.max_resident_users = max_resident_users
+        self.k1 = k1
+        self.b = b
+        self._users: "OrderedDict[str, _UserSearchIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        # A write and a build for the same user must not interleave, or a chat turn could be indexed twice
+        self._user_locks = [threading.Lock() for _ in range(lock_stripes)]
+
+    def _user_lock(self, user_id: str) -> threading.Lock:
+        return self._user_locks[hash(user_id) % len(self._user_locks)]
+
+    def _build(self, user_id: str) -> _UserSearchIndex:
+        storage = get_storage()
+        # Read before loading: a write that lands meanwhile makes the index look stale, never current
+        user_index = _UserSearchIndex(storage.generation(user_id))
+        for plan_name in storage.list_plans(user_id):
+            plan = storage.load_plan(user_id, plan_name)
+            if plan is not None:
+                user_index.set_plan(plan_name, plan)
+        for message in storage.load_chat(user_id):
+            user_index.add_chat_turn(message)
+        return user_index
+
+    def _get(self, user_id: str) -> _UserSearchIndex:
+        with self._user_lock(user_id):
+            with self._lock:
+                user_index = self._users.get(user_id)
+            if user_index is not None and user_index.generation == get_storage().generation(user_id):
+                with self._lock:
+                    self._users.move_to_end(user_id)
+                return user_index
+
+            user_index = self._build(user_id)
+            with self._lock:
+                self._users[user_id] = user_index
+                while len(self._users) > self.max_resident_users:
+                    self._users.popitem(last=False)
+        return user_index
+
+    @contextmanager
+    def updating(self, user_id: str):
+        """
+        Hold around exactly one storage write; yields the user's resident index to update, or None.
+        The write bumps the user's generation, and so does the index once it returns. If it raises,
+        the index is dropped, since whether the write reached storage is unknown.
+        """
+        with self._user_lock(user_id):
+            with self._lock:
+                user_index = self._users.get(user_id)
+            try:
+                yield user_index
+            except BaseException:
+                if user_index is not None:
+                    with self._lock:
+                        self._users.pop(user_id, None)
+                raise
+            if user_index is not None:
+                user_index.generation += 1
+
+    def search(self, user_id: str, query: str, k: int = 10, kind: Optional[str] = None) -> List[Dict]:
+        """
+        Up to k best BM25 matches, best first. kind="plan" or "chat" limits the results to one kind.
+        Plan hits carry plan/section, chat hits the stored message and its turn number; all carry a snippet.
+        """
+        user_index = self._get(user_id)
+        terms = set(tokenize(query))
+        with user_index.lock:
+            doc_count = len(user_index.docs)
+            if not terms or not doc_count or k <= 0:
+                return []
+            average_length = user_index.total_length / doc_count
+            scores: Dict[str, float] = {}
+            for term in terms:
+                postings = user_index.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    if kind and not doc_id.startswith(kind + ":"):
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * user_index.doc_lengths[doc_id] / average_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [self._hit(user_index.docs[doc_id], score, terms) for doc_id, score in best]
+
+    def _hit(self, doc: Dict, score: float, terms: set) -> Dict:
+        hit = {key: value for key, value in doc.items() if key != "text"}
+        hit["score"] = round(score, 4)
+        hit["snippet"] = snippet(doc["text"], terms)
+        return hit
+
+    def drop(self, user_id: str) -> None:
+        with self._user_lock(user_id), self._lock:
+            self._users.pop(user_id, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "resident_users": len(self._users),
+                "documents": sum(len(u.docs) for u in self._users.values()),
+                "terms": sum(len(u.postings) for u in self._users.values()),
+            }
+
+
+def snippet(text: str, terms: set, width: int = SNIPPET_CHARS) -> str:
+    """
+    About `width` characters of `text` around the first query term it contains.
+    """
+    start = 0
+    for match in TOKEN.finditer(text.lower()):
+        if match.group() in terms:
+            start = max(0, match.start() - width // 4)
+            break
+    piece = " ".join(text[start:start + width].split())
+    return ("…" if start else "") + piece + ("…" if start + width < len(text) else "")
+
+
+search_index = PlanChatSearchIndex(max_resident_users=SEARCH_MAX_RESIDENT_USERS)
@@ -0,0 +1,132 @@
+import contextvars
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, Iterator, List
+
+
+def make_flight_key(*parts: Any) -> str:
+    """
+    Stable key for JSON-serializable parts (dict keys sorted).
+    """
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class _Stream:
+    def __init__(self):
+        self.items: List[Any] = []
+        self.finished = False
+        self.error = None
+        self.changed = threading.Condition()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller runs the function,
+    later callers block until it finishes and get the same result (or exception).
+    Nothing is cached once the call completes.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._streams: Dict[str, _Stream] = {}
+        self._lock = threading.Lock()
+        self._counters = {"executions": 0, "coalesced": 0}
+
+    def do(self, key: str, fn: Callable, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._counters["executions"] += 1
+            else:
+                call.waiters += 1
+                self._counters["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stream(self, key: str, fn: Callable, *args, **kwargs) -> Iterator:
+        """
+        Streaming counterpart of do(): fn returns an iterator, which is run once on its own
+        thread, and every caller with the same key, the first included, reads all of its
+        items from the start. The producer runs to the end even if every reader goes away,
+        so its side effects happen exactly once.
+        """
+        with self._lock:
+            flight = self._streams.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Stream()
+                self._streams[key] = flight
+                self._counters["executions"] += 1
+            else:
+                self._counters["coalesced"] += 1
+        if leader:
+            # In a copy of the first caller's context, so the trace id follows the work
+            context = contextvars.copy_context()
+            threading.Thread(
+                target=context.run, args=(self._produce, key, flight, fn, args, kwargs),
+                name="singleflight-stream", daemon=True
+            ).start()
+        return self._follow(flight)
+
+    def _produce(self, key: str, flight: _Stream, fn: Callable, args, kwargs) -> None:
+        try:
+            for item in fn(*args, **kwargs):
+                with flight.changed:
+                    flight.items.append(item)
+                    flight.changed.notify_all()
+        except BaseException as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                del self._streams[key]
+            with flight.changed:
+                flight.finished = True
+                flight.changed.notify_all()
+
+    @staticmethod
+    def _follow(flight: _Stream) -> Iterator:
+        position = 0
+        while True:
+            with flight.changed:
+                while position == len(flight.items) and not flight.finished:
+                    flight.changed.wait()
+                items = flight.items[position:]
+                finished = flight.finished
+            position += len(items)
+            yield from items
+            if finished:
+                if flight.error is not None:
+                    raise flight.error
+                return
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self._counters, "in_flight": len(self._calls) + len(self._streams)}
@@ -0,0 +1,334 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from backend.utils.storage_backend import StorageBackend
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    user_id    TEXT NOT NULL,
+    name       TEXT NOT NULL,
+    data       TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (user_id, name)
+);
+CREATE INDEX IF NOT EXISTS idx_plans_user_updated ON plans (user_id, updated_at);
+
+CREATE TABLE IF NOT EXISTS plan_meta (
+    user_id TEXT NOT NULL,
+    name    TEXT NOT NULL,
+    data    TEXT NOT NULL,
+    PRIMARY KEY (user_id, name)
+);
+
+CREATE TABLE IF NOT EXISTS chats (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id    TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    data       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chats_user_id ON chats (user_id, id);
+CREATE INDEX IF NOT EXISTS idx_chats_user_created ON chats (user_id, created_at);
+
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id     TEXT PRIMARY KEY,
+    data       TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS generations (
+    user_id    TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL
+);
+"""
+
+BUMP_GENERATION = (
+    "INSERT INTO generations (user_id, generation) VALUES (?, ?) "
+    "ON CONFLICT (user_id) DO UPDATE SET generation = generation + excluded.generation"
+)
+
+SAVE_PLAN_META = "INSERT OR REPLACE INTO plan_meta (user_id, name, data) VALUES (?, ?, ?)"
+
+
+class SQLiteStorageBackend(StorageBackend):
+    """
+    Plans and chat history in a single SQLite database in WAL mode.
+    Each thread gets its own connection. Chat appends are buffered and committed
+    in batches by a background writer; any read or clear of chat history
+    flushes the buffer first so callers always see their own writes.
+    Every plan or chat write bumps the user's row in `generations` in the same
+    transaction, so other worker processes can tell their caches are stale.
+    """
+
+    def __init__(self, db_path: str, batch_size: int = 64, batch_interval: float = 0.05):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._pending: List[Tuple[str, float, str]] = []
+        self._pending_lock = threading.Lock()
+        self._closed = threading.Event()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+
+        self._writer = threading.Thread(target=self._flush_loop, name="sqlite-chat-writer", daemon=True)
+        self._writer.start()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, sql: str, params: Iterable = ()) -> int:
+        with self._write_lock:
+            return self._conn().execute(sql, tuple(params)).rowcount
+
+    def _write_user(self, user_id: str, sql: str, params: Iterable = ()) -> int:
+        """
+        Run one write for a user and bump their generation in the same transaction.
+        """
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rowcount = conn.execute(sql, tuple(params)).rowcount
+                conn.execute(BUMP_GENERATION, (user_id, 1))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return rowcount
+
+    @contextmanager
+    def _transaction(self):
+        """
+        One BEGIN IMMEDIATE transaction on this thread's connection, rolled back on error.
+        """
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def generation(self, user_id: str) -> int:
+        self.flush()
+        row = self._conn().execute("SELECT generation FROM generations WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else 0
+
+    # --- Plans ---
+    def save_plan(self, user_id: str, plan_name: str, plan_data: dict | str, meta: Optional[Dict] = None) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO plans (user_id, name, data, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (user_id, name) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+                (user_id, plan_name, json.dumps(plan_data, ensure_ascii=False), time.time())
+            )
+            if meta is not None:
+                conn.execute(SAVE_PLAN_META, (user_id, plan_name, json.dumps(meta, ensure_ascii=False)))
+            conn.execute(BUMP_GENERATION, (user_id, 1))
+
+    def load_plan(self, user_id: str, plan_name: str) -> dict | str | None:
+        row = self._conn().execute(
+            "SELECT data FROM plans WHERE user_id = ? AND name = ?", (user_id, plan_name)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def list_plans(self, user_id: str) -> List[str]:
+        rows = self._conn().execute(
+            "SELECT name FROM plans WHERE user_id = ? ORDER BY name", (user_id,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def delete_plan(self, user_id: str, plan_name: str) -> bool:
+        # Plan, metadata and generation bump in one transaction, so no metadata outlives its plan
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM plan_meta WHERE user_id = ? AND name = ?", (user_id, plan_name))
+            deleted = conn.execute("DELETE FROM plans WHERE user_id = ? AND name = ?", (user_id, plan_name)).rowcount
+            conn.execute(BUMP_GENERATION, (user_id, 1))
+        return deleted > 0
+
+    def update_plan(self, user_id: str, plan_name: str, new_plan_data: dict) -> bool:
+        return self._write_user(
+            user_id,
+            "UPDATE plans SET data = ?, updated_at = ? WHERE user_id = ? AND name = ?",
+            (json.dumps(new_plan_data, ensure_ascii=False), time.time(), user_id, plan_name)
+        ) > 0
+
+    def modify_plan(
+        self,
+        user_id: str,
+        plan_name: str,
+        modify: Callable[[dict | str], dict | str],
+        meta: Optional[Dict] = None
+    ) -> dict | str | None:
+        with self._write_lock:
+            conn = self._conn()
+            # IMMEDIATE takes the write lock up front, so no other process can change the row in between
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT data FROM plans WHERE user_id = ? AND name = ?", (user_id, plan_name)
+                ).fetchone()
+                updated = None
+                if row is not None:
+                    updated = modify(json.loads(row[0]))
+                    conn.execute(
+                        "UPDATE plans SET data = ?, updated_at = ? WHERE user_id = ? AND name = ?",
+                        (json.dumps(updated, ensure_ascii=False), time.time(), user_id, plan_name)
+                    )
+                    if meta is not None:
+                        conn.execute(SAVE_PLAN_META, (user_id, plan_name, json.dumps(meta, ensure_ascii=False)))
+                conn.execute(BUMP_GENERATION, (user_id, 1))
+                conn.execute("COMMIT")
+                return updated
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def save_plan_meta(self, user_id: str, plan_name: str, meta: Dict) -> None:
+        self._write(SAVE_PLAN_META, (user_id, plan_name, json.dumps(meta, ensure_ascii=False)))
+
+    def load_plan_meta(self, user_id: str, plan_name: str) -> Optional[Dict]:
+        row = self._conn().execute(
+            "SELECT data FROM plan_meta WHERE user_id = ? AND name = ?", (user_id, plan_name)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def modify_plan_meta(
+        self,
+        user_id: str,
+        plan_name: str,
+        modify: Callable[[Optional[Dict]], Optional[Dict]]
+    ) -> Optional[Dict]:
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT data FROM plan_meta WHERE user_id = ? AND name = ?", (user_id, plan_name)
+            ).fetchone()
+            current = json.loads(row[0]) if row else None
+            updated = modify(current)
+            if updated is None:
+                return current
+            conn.execute(SAVE_PLAN_META, (user_id, plan_name, json.dumps(updated, ensure_ascii=False)))
+            return updated
+
+    # --- Background plan jobs ---
+    def save_job(self, job: Dict) -> None:
+        self._write(
+            "INSERT OR REPLACE INTO jobs (job_id, data, updated_at) VALUES (?, ?, ?)",
+            (job["job_id"], json.dumps(job, ensure_ascii=False), time.time())
+        )
+
+    def load_job(self, job_id: str) -> Optional[Dict]:
+        row = self._conn().execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete_job(self, job_id: str) -> None:
+        self._write("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    # --- Chat history ---
+    def append_chat(self, user_id: str, message: Dict) -> None:
+        with self._pending_lock:
+            self._pending.append((user_id, time.time(), json.dumps(message, ensure_ascii=False)))
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Commit every buffered chat append in one transaction.
+        """
+        with self._write_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany("INSERT INTO chats (user_id, created_at, data) VALUES (?, ?, ?)", batch)
+                appended = Counter(user_id for user_id, _, _ in batch)
+                conn.executemany(BUMP_GENERATION, appended.items())
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                with self._pending_lock:
+                    self._pending = batch + self._pending
+                raise
+
+    def _flush_loop(self) -> None:
+        while not self._closed.wait(self.batch_interval):
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # Left in the buffer; retried on the next tick
+                pass
+
+    def load_chat(
+        self,
+        user_id: str,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        newest_first: bool = False
+    ) -> List[Dict]:
+        self.flush()
+        order = "DESC" if newest_first else "ASC"
+        rows = self._conn().execute(
+            f"SELECT data FROM chats WHERE user_id = ? ORDER BY id {order} LIMIT ? OFFSET ?",
+            (user_id, -1 if limit is None else limit, offset)
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def clear_chat(self, user_id: str) -> bool:
+        self.flush()
+        return self._write_user(user_id, "DELETE FROM chats WHERE user_id = ?", (user_id,)) > 0
+
+    # --- Bulk import ---
+    def import_user(self, user_id: str, plans: Dict[str, dict | str], messages: List[Dict]) -> None:
+        """
+        Write a user's plans and full chat history in a single transaction,
+        replacing whatever the database already holds for them.
+        """
+        self.flush()
+        now = time.time()
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO plans (user_id, name, data, updated_at) VALUES (?, ?, ?, ?)",
+                    [(user_id, name, json.dumps(data, ensure_ascii=False), now) for name, data in plans.items()]
+                )
+                if messages:
+                    conn.execute("DELETE FROM chats WHERE user_id = ?", (user_id,))
+                    conn.executemany(
+                        "INSERT INTO chats (user_id, created_at, data) VALUES (?, ?, ?)",
+                        [(user_id, now, json.dumps(message, ensure_ascii=False)) for message in messages]
+                    )
+                conn.execute(BUMP_GENERATION, (user_id, 1))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def close(self) -> None:
+        self._closed.set()
+        self.flush()
@@ -0,0 +1,145 @@
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional
+
+
+class StorageBackend(ABC):
+    """
+    Persistence for saved plans and chat history.
+    plan_storage and chat_storage delegate to whichever engine get_storage() returns.
+    """
+
+    # --- Plans ---
+    @abstractmethod
+    def save_plan(self, user_id: str, plan_name: str, plan_data: dict | str, meta: Optional[Dict] = None) -> None:
+        """
+        Save a plan; with `meta`, its metadata is written in the same lock or transaction.
+        """
+
+    @abstractmethod
+    def load_plan(self, user_id: str, plan_name: str) -> dict | str | None:
+        ...
+
+    @abstractmethod
+    def list_plans(self, user_id: str) -> List[str]:
+        ...
+
+    @abstractmethod
+    def delete_plan(self, user_id: str, plan_name: str) -> bool:
+        ...
+
+    @abstractmethod
+    def update_plan(self, user_id: str, plan_name: str, new_plan_data: dict) -> bool:
+        ...
+
+    @abstractmethod
+    def modify_plan(
+        self,
+        user_id: str,
+        plan_name: str,
+        modify: Callable[[dict | str], dict | str],
+        meta: Optional[Dict] = None
+    ) -> dict | str | None:
+        """
+        Atomically replace a plan with modify(current plan) and return the new plan.
+        Returns None if the plan does not exist; an exception from `modify` leaves it untouched.
+        With `meta`, the plan's metadata is replaced in the same step.
+        """
+
+    # --- Plan metadata (generation inputs and section fingerprints, kept beside the plan) ---
+    @abstractmethod
+    def save_plan_meta(self, user_id: str, plan_name: str, meta: Dict) -> None:
+        ...
+
+    @abstractmethod
+    def load_plan_meta(self, user_id: str, plan_name: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def modify_plan_meta(
+        self,
+        user_id: str,
+        plan_name: str,
+        modify: Callable[[Optional[Dict]], Optional[Dict]]
+    ) -> Optional[Dict]:
+        """
+        Atomically replace a plan's metadata with modify(current metadata or None) and return
+        what is stored afterwards. If `modify` returns None, nothing is written.
+        """
+
+    # --- Chat history ---
+    @abstractmethod
+    def append_chat(self, user_id: str, message: Dict) -> None:
+        ...
+
+    @abstractmethod
+    def load_chat(
+        self,
+        user_id: str,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        newest_first: bool = False
+    ) -> List[Dict]:
+        ...
+
+    @abstractmethod
+    def clear_chat(self, user_id: str) -> bool:
+        ...
+
+    # --- Background plan jobs (status and result, readable from every worker) ---
+    @abstractmethod
+    def save_job(self, job: Dict) -> None:
+        """
+        Insert or replace the record of job["job_id"].
+        """
+
+    @abstractmethod
+    def load_job(self, job_id: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def delete_job(self, job_id: str) -> None:
+        ...
+
+    # --- Cross-process invalidation ---
+    @abstractmethod
+    def generation(self, user_id: str) -> int:
+        """
+        A per-user counter that each plan or chat write call bumps by exactly one when it
+        returns normally (even if it changed nothing), in whichever process made it. In-memory caches compare it with the
+        generation they were built at to notice writes by other workers.
+        """
+
+    def close(self) -> None:
+        pass
+
+
+_storage: Optional[StorageBackend] = None
+_storage_lock = threading.Lock()
+
+def create_storage(kind: str) -> StorageBackend:
+    from backend import config
+
+    if kind == "file":
+        from backend.utils.file_storage import FileStorageBackend
+        return FileStorageBackend(plan_dir=config.PLAN_DIR, chat_dir=config.CHAT_DIR)
+    if kind == "sqlite":
+        from backend.utils.sqlite_storage import SQLiteStorageBackend
+        return SQLiteStorageBackend(
+            db_path=config.SQLITE_PATH,
+            batch_size=config.SQLITE_BATCH_SIZE,
+            batch_interval=config.SQLITE_BATCH_INTERVAL_MS / 1000
+        )
+    raise ValueError(f"Unknown storage backend: {kind!r} (expected 'file' or 'sqlite')")
+
+def get_storage() -> StorageBackend:
+    """
+    Returns the process-wide storage engine selected by STORAGE_BACKEND.
+    """
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                from backend.config import STORAGE_BACKEND
+                _storage = create_storage(STORAGE_BACKEND)
+    return _storage
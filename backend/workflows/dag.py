@@ -0,0 +1,187 @@
+"""
+A small task-graph executor for plan workflows.
+
+A workflow declares its steps as nodes of a TaskGraph, each with the nodes it
+depends on. Nodes whose dependencies have finished run concurrently on a bounded
+thread pool, and each node receives its dependencies' outputs as arguments. So a
+plan takes roughly as long as its longest chain of dependent steps rather than
+the sum of all of them.
+
+Every run records a trace: when each node started and finished relative to the
+start of the run, plus the total work and the critical path it implies. The most
+recent traces are kept in `recent_traces` for the /workflow-traces endpoint.
+"""
+import contextvars
+import heapq
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from backend.config import DAG_MAX_WORKERS, DAG_TRACE_HISTORY
+from backend.utils.metrics import Histogram, trace_id_var
+from backend.utils.scheduler import granted_slots_var
+
+logger = logging.getLogger(__name__)
+
+dag_run_seconds = Histogram(
+    "lifecoach_dag_run_seconds", "Wall time of each workflow graph run.", ("graph",)
+)
+dag_node_seconds = Histogram(
+    "lifecoach_dag_node_seconds", "Wall time of each workflow graph node by its label.", ("graph", "label")
+)
+
+recent_traces: "deque[Dict]" = deque(maxlen=DAG_TRACE_HISTORY)
+_traces_lock = threading.Lock()
+
+
+class _Node:
+    def __init__(self, name: str, fn: Callable, deps: Tuple[str, ...], label: str, position: int):
+        self.name = name
+        self.fn = fn
+        self.deps = deps
+        self.label = label
+        self.position = position
+
+
+class TaskGraph:
+    """
+    Nodes are added with the names of the nodes they depend on, which must already
+    exist, so every graph is acyclic and declaration order is a topological order.
+    Among nodes that are ready at the same time, the one declared first starts first.
+    By default at most DAG_MAX_WORKERS nodes run at once, and no more than the scheduler
+    slots granted to the work that runs the graph.
+    """
+
+    def __init__(self, name: str, max_workers: Optional[int] = None):
+        self.name = name
+        self.max_workers = max(1, max_workers or min(DAG_MAX_WORKERS, granted_slots_var.get() or DAG_MAX_WORKERS))
+        self._nodes: Dict[str, _Node] = {}
+        self.trace: Optional[Dict] = None
+
+    def add(self, name: str, fn: Callable, deps: Sequence[str] = (), label: Optional[str] = None) -> str:
+        """
+        Add a node that runs fn(*outputs of deps); `label` groups nodes in metrics (defaults to name).
+        Returns the name, so it can be used as another node's dependency.
+        """
+        if name in self._nodes:
+            raise ValueError(f"duplicate node {name!r} in graph {self.name!r}")
+        missing = [dep for dep in deps if dep not in self._nodes]
+        if missing:
+            raise ValueError(f"node {name!r} depends on unknown node(s) {', '.join(missing)}")
+        self._nodes[name] = _Node(name, fn, tuple(deps), label or name, len(self._nodes))
+        return name
+
+    def _run_node(self, node: _Node, args: List[Any], started: float, spans: Dict[str, Dict]) -> Any:
+        begin = time.perf_counter()
+        try:
+            return node.fn(*args)
+        finally:
+            end = time.perf_counter()
+            spans[node.name] = {
+                "node": node.name,
+                "deps": list(node.deps),
+                "start": round(begin - started, 4),
+                "end": round(end - started, 4),
+                "seconds": round(end - begin, 4),
+                "thread": threading.current_thread().name,
+            }
+            dag_node_seconds.observe(end - begin, graph=self.name, label=node.label)
+
+    def stream(self) -> Iterator[Tuple[str, Any]]:
+        """
+        Run the graph, yielding (node name, output) as each node finishes.
+        If a node raises, no further nodes start; the running ones finish and the error is re-raised.
+        """
+        waiting = {name: set(node.deps) for name, node in self._nodes.items()}
+        dependents: Dict[str, List[str]] = {name: [] for name in self._nodes}
+        for node in self._nodes.values():
+            for dep in node.deps:
+                dependents[dep].append(node.name)
+        ready = [(node.position, name) for name, node in self._nodes.items() if not node.deps]
+        heapq.heapify(ready)
+
+        outputs: Dict[str, Any] = {}
+        spans: Dict[str, Dict] = {}
+        running = {}
+        started = time.perf_counter()
+        error = None
+
+        def launch(pool: ThreadPoolExecutor) -> None:
+            while ready and len(running) < self.max_workers:
+                _, name = heapq.heappop(ready)
+                node = self._nodes[name]
+                # Each node in its own copy of the caller's context: trace id in, its own output cap
+                context = contextvars.copy_context()
+                args = [outputs[dep] for dep in node.deps]
+                running[pool.submit(context.run, self._run_node, node, args, started, spans)] = name
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"dag-{self.name}") as pool:
+                try:
+                    launch(pool)
+                    while running:
+                        done, _ = wait(running, return_when=FIRST_COMPLETED)
+                        finished = []
+                        for future in sorted(done, key=lambda f: self._nodes[running[f]].position):
+                            name = running.pop(future)
+                            outputs[name] = future.result()
+                            finished.append(name)
+                            for dependent in dependents[name]:
+                                waiting[dependent].discard(name)
+                                if not waiting[dependent]:
+                                    heapq.heappush(ready, (self._nodes[dependent].position, dependent))
+                        # Start what just became ready before handing results to a possibly slow consumer
+                        launch(pool)
+                        for name in finished:
+                            yield name, outputs[name]
+                except BaseException as e:
+                    error = e
+                    raise
+        finally:
+            self._record(time.perf_counter() - started, spans, error)
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Run the whole graph and return {node name: output}.
+        """
+        return dict(self.stream())
+
+    def _record(self, wall: float, spans: Dict[str, Dict], error: Optional[BaseException]) -> None:
+        # Longest chain of finished nodes, in declaration (topological) order
+        path: Dict[str, float] = {}
+        for name, node in self._nodes.items():
+            if name in spans:
+                path[name] = spans[name]["seconds"] + max((path.get(dep, 0.0) for dep in node.deps), default=0.0)
+
+        nodes = sorted(spans.values(), key=lambda span: span["start"])
+        # GeneratorExit: the consumer of stream() stopped early
+        status = "done" if error is None else "cancelled" if isinstance(error, GeneratorExit) else "failed"
+        self.trace = {
+            "graph": self.name,
+            "trace_id": trace_id_var.get(),
+            "status": status,
+            "wall_seconds": round(wall, 4),
+            "work_seconds": round(sum(span["seconds"] for span in nodes), 4),
+            "critical_path_seconds": round(max(path.values(), default=0.0), 4),
+            "max_workers": self.max_workers,
+            "nodes": nodes,
+        }
+        dag_run_seconds.observe(wall, graph=self.name)
+        with _traces_lock:
+            recent_traces.append(self.trace)
+        logger.info(
+            "%s: %d/%d nodes in %.2fs (critical path %.2fs, %.2fs of work) %s",
+            self.name, len(nodes), len(self._nodes), wall,
+            self.trace["critical_path_seconds"], self.trace["work_seconds"], status
+        )
+
+
+def get_recent_traces(limit: int = 20) -> List[Dict]:
+    """
+    The latest graph traces, newest first.
+    """
+    with _traces_lock:
+        return list(recent_traces)[::-1][:max(0, limit)]
@@ -0,0 +1,53 @@
+"""
+The finance section both workflows share: the budget is computed by backend.utils.finance,
+and the finance agent is only asked for the one-line tip when FINANCE_LLM_TIP is on.
+"""
+import hashlib
+from crewai import Task
+from backend.agents.finance_agent import finance_agent
+from backend.config import FINANCE_RULE, FINANCE_LLM_TIP
+from backend.utils.finance import budget_breakdown, format_budget, format_inr, parse_income, RULE_PRESETS
+from backend.workflows.task_runner import run_crew, task_cache_key
+
+def _build_tip_task(monthly_income: float, savings: int) -> Task:
+    return Task(
+        description=(
+            f"User earns {format_inr(monthly_income)}/month and sets aside {format_inr(savings)} of it. "
+            "Give ONE very short, practical tip on saving or investing that amount. No budget breakdown."
+        ),
+        expected_output="One sentence.",
+        agent=finance_agent
+    )
+
+def _savings(amounts, rule: str) -> int:
+    names = [name for name, _ in RULE_PRESETS[rule]]
+    return int(amounts[names.index("Savings")]) if "Savings" in names else 0
+
+def finance_plan(income: str, use_cache: bool = True, stage: str = "finance", rule: str = FINANCE_RULE) -> str:
+    """
+    Budget bullets for `income` by `rule`, plus a tip (from the LLM only when FINANCE_LLM_TIP is on).
+    Raises IncomeError if `income` is not a usable amount.
+    """
+    monthly = parse_income(income)
+    amounts = budget_breakdown([monthly], rule)[0]
+    tip = None
+    if FINANCE_LLM_TIP:
+        tip = run_crew(
+            agents=[finance_agent],
+            tasks=[_build_tip_task(monthly, _savings(amounts, rule))],
+            use_cache=use_cache,
+            stage=stage
+        )[0]
+    return format_budget(monthly, amounts, rule, tip)
+
+def finance_fingerprint(income: str, rule: str = FINANCE_RULE) -> str:
+    """
+    Changes exactly when the finance section would: a different amount, rule or tip prompt.
+    Incomes written differently ("50,000" vs "50k") share a fingerprint.
+    """
+    monthly = parse_income(income)
+    parts = [rule, str(round(monthly))]
+    if FINANCE_LLM_TIP:
+        amounts = budget_breakdown([monthly], rule)[0]
+        parts.append(task_cache_key(_build_tip_task(monthly, _savings(amounts, rule))))
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
@@ -1,78 +1,281 @@
 
-from crewai import Crew, Task
+import hashlib
+import json
+import re
+from functools import partial
+from crewai import Task
 from backend.agents.health_agent import health_agent
-from backend.agents.finance_agent import finance_agent
 from backend.agents.learning_agent import learning_agent
 from backend.agents.motivation_agent import motivation_agent
+from backend.utils.finance import parse_income
+from backend.workflows.dag import TaskGraph
+from backend.workflows.finance_section import finance_plan, finance_fingerprint
+from backend.workflows.task_runner import run_crew, task_cache_key
 
-def generate_full_lifecoach_plan(goal: str, income: str, learning_goal: str, duration: int = 1):
-    health_outputs = []
-    learning_outputs = []
-    motivation_outputs = []
+def _build_day_tasks(day: int, goal: str, learning_goal: str):
+    # Health
+    health_task = Task(
+        description=(
+            f"Day {day}: Give 3–4 bullet points with health tips for the goal '{goal}'. "
+            "Include 1 meal idea, 1 workout suggestion, and 1 motivation/discipline tip. Keep it very concise."
+        ),
+        expected_output="• 3–4 short bullet points max",
+        agent=health_agent
+    )
 
-    for day in range(1, duration + 1):
-        # Health
-        health_task = Task(
-            description=(
-                f"Day {day}: Give 3–4 bullet points with health tips for the goal '{goal}'. "
-                "Include 1 meal idea, 1 workout suggestion, and 1 motivation/discipline tip. Keep it very concise."
-            ),
-            expected_output="• 3–4 short bullet points max",
-            agent=health_agent
-        )
-
-        # Learning: topic + resource + tip
-        learning_task = Task(
-            description=(
-                f"Day {day}: Suggest a micro-learning plan for the goal '{learning_goal}' in 3–4 bullets. "
-                "Include topic, resource (video/article), and 1 productivity/study tip."
-            ),
-            expected_output="• Learning topic\n• Link or resource\n• 1 daily learning tip",
-            agent=learning_agent
-        )
-
-        # Motivation: personalized, not cliche
-        motivation_task = Task(
-            description=(
-                f"Day {day}: Write a **very short** motivational message to keep user focused on health, finance, and learning. "
-                "Avoid cliches/quotes. Make it actionable or mindset-based."
-            ),
-            expected_output="• 1 short motivational bullet (max 1–2 lines)",
-            agent=motivation_agent
-        )
-
-        # Kick off daily agents
-        crew = Crew(
-            agents=[health_agent, learning_agent, motivation_agent],
-            tasks=[health_task, learning_task, motivation_task],
-            verbose=False
-        )
-
-        crew.kickoff()
-
-        health_outputs.append(f"**Day {day}**\n{health_task.output.result().strip()}")
-        learning_outputs.append(f"**Day {day}**\n{learning_task.output.result().strip()}")
-        motivation_outputs.append(f"**Day {day}**\n{motivation_task.output.result().strip()}")
-
-    # Finance plan (only once)
-    finance_task = Task(
+    # Learning: topic + resource + tip
+    learning_task = Task(
+        description=(
+            f"Day {day}: Suggest a micro-learning plan for the goal '{learning_goal}' in 3–4 bullets. "
+            "Include topic, resource (video/article), and 1 productivity/study tip."
+        ),
+        expected_output="• Learning topic\n• Link or resource\n• 1 daily learning tip",
+        agent=learning_agent
+    )
+
+    # Motivation: personalized, not cliche
+    motivation_task = Task(
+        description=(
+            f"Day {day}: Write a **very short** motivational message to keep user focused on health, finance, and learning. "
+            "Avoid cliches/quotes. Make it actionable or mindset-based."
+        ),
+        expected_output="• 1 short motivational bullet (max 1–2 lines)",
+        agent=motivation_agent
+    )
+
+    return health_task, learning_task, motivation_task
+
+SECTIONS = ("health_plan", "learning_plan", "motivation_plan")
+PLAN_SECTIONS = SECTIONS + ("finance_plan",)
+
+BATCH_START = "<<<JSON"
+BATCH_END = "JSON>>>"
+
+def _build_batched_tasks(goal: str, learning_goal: str, duration: int):
+    """
+    One task per agent covering every day, answered as a JSON object
+    {"1": "...", "2": "..."} between BATCH_START/BATCH_END markers.
+    """
+    days = ", ".join(str(day) for day in range(1, duration + 1))
+    output_format = (
+        f"Return ONLY a JSON object between the lines {BATCH_START} and {BATCH_END}, "
+        f"with one key per day ({days}) whose value is that day's bullet points as a single string."
+    )
+
+    health_task = Task(
+        description=(
+            f"For each day {days}: give 3–4 bullet points with health tips for the goal '{goal}'. "
+            "Include 1 meal idea, 1 workout suggestion, and 1 motivation/discipline tip per day. Keep it very concise. "
+            + output_format
+        ),
+        expected_output=f"{BATCH_START}\n{{\"1\": \"• ...\", ...}}\n{BATCH_END}",
+        agent=health_agent
+    )
+
+    learning_task = Task(
+        description=(
+            f"For each day {days}: suggest a micro-learning plan for the goal '{learning_goal}' in 3–4 bullets. "
+            "Include topic, resource (video/article), and 1 productivity/study tip per day. Build on the previous day. "
+            + output_format
+        ),
+        expected_output=f"{BATCH_START}\n{{\"1\": \"• Learning topic\\n• Link or resource\\n• 1 daily learning tip\", ...}}\n{BATCH_END}",
+        agent=learning_agent
+    )
+
+    motivation_task = Task(
         description=(
-            f"User earns ₹{income}/month. Build a budget using 50/30/20 rule (Essentials, Wants, Savings). "
-            "Give a very short tip on saving or investing. Output in 3–4 bullets."
+            f"For each day {days}: write a **very short** motivational message to keep user focused on health, finance, and learning. "
+            "Avoid cliches/quotes and do not repeat yourself across days. Make it actionable or mindset-based. "
+            + output_format
         ),
-        expected_output="• 3–4 bullet points: budget breakdown + 1 savings/investing tip",
-        agent=finance_agent
+        expected_output=f"{BATCH_START}\n{{\"1\": \"• 1 short motivational bullet\", ...}}\n{BATCH_END}",
+        agent=motivation_agent
     )
 
-    Crew(
-        agents=[finance_agent],
-        tasks=[finance_task],
-        verbose=False
-    ).kickoff()
-
-    return {
-        "health_plan": "\n\n".join(health_outputs),
-        "learning_plan": "\n\n".join(learning_outputs),
-        "motivation_plan": "\n\n".join(motivation_outputs),
-        "finance_plan": finance_task.output.result().strip()
+    return health_task, learning_task, motivation_task
+
+def parse_batched_output(text: str, duration: int) -> dict:
+    """
+    Extract {day: text} from a batched answer. Days that are missing,
+    empty or unparseable are simply absent from the result.
+    """
+    match = re.search(re.escape(BATCH_START) + r"(.*?)" + re.escape(BATCH_END), text, re.DOTALL)
+    body = match.group(1) if match else text
+    start, end = body.find("{"), body.rfind("}")
+    if start == -1 or end <= start:
+        return {}
+    try:
+        data = json.loads(body[start:end + 1])
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+
+    days = {}
+    for key, value in data.items():
+        digits = re.sub(r"\D", "", str(key))
+        if not digits or not 1 <= int(digits) <= duration:
+            continue
+        if isinstance(value, list):
+            value = "\n".join(str(item) for item in value)
+        if isinstance(value, str) and value.strip():
+            days[int(digits)] = value.strip()
+    return days
+
+def _run_task(task: Task, use_cache: bool, stage: str) -> str:
+    return run_crew(agents=[task.agent], tasks=[task], use_cache=use_cache, stage=stage)[0]
+
+def _run_batched(task: Task, duration: int, use_cache: bool) -> dict:
+    return parse_batched_output(_run_task(task, use_cache, "v1-batched"), duration)
+
+def _day_from_batch(day: int, task: Task, use_cache: bool, parsed: dict) -> str:
+    # Fall back to the per-day prompt only if the batched answer lacks this day
+    return parsed[day] if day in parsed else _run_task(task, use_cache, "v1-batched-fallback")
+
+def _plan_graph(
+    goal: str,
+    income: str,
+    learning_goal: str,
+    duration: int,
+    use_cache: bool,
+    mode: str,
+    sections=PLAN_SECTIONS
+):
+    """
+    The v1 plan as a task graph, plus {node name: (day, section)} for the nodes that produce day sections.
+    Daily mode: every (day, section) task is independent. Batched mode: one node per agent for all
+    days, and a node per (day, section) that takes its day from the batch or re-asks for it alone.
+    The finance section depends on nothing.
+    """
+    if mode not in ("daily", "batched"):
+        raise ValueError(f"Unknown v1 mode: {mode!r} (expected 'daily' or 'batched')")
+    wanted = [i for i, section in enumerate(SECTIONS) if section in sections]
+    graph = TaskGraph(f"v1-{mode}")
+    day_nodes = {}
+
+    if mode == "batched":
+        batched_tasks = _build_batched_tasks(goal, learning_goal, duration)
+        batches = {i: graph.add(f"batched/{SECTIONS[i]}", partial(_run_batched, batched_tasks[i], duration, use_cache)) for i in wanted}
+    for day in range(1, duration + 1):
+        day_tasks = _build_day_tasks(day, goal, learning_goal)
+        for i in wanted:
+            name = f"day{day}/{SECTIONS[i]}"
+            if mode == "batched":
+                graph.add(name, partial(_day_from_batch, day, day_tasks[i], use_cache), [batches[i]], label=SECTIONS[i])
+            else:
+                graph.add(name, partial(_run_task, day_tasks[i], use_cache, "v1-day"), label=SECTIONS[i])
+            day_nodes[name] = (day, SECTIONS[i])
+
+    if "finance_plan" in sections:
+        # Computed in code; the LLM writes at most the tip
+        graph.add("finance_plan", partial(finance_plan, income, use_cache, "v1-finance"))
+    return graph, day_nodes
+
+def stream_full_lifecoach_plan(
+    goal: str,
+    income: str,
+    learning_goal: str,
+    duration: int = 1,
+    use_cache: bool = True,
+    mode: str = "daily",
+    sections=PLAN_SECTIONS
+):
+    """
+    Generate the plan and yield one event per day, in day order, followed by a single finance event.
+    Independent tasks run concurrently, and each day is yielded as soon as it and every earlier day is done.
+    mode="daily" asks each agent once per day; mode="batched" asks each agent once for all days,
+    then re-asks per day only for sections whose batched answer could not be parsed.
+    `sections` limits generation to a subset of PLAN_SECTIONS; events carry only those.
+    """
+    if "finance_plan" in sections:
+        # Reject a bad income before any LLM work
+        parse_income(income)
+    graph, day_nodes = _plan_graph(goal, income, learning_goal, duration, use_cache, mode, sections)
+    wanted = [section for section in SECTIONS if section in sections]
+
+    days = {}
+    next_day = 1
+    finance = None
+    for name, output in graph.stream():
+        if name == "finance_plan":
+            finance = output
+        elif name in day_nodes:
+            day, section = day_nodes[name]
+            days.setdefault(day, {})[section] = output
+            while wanted and len(days.get(next_day, ())) == len(wanted):
+                yield {"event": "day", "day": next_day, **{section: days[next_day][section] for section in wanted}}
+                del days[next_day]
+                next_day += 1
+
+    if finance is not None:
+        yield {"event": "finance", "finance_plan": finance}
+
+def generate_day(day: int, goal: str, learning_goal: str, use_cache: bool = True, stage: str = "v1-day") -> dict:
+    """
+    The three day sections for one day of the program, e.g. tomorrow's.
+    """
+    graph = TaskGraph("v1-next-day")
+    for section, task in zip(SECTIONS, _build_day_tasks(day, goal, learning_goal)):
+        graph.add(section, partial(_run_task, task, use_cache, stage))
+    outputs = graph.run()
+    return {section: outputs[section] for section in SECTIONS}
+
+def collect_plan(events) -> dict:
+    """
+    Fold streamed day/finance events back into the flat v1 plan dict
+    (only the sections the events carry).
+    """
+    day_outputs = {section: [] for section in SECTIONS}
+    plan = {}
+
+    for event in events:
+        if event["event"] == "day":
+            day = event["day"]
+            for section in SECTIONS:
+                if section in event:
+                    day_outputs[section].append(f"**Day {day}**\n{event[section]}")
+        elif event["event"] == "finance":
+            plan["finance_plan"] = event["finance_plan"]
+
+    for section in SECTIONS:
+        if day_outputs[section]:
+            plan[section] = "\n\n".join(day_outputs[section])
+    return {section: plan[section] for section in PLAN_SECTIONS if section in plan}
+
+def section_fingerprints(
+    goal: str,
+    income: str,
+    learning_goal: str,
+    duration: int = 1,
+    mode: str = "daily"
+) -> dict:
+    """
+    One fingerprint per section over every prompt that produces it (same inputs as the
+    LLM cache key). A section needs regenerating exactly when its fingerprint changes:
+    income only reaches finance_plan, goal only health_plan, learning_goal only learning_plan.
+    """
+    if mode == "batched":
+        tasks = {section: [task] for section, task in zip(SECTIONS, _build_batched_tasks(goal, learning_goal, duration))}
+    else:
+        tasks = {section: [] for section in SECTIONS}
+        for day in range(1, duration + 1):
+            for section, task in zip(SECTIONS, _build_day_tasks(day, goal, learning_goal)):
+                tasks[section].append(task)
+
+    fingerprints = {
+        section: hashlib.sha256("\n".join(task_cache_key(t) for t in section_tasks).encode("utf-8")).hexdigest()
+        for section, section_tasks in tasks.items()
     }
+    fingerprints["finance_plan"] = finance_fingerprint(income)
+    return fingerprints
+
+def generate_full_lifecoach_plan(
+    goal: str,
+    income: str,
+    learning_goal: str,
+    duration: int = 1,
+    use_cache: bool = True,
+    mode: str = "daily",
+    sections=PLAN_SECTIONS
+):
+    return collect_plan(stream_full_lifecoach_plan(goal, income, learning_goal, duration, use_cache, mode, sections))
@@ -1,18 +1,21 @@
 
-from crewai import Crew, Task
+import hashlib
+from functools import partial
+from crewai import Task
+from backend.config import V2_CONTEXT_TOKEN_BUDGET
 from backend.agents.manager_agent import manager_agent
 from backend.agents.health_agent import health_agent
-from backend.agents.finance_agent import finance_agent
 from backend.agents.learning_agent import learning_agent
 from backend.agents.motivation_agent import motivation_agent
+from backend.utils.context_budget import fit_context
+from backend.utils.finance import parse_income
+from backend.workflows.dag import TaskGraph
+from backend.workflows.finance_section import finance_plan, finance_fingerprint
+from backend.workflows.task_runner import run_crew, task_cache_key
 
-def generate_full_lifecoach_plan(
-    goal: str,
-    income: str,
-    learning_goal: str,
-    duration: int = 1,
-    preferences: dict = {}
-):
+FINANCE_HEADING = "**Finance**"
+
+def _build_expert_tasks(goal: str, learning_goal: str, duration: int, preferences: dict):
     #  Extract optional preferences
     diet_pref = preferences.get("diet", "no dietary preference")
     workout_pref = preferences.get("workout_type", "no specific workout type")
@@ -47,40 +50,84 @@ def generate_full_lifecoach_plan(
         agent=motivation_agent
     )
 
-    finance_task = Task(
-        description=(
-            f"Break down a budget using ₹{income} income per month. "
-            "Apply 50/30/20 rule and give 1 practical savings/investment tip. "
-            "Use 3–4 clear bullet points, avoid jargon."
-        ),
-        expected_output="3–4 bullets: savings, essentials, discretionary, and 1 budgeting tip.",
-        agent=finance_agent
-    )
+    return health_task, learning_task, motivation_task
 
-    #  High-level manager task
-    high_level_task = Task(
-        description=(
-            f"The user wants a {duration}-day improvement plan.\n"
-            f"Health Goal: {goal}\n"
-            f"Monthly Income: ₹{income}\n"
-            f"Learning Goal: {learning_goal}\n\n"
-            "Coordinate 4 experts (health, learning, finance, motivation) to generate a final personalized plan.\n"
-            "Ensure the final report has only short, actionable bullet points in each section."
-        ),
-        expected_output="Final formatted plan: Health, Learning, Motivation, Finance — each with 3–4 bullets.",
-        agent=manager_agent,
-        context=[health_task, learning_task, motivation_task, finance_task]
-    )
+def section_fingerprints(goal: str, income: str, learning_goal: str, duration: int = 1, preferences: dict = {}) -> dict:
+    """
+    "plan" covers the experts and the manager, whose prompts never see the income;
+    "finance_plan" covers the computed finance block appended after FINANCE_HEADING.
+    """
+    keys = [task_cache_key(task) for task in _build_expert_tasks(goal, learning_goal, duration, preferences)]
+    return {
+        "plan": hashlib.sha256("\n".join(keys).encode("utf-8")).hexdigest(),
+        "finance_plan": finance_fingerprint(income),
+    }
 
-    #  Launch CrewAI
-    crew = Crew(
-        agents=[manager_agent, health_agent, learning_agent, motivation_agent, finance_agent],
-        tasks=[high_level_task],
-        verbose=True
-    )
+def with_finance(plan: str, finance: str) -> str:
+    """
+    The plan text with the block after its (last) FINANCE_HEADING replaced by `finance`.
+    """
+    head, found, _ = plan.rpartition(f"\n\n{FINANCE_HEADING}\n")
+    return f"{(head if found else plan).rstrip()}\n\n{FINANCE_HEADING}\n{finance}"
+
+def generate_full_lifecoach_plan(
+    goal: str,
+    income: str,
+    learning_goal: str,
+    duration: int = 1,
+    preferences: dict = {},
+    use_cache: bool = True
+):
+    # Reject a bad income before any LLM work
+    parse_income(income)
+    health_task, learning_task, motivation_task = _build_expert_tasks(goal, learning_goal, duration, preferences)
+
+    def run_expert(task: Task) -> str:
+        return run_crew(agents=[task.agent], tasks=[task], use_cache=use_cache, stage="v2-experts")[0]
+
+    def run_manager(health: str, learning: str, motivation: str) -> str:
+        #  Fit the expert notes into the manager's budget
+        notes, _ = fit_context(
+            {"Health": health, "Learning": learning, "Motivation": motivation},
+            V2_CONTEXT_TOKEN_BUDGET,
+            label="v2-manager"
+        )
+
+        #  High-level manager task
+        high_level_task = Task(
+            description=(
+                f"The user wants a {duration}-day improvement plan.\n"
+                f"Health Goal: {goal}\n"
+                f"Learning Goal: {learning_goal}\n\n"
+                "Coordinate 3 experts (health, learning, motivation) to generate a final personalized plan.\n"
+                "Ensure the final report has only short, actionable bullet points in each section.\n\n"
+                f"Expert notes:\n{notes}"
+            ),
+            expected_output="Final formatted plan: Health, Learning, Motivation — each with 3–4 bullets.",
+            agent=manager_agent
+        )
+
+        #  Launch CrewAI
+        return run_crew(
+            agents=[manager_agent],
+            tasks=[high_level_task],
+            use_cache=use_cache,
+            verbose=True,
+            stage="v2-manager"
+        )[0]
 
-    result = crew.kickoff()
+    #  The experts (each cached on its own) and the finance section are independent; the manager needs all three experts
+    graph = TaskGraph("v2")
+    experts = [
+        graph.add("health", partial(run_expert, health_task)),
+        graph.add("learning", partial(run_expert, learning_task)),
+        graph.add("motivation", partial(run_expert, motivation_task)),
+    ]
+    #  The budget is computed, not written by the manager, so its numbers are always right
+    graph.add("finance", partial(finance_plan, income, use_cache, "v2-finance"))
+    graph.add("manager", run_manager, experts)
+    outputs = graph.run()
 
     return {
-        "plan": result.strip()
+        "plan": with_finance(outputs["manager"].strip(), outputs["finance"])
     }
@@ -0,0 +1,86 @@
+import time
+from typing import List, Optional
+from crewai import Agent, Crew, Task
+from backend.config import TASK_NUM_PREDICT
+from backend.utils.llm_cache import llm_cache, agent_cache_key
+from backend.utils.llm_metrics import agent_label
+from backend.utils.metrics import crew_kickoff_seconds, task_seconds
+from backend.utils.ollama_pool import num_predict_var
+
+def task_cache_key(task: Task) -> str:
+    """
+    A task's output is determined by its agent, its own prompt and the prompts of its context tasks.
+    """
+    parts = [task.description, task.expected_output]
+    for context_task in task.context or []:
+        parts.extend([context_task.agent.role, context_task.description])
+    return agent_cache_key(task.agent, "\n".join(parts))
+
+def task_num_predict(task: Task, stage: str) -> Optional[int]:
+    """
+    Output cap for a task from TASK_NUM_PREDICT: "stage/agent", then "stage", then "agent".
+    """
+    agent = agent_label(task.agent)
+    for key in (f"{stage}/{agent}", stage, agent):
+        if key in TASK_NUM_PREDICT:
+            return TASK_NUM_PREDICT[key]
+    return None
+
+def _instrument_tasks(tasks: List[Task], stage: str) -> None:
+    """
+    Tasks in a sequential crew run back to back, so each task's time is
+    the gap between the previous task finishing (or kickoff) and its own callback.
+    The same callback switches the output cap over to the next task's.
+    """
+    marks = [time.perf_counter()]
+
+    def make_callback(i: int, task: Task):
+        def callback(output):
+            now = time.perf_counter()
+            task_seconds.observe(now - marks[-1], stage=stage, agent=agent_label(task.agent))
+            marks.append(now)
+            if i + 1 < len(tasks):
+                num_predict_var.set(task_num_predict(tasks[i + 1], stage))
+        return callback
+
+    for i, task in enumerate(tasks):
+        task.callback = make_callback(i, task)
+
+def run_crew(
+    agents: List[Agent],
+    tasks: List[Task],
+    use_cache: bool = True,
+    verbose: bool = False,
+    stage: str = "crew"
+) -> List[str]:
+    """
+    Kick off a crew for the tasks whose results are not cached and
+    return every task's stripped result, in task order.
+    With use_cache=False every task runs, and the fresh results overwrite the cache.
+    `stage` labels the kickoff and task latency metrics and selects each task's output cap.
+    """
+    keys = [task_cache_key(task) for task in tasks]
+    results = [llm_cache.get(key) if use_cache else None for key in keys]
+
+    pending = [task for task, result in zip(tasks, results) if result is None]
+    if pending:
+        # Agent.execute_task swaps in its own executor, task and tools, so kickoffs running at
+        # the same time (parallel plan steps, concurrent plans) each work on a copy of the agents
+        copies = {id(agent): agent.model_copy() for agent in agents}
+        for task in pending:
+            task.agent = copies.get(id(task.agent), task.agent)
+        crew = Crew(agents=list(copies.values()), tasks=pending, verbose=verbose)
+        _instrument_tasks(pending, stage)
+        cap = num_predict_var.set(task_num_predict(pending[0], stage))
+        try:
+            with crew_kickoff_seconds.time(stage=stage):
+                crew.kickoff()
+        finally:
+            num_predict_var.reset(cap)
+
+    for i, task in enumerate(tasks):
+        if results[i] is None:
+            results[i] = task.output.result().strip()
+            llm_cache.set(keys[i], results[i])
+
+    return results
@@ -0,0 +1,84 @@
+"""
+Daily vs batched v1 generation: wall time, LLM round-trips and prompt tokens.
+
+    python -m benchmarks.batched_mode_bench [--durations 1 3 7] [--json]
+
+Runs generate_full_lifecoach_plan against the Ollama at OLLAMA_BASE_URL with
+the response cache bypassed. Token counts use the same estimate as the rest of the
+backend (about 4 characters per token) over every prompt sent to the model.
+"""
+import argparse
+import json
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from backend import registry
+from backend.utils.helpers import estimate_tokens
+
+
+class TokenCounter(BaseCallbackHandler):
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.calls += 1
+        self.prompt_tokens += sum(estimate_tokens(prompt) for prompt in prompts)
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.calls += 1
+        self.prompt_tokens += sum(estimate_tokens(m.content) for batch in messages for m in batch)
+
+    def on_llm_end(self, response, **kwargs):
+        for generations in response.generations:
+            self.completion_tokens += sum(estimate_tokens(g.text) for g in generations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--durations", type=int, nargs="+", default=[1, 3, 7])
+    parser.add_argument("--goal", default="Lose fat and build stamina")
+    parser.add_argument("--income", default="80000")
+    parser.add_argument("--learning-goal", default="Learn data science with Python")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    counter = TokenCounter()
+    llm = registry.get_llm()
+    llm.callbacks = [*(llm.callbacks or []), counter]
+    workflow = registry.get_workflow("v1")
+
+    results = []
+    for duration in args.durations:
+        for mode in ("daily", "batched"):
+            counter.reset()
+            start = time.perf_counter()
+            workflow.generate_full_lifecoach_plan(
+                args.goal, args.income, args.learning_goal, duration, use_cache=False, mode=mode
+            )
+            results.append({
+                "duration": duration,
+                "mode": mode,
+                "seconds": round(time.perf_counter() - start, 3),
+                "llm_calls": counter.calls,
+                "prompt_tokens": counter.prompt_tokens,
+                "completion_tokens": counter.completion_tokens,
+            })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'days':>4} {'mode':>8} {'seconds':>9} {'calls':>6} {'prompt tok':>11} {'completion tok':>15}")
+    for row in results:
+        print(f"{row['duration']:>4} {row['mode']:>8} {row['seconds']:>9.2f} {row['llm_calls']:>6} "
+              f"{row['prompt_tokens']:>11} {row['completion_tokens']:>15}")
+
+
+if __name__ == "__main__":
+    main()
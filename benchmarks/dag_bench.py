@@ -0,0 +1,74 @@
+"""
+Plan wall time with the workflow task graphs run one node at a time vs in parallel.
+
+    python -m benchmarks.dag_bench [--durations 1 3 7] [--workers 1 3] [--latency-ms 200]
+                                   [--tokens-per-second 40] [--json]
+
+Starts benchmarks.fake_ollama in-process (it answers concurrent calls in parallel,
+like an Ollama with OLLAMA_NUM_PARALLEL > 1 or several pooled hosts) and generates
+v1 daily, v1 batched and v2 plans with the response cache bypassed, once per
+--workers value. Reports wall time next to the graph's total work and critical path,
+taken from its trace.
+"""
+import argparse
+import json
+import os
+import tempfile
+
+from benchmarks.fake_ollama import FakeOllamaConfig, start_fake_ollama
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--durations", type=int, nargs="+", default=[1, 3, 7])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 3])
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    fake = start_fake_ollama(0, FakeOllamaConfig(latency_ms=args.latency_ms, tokens_per_second=args.tokens_per_second))
+    scratch = tempfile.mkdtemp(prefix="dag-bench-")
+    # Before the backend reads its config
+    os.environ["OLLAMA_BASE_URL"] = f"http://127.0.0.1:{fake.server_port}"
+    os.environ["LLM_CACHE_DIR"] = os.path.join(scratch, "llm_cache")
+
+    from backend import registry
+    from backend.workflows import dag
+
+    v1, v2 = registry.get_workflow("v1"), registry.get_workflow("v2")
+    scenarios = [
+        ("v1-daily", lambda d: v1.generate_full_lifecoach_plan("Build stamina", "80000", "Learn SQL", d, use_cache=False, mode="daily")),
+        ("v1-batched", lambda d: v1.generate_full_lifecoach_plan("Build stamina", "80000", "Learn SQL", d, use_cache=False, mode="batched")),
+        ("v2", lambda d: v2.generate_full_lifecoach_plan("Build stamina", "80000", "Learn SQL", d, use_cache=False)),
+    ]
+
+    results = []
+    for duration in args.durations:
+        for name, generate in scenarios:
+            for workers in args.workers:
+                dag.DAG_MAX_WORKERS = workers
+                generate(duration)
+                trace = dag.get_recent_traces(1)[0]
+                results.append({
+                    "scenario": name,
+                    "duration": duration,
+                    "workers": workers,
+                    "nodes": len(trace["nodes"]),
+                    "wall_seconds": trace["wall_seconds"],
+                    "work_seconds": trace["work_seconds"],
+                    "critical_path_seconds": trace["critical_path_seconds"],
+                })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'scenario':>10} {'days':>4} {'workers':>7} {'nodes':>5} {'wall s':>7} {'work s':>7} {'path s':>7}")
+    for row in results:
+        print(f"{row['scenario']:>10} {row['duration']:>4} {row['workers']:>7} {row['nodes']:>5} "
+              f"{row['wall_seconds']:>7.2f} {row['work_seconds']:>7.2f} {row['critical_path_seconds']:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Local stand-in for the Ollama HTTP API, for benchmarking without a model.
+
+    python -m benchmarks.fake_ollama [--port 11435] [--latency-ms 200] [--tokens-per-second 40]
+                                     [--response-tokens 60] [--shape auto]
+
+Implements GET /api/tags and POST /api/chat and /api/generate, streaming or not.
+Each response waits --latency-ms (time to first token), then emits --response-tokens
+tokens at --tokens-per-second. --shape picks the reply text:
+  auto         crewai "Final Answer:" format when the prompt asks for it, a JSON day map
+               when the prompt asks for <<<JSON ... JSON>>>, plain bullets otherwise
+  final-answer always the crewai format
+  plain        always plain bullets
+An empty /api/generate prompt (Ollama's preload call) returns immediately.
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+@dataclass
+class FakeOllamaConfig:
+    latency_ms: float = 200.0
+    tokens_per_second: float = 40.0
+    response_tokens: int = 60
+    shape: str = "auto"
+    model: str = "llama3"
+
+
+def _bullets(count: int) -> str:
+    words = ["Drink", "water", "walk", "20", "minutes", "review", "one", "topic", "save", "10%", "sleep", "early"]
+    text = " ".join(words[i % len(words)] for i in range(count))
+    return "• " + text
+
+
+def build_reply(prompt: str, config: FakeOllamaConfig) -> str:
+    body = _bullets(config.response_tokens)
+    if config.shape == "plain":
+        return body
+    if config.shape == "final-answer" or "Final Answer" in prompt:
+        if "<<<JSON" in prompt:
+            days = re.search(r"For each day ([\d, ]+):", prompt)
+            numbers = [d.strip() for d in days.group(1).split(",")] if days else ["1"]
+            body = "<<<JSON\n" + json.dumps({day: _bullets(config.response_tokens // len(numbers) or 1) for day in numbers}) + "\nJSON>>>"
+        return f"Thought: I now can give a great answer\nFinal Answer: {body}"
+    return body
+
+
+def _tokens(text: str):
+    return re.findall(r"\S+\s*", text)
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    config = FakeOllamaConfig()
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/api/tags":
+            self._send_json({"models": [{"name": f"{self.config.model}:latest", "model": f"{self.config.model}:latest"}]})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.path not in ("/api/chat", "/api/generate"):
+            self._send_json({"error": "not found"}, status=404)
+            return
+
+        is_chat = self.path == "/api/chat"
+        if is_chat:
+            prompt = "\n".join(m.get("content", "") for m in request.get("messages", []))
+        else:
+            prompt = request.get("prompt", "")
+            if not prompt:
+                self._send_json({"model": request.get("model"), "response": "", "done": True})
+                return
+
+        config = self.config
+        started = time.perf_counter()
+        time.sleep(config.latency_ms / 1000)
+        tokens = _tokens(build_reply(prompt, config))
+        delay = 1 / config.tokens_per_second if config.tokens_per_second > 0 else 0
+        stats = {
+            "prompt_eval_count": max(1, len(prompt) // 4),
+            "eval_count": len(tokens),
+        }
+
+        def chunk(text: str, done: bool) -> dict:
+            payload = {"model": request.get("model"), "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ"), "done": done}
+            if is_chat:
+                payload["message"] = {"role": "assistant", "content": text}
+            else:
+                payload["response"] = text
+            if done:
+                payload.update(stats, total_duration=int((time.perf_counter() - started) * 1e9))
+            return payload
+
+        if request.get("stream", True):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for token in tokens:
+                time.sleep(delay)
+                self._write_chunk(json.dumps(chunk(token, False)) + "\n")
+            self._write_chunk(json.dumps(chunk("", True)) + "\n")
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            time.sleep(delay * len(tokens))
+            self._send_json(chunk("".join(tokens), True))
+
+    def _write_chunk(self, text: str):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+def start_fake_ollama(port: int = 0, config: FakeOllamaConfig = None):
+    """
+    Start the server on a daemon thread and return it; `server.server_port` is the bound port.
+    """
+    handler = type("ConfiguredHandler", (FakeOllamaHandler,), {"config": config or FakeOllamaConfig()})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-ollama", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--response-tokens", type=int, default=60)
+    parser.add_argument("--shape", choices=["auto", "final-answer", "plain"], default="auto")
+    args = parser.parse_args()
+
+    config = FakeOllamaConfig(args.latency_ms, args.tokens_per_second, args.response_tokens, args.shape)
+    server = start_fake_ollama(args.port, config)
+    print(f"Fake Ollama listening on http://127.0.0.1:{server.server_port} ({config})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Import-time and first-use cost of the backend, measured in fresh interpreters.
+
+    python -m benchmarks.import_time_bench [--top N] [--max-import-seconds S] [--json]
+
+Reports the wall time of `import backend.main`, the slowest modules from
+`python -X importtime`, and how long the registry takes to build each lazy
+component on first use. With --max-import-seconds the exit status is 1 when the
+import exceeds the budget, so a regression fails the run.
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+IMPORT_SNIPPET = (
+    "import time, json; t = time.perf_counter(); import backend.main; "
+    "print(json.dumps({'wall_seconds': time.perf_counter() - t}))"
+)
+
+FIRST_USE_SNIPPET = (
+    "import json, backend.main; from backend import registry; "
+    "[registry.get_agent(n) for n in registry.AGENT_MODULES]; "
+    "[registry.get_workflow(v) for v in registry.WORKFLOW_MODULES]; "
+    "registry.get_memory_store(); registry.get_chat_index(); registry.get_intent_router().route('x'); "
+    "registry.get_llm(); print(json.dumps(registry.build_seconds))"
+)
+
+
+def run(snippet: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *flags, "-c", snippet],
+        capture_output=True, text=True, check=True
+    )
+
+
+def slowest_modules(stderr: str, top: int):
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return sorted(rows, key=lambda row: row[1], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--max-import-seconds", type=float)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    wall = json.loads(run(IMPORT_SNIPPET).stdout.strip().splitlines()[-1])["wall_seconds"]
+    modules = slowest_modules(run("import backend.main", "-X", "importtime").stderr, args.top)
+    first_use = json.loads(run(FIRST_USE_SNIPPET).stdout.strip().splitlines()[-1])
+
+    report = {
+        "import_seconds": round(wall, 4),
+        "slowest_modules": [{"module": m, "self_ms": s / 1000, "cumulative_ms": c / 1000} for m, s, c in modules],
+        "first_use_seconds": first_use,
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"import backend.main: {report['import_seconds']:.3f} s")
+        print("slowest modules (self time):")
+        for row in report["slowest_modules"]:
+            print(f"  {row['self_ms']:9.1f} ms  {row['module']}")
+        print("first use (registry builds):")
+        for key, seconds in first_use.items():
+            print(f"  {seconds:9.3f} s   {key}")
+
+    if args.max_import_seconds is not None and wall > args.max_import_seconds:
+        print(f"❌ import took {wall:.3f} s, budget is {args.max_import_seconds:.3f} s", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
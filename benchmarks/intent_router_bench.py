@@ -0,0 +1,157 @@
+"""
+Accuracy and latency of the intent router against the old substring keyword check.
+
+    python -m benchmarks.intent_router_bench [--repeat N]
+
+Each labeled message is routed `repeat` times; the report gives top-1 accuracy,
+how often the legacy check would have accepted the right agent, and per-message latency.
+The labeled messages are held out: none may be close to the router's SEED_EXAMPLES,
+which would measure recall of the examples rather than routing. A second set of
+off-topic messages checks that no keyword matches inside an unrelated word.
+"""
+import argparse
+import re
+import statistics
+import time
+
+from backend.utils.intent_router import SEED_EXAMPLES, intent_router
+
+# Word overlap (Jaccard) with a seed example above which a labeled message is not held out
+MAX_SEED_OVERLAP = 0.5
+
+# The keyword lists /agent-chat used before the router
+LEGACY_KEYWORDS = {
+    "health": ["workout", "diet", "exercise", "fitness", "calorie", "protein", "weight", "meal"],
+    "finance": ["budget", "income", "saving", "invest", "money", "loan", "expense", "debt"],
+    "learning": ["learn", "study", "course", "dsa", "python", "machine learning", "skills", "language"],
+    "motivation": ["motivate", "lazy", "discipline", "focus", "inspire", "consistency", "mindset"],
+}
+
+LABELED_MESSAGES = [
+    ("What's a good workout for beginners?", "health"),
+    ("How much protein do I need to build muscle?", "health"),
+    ("Give me a vegetarian meal plan for fat loss", "health"),
+    ("I want to run a 5k next month, how should I train?", "health"),
+    ("How do I fix my sleep schedule?", "health"),
+    ("Is intermittent fasting healthy?", "health"),
+    ("What stretches help with lower back pain?", "health"),
+    ("How can I lose 5 kg before my wedding?", "health"),
+    ("Which is better for me, yoga or the gym?", "health"),
+    ("What should I eat before a morning jog?", "health"),
+    ("How many rest days per week do I need?", "health"),
+    ("Can you suggest a keto breakfast?", "health"),
+    ("What part of a 60k paycheck should go to savings?", "finance"),
+    ("Is clearing my car loan early smarter than buying stocks?", "finance"),
+    ("Draft a spending plan for my first job", "finance"),
+    ("How big should my emergency fund be?", "finance"),
+    ("Is a SIP in mutual funds a good idea?", "finance"),
+    ("My rent takes half my paycheck, what can I do?", "finance"),
+    ("My monthly EMIs eat half my paycheck", "finance"),
+    ("How much should I save for retirement each month?", "finance"),
+    ("I always run out of money before month end", "finance"),
+    ("What are tax saving options in India?", "finance"),
+    ("Should I buy insurance in my twenties?", "finance"),
+    ("How do I track where my money goes?", "finance"),
+    ("How do I start learning Python?", "learning"),
+    ("Give me a DSA roadmap for interviews", "learning"),
+    ("Which online certification is worth it for deep learning?", "learning"),
+    ("Explain recursion with an example", "learning"),
+    ("How can I learn Spanish in 6 months?", "learning"),
+    ("Suggest good textbooks for linear algebra", "learning"),
+    ("How should I revise for my exams?", "learning"),
+    ("What is the best way to practice SQL?", "learning"),
+    ("Steps to switch careers into analytics", "learning"),
+    ("Is a two-hour daily study block enough to clear GATE?", "learning"),
+    ("Is JavaScript a good first programming language?", "learning"),
+    ("Which certification helps a cloud career?", "learning"),
+    ("I keep procrastinating, help", "motivation"),
+    ("Nothing I try works anymore and I want to quit", "motivation"),
+    ("How do I stay consistent with my goals?", "motivation"),
+    ("I'm too lazy to start anything", "motivation"),
+    ("How can I make journaling stick this time?", "motivation"),
+    ("Everything piles up and I freeze", "motivation"),
+    ("How can I stop getting distracted by my phone?", "motivation"),
+    ("My enthusiasm fades a week into every new plan", "motivation"),
+    ("How do I get my confidence back?", "motivation"),
+    ("I'm burned out at work, how do I keep going?", "motivation"),
+    ("Give me a push to get out of bed", "motivation"),
+    ("Ways to become more disciplined", "motivation"),
+]
+
+# Off-topic messages whose words merely start with a keyword ("ready"/"read", "father"/"fat")
+NO_KEYWORD_MESSAGES = [
+    "Are you ready?",
+    "My father called today",
+    "Can you book a table for two?",
+    "Give me an example",
+    "That is absolutely fine",
+    "The rental car is blue",
+    "Runway lights were off",
+    "A famous sipper of tea",
+]
+
+
+def _words(text: str) -> set:
+    return set(re.findall(r"\w+", text.lower()))
+
+
+def check_held_out() -> None:
+    seeds = [_words(example) for examples in SEED_EXAMPLES.values() for example in examples]
+    for message, _ in LABELED_MESSAGES:
+        words = _words(message)
+        overlap = max(len(words & seed) / len(words | seed) for seed in seeds)
+        if overlap > MAX_SEED_OVERLAP:
+            raise SystemExit(f"labeled message {message!r} is too close to a seed example ({overlap:.2f})")
+
+
+def legacy_accepts(message: str, domain: str) -> bool:
+    return any(word in message.lower() for word in LEGACY_KEYWORDS[domain])
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    check_held_out()
+    intent_router.route("warm up the classifier")
+
+    correct = 0
+    legacy_correct = 0
+    latencies = []
+    misses = []
+    for message, expected in LABELED_MESSAGES:
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            ranked = intent_router.route(message)
+            latencies.append((time.perf_counter() - start) * 1e6)
+        top = ranked[0][0] if ranked else None
+        if top == expected:
+            correct += 1
+        else:
+            misses.append((message, expected, ranked[:2]))
+        if legacy_accepts(message, expected):
+            legacy_correct += 1
+
+    spurious = [(message, hits) for message in NO_KEYWORD_MESSAGES if (hits := intent_router.keyword_hits(message))]
+
+    total = len(LABELED_MESSAGES)
+    print(f"messages:           {total} (held out from the seed examples)")
+    print(f"router top-1:       {correct}/{total} ({correct / total:.0%})")
+    print(f"legacy accepted:    {legacy_correct}/{total} ({legacy_correct / total:.0%})")
+    print(f"latency mean:       {statistics.mean(latencies):.1f} µs")
+    print(f"latency p50/p99:    {percentile(latencies, 50):.1f} / {percentile(latencies, 99):.1f} µs")
+    print(f"spurious keywords:  {len(spurious)}/{len(NO_KEYWORD_MESSAGES)} off-topic messages")
+    for message, expected, ranked in misses:
+        print(f"  miss: {message!r} expected={expected} got={ranked}")
+    for message, hits in spurious:
+        print(f"  spurious: {message!r} hits={hits}")
+
+
+if __name__ == "__main__":
+    main()
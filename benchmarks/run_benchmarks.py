@@ -0,0 +1,291 @@
+"""
+Offline throughput/latency benchmark of the backend against the fake Ollama.
+
+    python -m benchmarks.run_benchmarks [--concurrency 1 4 16] [--durations 1 3 7]
+                                        [--latency-ms 200] [--tokens-per-second 40]
+                                        [--output results.json] [--compare previous.json]
+
+Starts benchmarks.fake_ollama in-process and the backend under uvicorn in a scratch
+directory (so plans, chats and caches start empty), then drives each scenario at each
+concurrency level: /life-plan v1 and v2 for every duration, /agent-chat, and the plan
+and chat storage endpoints. LLM scenarios bypass the response cache and vary their
+inputs so every request does real (fake) generation work. Each plan request comes
+from its own user and the per-user rate limits are raised, so the scheduler queues
+requests rather than rejecting them and the numbers measure generation, not 429s.
+
+Reports p50/p95/p99 latency and requests per second over successful (2xx) responses,
+non-2xx responses by status and connection errors separately, and the backend's peak
+RSS per scenario, and writes everything as JSON. --compare prints the change in p95 and
+throughput against an earlier results file.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.fake_ollama import FakeOllamaConfig, start_fake_ollama
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Per-user limits high enough that no scenario is throttled; slot counts stay at their
+# configured values, since those are part of what is measured. Set in the environment to override.
+BENCH_SCHEDULER_ENV = {
+    "SCHEDULER_USER_TOKENS_PER_MINUTE": "100000000",
+    "SCHEDULER_MAX_QUEUED": "1024",
+    "SCHEDULER_MAX_QUEUED_PER_USER": "64",
+    "SCHEDULER_MAX_WAIT_SECONDS": "600",
+}
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def read_rss_kb(pid: int):
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+class RSSSampler:
+    """
+    Samples the backend's resident set size in the background; peak() since the last reset.
+    """
+
+    def __init__(self, pid: int, interval: float = 0.05):
+        self.pid = pid
+        self.interval = interval
+        self._peak = 0
+        self._stop = threading.Event()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = read_rss_kb(self.pid)
+            if rss:
+                self._peak = max(self._peak, rss)
+
+    def reset(self):
+        self._peak = read_rss_kb(self.pid) or 0
+
+    def peak_mb(self):
+        return round(self._peak / 1024, 1) if self._peak else None
+
+    def stop(self):
+        self._stop.set()
+
+
+def start_backend(port: int, ollama_url: str, workdir: str) -> subprocess.Popen:
+    env = {
+        **BENCH_SCHEDULER_ENV,
+        **os.environ,
+        "PYTHONPATH": REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""),
+        "OLLAMA_BASE_URL": ollama_url,
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("backend exited during startup")
+        try:
+            if requests.get(f"{base}/readyz", timeout=2).status_code == 200:
+                return process
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError("backend did not become ready within 120 s")
+
+
+def build_scenarios(durations, seed_user: str):
+    def plan(version, duration):
+        def make(i):
+            body = {
+                "goal": f"Build stamina, variant {i}",
+                "income": str(50000 + i),
+                "learning_goal": "Learn SQL",
+                "duration": duration,
+            }
+            # Without a user_id every request would share the caller's IP rate limit
+            query = f"?use_cache=false&user_id=bench-plan{i}{'&v2=true' if version == 'v2' else ''}"
+            return "POST", f"/life-plan{query}", body
+        return make
+
+    scenarios = []
+    for version in ("v1", "v2"):
+        for duration in durations:
+            scenarios.append((f"life-plan-{version}-d{duration}", True, plan(version, duration)))
+    scenarios += [
+        ("agent-chat", True, lambda i: ("POST", "/agent-chat", {
+            "user_id": f"bench{i % 8}", "agent": "health", "message": f"quick workout idea number {i}", "use_cache": False
+        })),
+        ("load-plan", False, lambda i: ("GET", f"/load-plan/{seed_user}/seed{i % 5}", None)),
+        ("load-plan-names", False, lambda i: ("GET", f"/load-plan-names/{seed_user}", None)),
+        ("update-plan", False, lambda i: ("PUT", f"/update-plan/{seed_user}/seed{i % 5}", {"finance_plan": f"• revision {i}"})),
+        ("chat-history", False, lambda i: ("GET", f"/chat-history/{seed_user}?limit=20&newest_first=true", None)),
+    ]
+    return scenarios
+
+
+def seed_storage(base: str, seed_user: str):
+    session = requests.Session()
+    for i in range(5):
+        session.post(
+            f"{base}/life-plan?user_id={seed_user}&save_name=seed{i}",
+            json={"goal": "Seed plan", "income": "60000", "learning_goal": "Learn Go", "duration": 1},
+            timeout=600
+        ).raise_for_status()
+    for i in range(20):
+        session.post(f"{base}/agent-chat", json={
+            "user_id": seed_user, "agent": "finance", "message": f"budget question {i}"
+        }, timeout=600).raise_for_status()
+
+
+def run_level(base: str, make_request, concurrency: int, total: int):
+    local = threading.local()
+    latencies, errors = [], []
+    statuses = {}
+    lock = threading.Lock()
+
+    def one(i):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        method, path, body = make_request(i)
+        start = time.perf_counter()
+        try:
+            status = session.request(method, base + path, json=body, timeout=600).status_code
+        except requests.RequestException:
+            status = None
+        elapsed = time.perf_counter() - start
+        with lock:
+            if status is None:
+                errors.append(elapsed)
+            elif 200 <= status < 300:
+                latencies.append(elapsed)
+            else:
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    wall = time.perf_counter() - started
+
+    return {
+        "requests": total,
+        "ok": len(latencies),
+        "non_2xx": dict(sorted(statuses.items())),
+        "errors": len(errors),
+        "wall_seconds": round(wall, 3),
+        "rps": round(len(latencies) / wall, 2) if wall else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+    }
+
+
+def compare(current: dict, previous_path: str):
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    before = {(r["scenario"], r["concurrency"]): r for r in previous["results"]}
+    print(f"\nChange vs {previous_path}:")
+    for row in current["results"]:
+        old = before.get((row["scenario"], row["concurrency"]))
+        if not old or not old["p95_ms"] or not row["p95_ms"] or not old["rps"] or not row["rps"]:
+            continue
+        p95 = (row["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100
+        rps = (row["rps"] - old["rps"]) / old["rps"] * 100
+        print(f"  {row['scenario']:<22} c={row['concurrency']:<3} p95 {p95:+6.1f}%  rps {rps:+6.1f}%")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--durations", type=int, nargs="+", default=[1, 3, 7])
+    parser.add_argument("--llm-requests", type=int, default=0,
+                        help="requests per LLM scenario and level (default: 2 × concurrency)")
+    parser.add_argument("--storage-requests", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--response-tokens", type=int, default=60)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--only", nargs="+", help="run only these scenario names")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare")
+    args = parser.parse_args()
+
+    fake_config = FakeOllamaConfig(args.latency_ms, args.tokens_per_second, args.response_tokens)
+    fake = start_fake_ollama(0, fake_config)
+    ollama_url = f"http://127.0.0.1:{fake.server_port}"
+    base = f"http://127.0.0.1:{args.port}"
+    seed_user = "bench-seed"
+
+    with tempfile.TemporaryDirectory(prefix="lifecoach-bench-") as workdir:
+        backend = start_backend(args.port, ollama_url, workdir)
+        sampler = RSSSampler(backend.pid)
+        results = []
+        try:
+            seed_storage(base, seed_user)
+            for name, uses_llm, make_request in build_scenarios(args.durations, seed_user):
+                if args.only and name not in args.only:
+                    continue
+                for concurrency in args.concurrency:
+                    total = (args.llm_requests or 2 * concurrency) if uses_llm else args.storage_requests
+                    sampler.reset()
+                    row = run_level(base, make_request, concurrency, total)
+                    row.update(scenario=name, concurrency=concurrency, peak_rss_mb=sampler.peak_mb())
+                    results.append(row)
+                    print(f"{name:<22} c={concurrency:<3} rps={row['rps']!s:<8} p50={row['p50_ms']!s:<8} "
+                          f"p95={row['p95_ms']!s:<8} p99={row['p99_ms']!s:<8} ok={row['ok']}/{total} "
+                          f"non2xx={row['non_2xx'] or 0} err={row['errors']} rss={row['peak_rss_mb']}MB",
+                          flush=True)
+        finally:
+            sampler.stop()
+            backend.terminate()
+            backend.wait(timeout=30)
+            fake.shutdown()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "fake_ollama": vars(fake_config),
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {args.output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Build time and query latency of the per-user BM25 search index.
+
+    python -m benchmarks.search_bench [--plans N] [--turns N] [--queries N]
+
+Indexes N synthetic plans (four sections each) and N chat turns for one user,
+then times random multi-word queries. Storage is only asked for the user's generation.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from backend.utils.search_index import PlanChatSearchIndex, _UserSearchIndex
+
+VOCABULARY = [f"word{i}" for i in range(5000)]
+SECTIONS = ("health_plan", "learning_plan", "motivation_plan", "finance_plan")
+
+
+def text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choices(VOCABULARY, k=words))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--plans", type=int, default=1000)
+    parser.add_argument("--turns", type=int, default=3000)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    user_index = _UserSearchIndex()
+    start = time.perf_counter()
+    for p in range(args.plans):
+        user_index.set_plan(f"plan-{p}", {section: text(rng, 120) for section in SECTIONS})
+    for _ in range(args.turns):
+        user_index.add_chat_turn({"user": text(rng, 15), "agent": text(rng, 60)})
+    build_seconds = time.perf_counter() - start
+
+    index = PlanChatSearchIndex(max_resident_users=1)
+    index._users["bench"] = user_index
+    latencies = []
+    for _ in range(args.queries):
+        query = text(rng, rng.randint(1, 5))
+        start = time.perf_counter()
+        index.search("bench", query, 10)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    latencies.sort()
+    print(f"documents: {len(user_index.docs)}  terms: {len(user_index.postings)}  build: {build_seconds:.2f}s")
+    print(
+        f"query ms  p50 {statistics.median(latencies):.3f}  "
+        f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.3f}  max {latencies[-1]:.3f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
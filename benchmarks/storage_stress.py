@@ -0,0 +1,135 @@
+"""
+Hammer one user's plans and chat history from many processes at once.
+
+    python -m benchmarks.storage_stress [--backend file|sqlite|both] [--processes N] [--ops N]
+
+Every process saves --ops chat turns and makes --ops read-modify-write increments
+to one shared plan (load, then update with If-Match, retrying on conflict) through
+the same storage facades the API uses. Afterwards each turn must be stored exactly
+once and intact, the plan's counter must equal processes x ops, the user's
+generation must count every write, and the parent's search index, built before
+the workers started, must find what they wrote.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+USER_ID = "stress-user"
+PLAN_NAME = "shared"
+# Longer than one write buffer, so unlocked appends from two processes could interleave
+AGENT_TEXT = "steady progress " * 600
+
+
+def configure(backend: str, root: str) -> None:
+    os.environ.update({
+        "STORAGE_BACKEND": backend,
+        "PLAN_DIR": os.path.join(root, "plans"),
+        "CHAT_DIR": os.path.join(root, "chats"),
+        "SQLITE_PATH": os.path.join(root, "lifecoach.db"),
+    })
+
+
+def worker(worker_id: int, ops: int, barrier) -> None:
+    from backend.utils.chat_storage import save_chat
+    from backend.utils.plan_storage import PlanConflictError, load_plan, make_etag, update_plan
+    from backend.utils.storage_backend import get_storage
+
+    rng = random.Random(worker_id)
+    barrier.wait()
+    for i in range(ops):
+        save_chat(USER_ID, {"user": f"marker{worker_id}x{i} how am I doing", "agent": AGENT_TEXT, "worker": worker_id, "turn": i})
+        while True:
+            plan = load_plan(USER_ID, PLAN_NAME)
+            try:
+                update_plan(USER_ID, PLAN_NAME, {**plan, "counter": str(int(plan["counter"]) + 1)}, if_match=make_etag(plan))
+                break
+            except PlanConflictError:
+                time.sleep(rng.random() / 1000)
+    # Commit anything the SQLite engine still buffers before the process exits
+    get_storage().close()
+
+
+def run(backend: str, processes: int, ops: int) -> bool:
+    from backend.utils.chat_storage import load_chat
+    from backend.utils.plan_storage import load_plan, save_plan
+    from backend.utils.search_index import search_index
+    from backend.utils.storage_backend import get_storage
+
+    save_plan(USER_ID, PLAN_NAME, {"counter": "0", "notes": "shared stress plan"})
+    search_index.search(USER_ID, "shared stress plan")
+
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(processes)
+    workers = [context.Process(target=worker, args=(w, ops, barrier)) for w in range(processes)]
+    for process in workers:
+        process.start()
+    start = time.perf_counter()
+    for process in workers:
+        process.join()
+    seconds = time.perf_counter() - start
+
+    messages = load_chat(USER_ID)
+    turns = {(m["worker"], m["turn"]) for m in messages}
+    intact = all(m["agent"] == AGENT_TEXT for m in messages)
+    counter = int(load_plan(USER_ID, PLAN_NAME)["counter"])
+    generation = get_storage().generation(USER_ID)
+    expected = processes * ops
+    rng = random.Random(0)
+    probes = [(rng.randrange(processes), rng.randrange(ops)) for _ in range(20)]
+    found = sum(
+        any(hit.get("message", {}).get("turn") == i and hit["message"]["worker"] == w
+            for hit in search_index.search(USER_ID, f"marker{w}x{i}", 5, kind="chat"))
+        for w, i in probes
+    )
+
+    checks = {
+        "chat turns stored once": len(messages) == expected and len(turns) == expected,
+        "chat turns intact": intact,
+        "plan increments kept": counter == expected,
+        "generation counts every write": generation == 1 + 2 * expected,
+        "search sees other processes' writes": found == len(probes),
+    }
+    print(
+        f"{backend}: {processes} processes x {ops} ops in {seconds:.2f}s "
+        f"({2 * expected / seconds:.0f} writes/s); {len(messages)} turns, counter {counter}, "
+        f"generation {generation}, search {found}/{len(probes)}"
+    )
+    for name, ok in checks.items():
+        print(f"  {'ok  ' if ok else 'FAIL'} {name}")
+    return all(checks.values())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backend", choices=("file", "sqlite", "both"), default="both")
+    parser.add_argument("--processes", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=50)
+    args = parser.parse_args()
+
+    backends = ("file", "sqlite") if args.backend == "both" else (args.backend,)
+    results = []
+    for backend in backends:
+        # Each engine in a fresh interpreter, since config is read once at import
+        with tempfile.TemporaryDirectory() as root:
+            configure(backend, root)
+            context = multiprocessing.get_context("spawn")
+            parent = context.Process(target=_run_and_exit, args=(backend, args.processes, args.ops))
+            parent.start()
+            parent.join()
+            results.append(parent.exitcode == 0)
+    raise SystemExit(0 if all(results) else 1)
+
+
+def _run_and_exit(backend: str, processes: int, ops: int) -> None:
+    ok = run(backend, processes, ops)
+    from backend.utils.storage_backend import get_storage
+
+    get_storage().close()
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
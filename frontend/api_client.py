@@ -0,0 +1,163 @@
+"""
+Data layer between the Streamlit page and the backend.
+
+Streamlit re-runs app.py on every interaction, so anything fetched at the top of
+the page would hit the backend on every keystroke. BackendClient keeps one pooled
+requests.Session and a small TTL cache keyed by user: plan names, plans and chat
+history are served from memory until they expire or a write through this client
+invalidates them. Expired entries that carry an ETag are revalidated with
+If-None-Match, so an unchanged plan costs a 304 instead of the full body.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
+PLAN_NAMES_TTL_SECONDS = float(os.getenv("PLAN_NAMES_TTL_SECONDS", "30"))
+PLAN_TTL_SECONDS = float(os.getenv("PLAN_TTL_SECONDS", "120"))
+CHAT_HISTORY_TTL_SECONDS = float(os.getenv("CHAT_HISTORY_TTL_SECONDS", "60"))
+
+
+class BackendClient:
+    def __init__(self, base_url: str = BACKEND_URL, pool_size: int = 10):
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # key -> (expires_at, etag, value)
+        self._cache: Dict[Tuple, Tuple[float, Optional[str], Any]] = {}
+        self._lock = threading.Lock()
+
+    # --- Cache ---
+    def _cached_get(self, key: Tuple, path: str, ttl: float, extract):
+        """
+        Serve `key` from cache while fresh; otherwise GET `path` (conditionally when an ETag is known).
+        Returns None for a 404.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry and entry[0] > now:
+                return entry[2]
+
+        headers = {"If-None-Match": entry[1]} if entry and entry[1] else {}
+        res = self.session.get(f"{self.base_url}{path}", headers=headers, timeout=30)
+        with self._lock:
+            if res.status_code == 304 and entry:
+                self._cache[key] = (now + ttl, entry[1], entry[2])
+                return entry[2]
+            if res.status_code == 404:
+                self._cache.pop(key, None)
+                return None
+            res.raise_for_status()
+            value = extract(res.json())
+            self._cache[key] = (now + ttl, res.headers.get("ETag"), value)
+            return value
+
+    def _put(self, key: Tuple, ttl: float, etag: Optional[str], value: Any) -> None:
+        with self._lock:
+            self._cache[key] = (time.monotonic() + ttl, etag, value)
+
+    def invalidate(self, *keys: Tuple) -> None:
+        with self._lock:
+            for key in keys:
+                self._cache.pop(key, None)
+
+    def _etag(self, key: Tuple) -> Optional[str]:
+        with self._lock:
+            entry = self._cache.get(key)
+            return entry[1] if entry else None
+
+    # --- Plans ---
+    def plan_names(self, user_id: str) -> List[str]:
+        return self._cached_get(
+            ("plan-names", user_id), f"/load-plan-names/{user_id}",
+            PLAN_NAMES_TTL_SECONDS, lambda body: body.get("plans", [])
+        ) or []
+
+    def plan(self, user_id: str, plan_name: str) -> Tuple[Any, Optional[str]]:
+        """
+        Returns (plan, etag), or (None, None) if the plan does not exist.
+        """
+        key = ("plan", user_id, plan_name)
+        plan = self._cached_get(key, f"/load-plan/{user_id}/{plan_name}", PLAN_TTL_SECONDS, lambda body: body["plan"])
+        return (plan, self._etag(key)) if plan is not None else (None, None)
+
+    def generate_plan(self, user_id: str, plan_name: str, body: Dict, **params) -> requests.Response:
+        res = self.session.post(
+            f"{self.base_url}/life-plan",
+            params={"save_name": plan_name, "user_id": user_id, **params},
+            json=body
+        )
+        if res.status_code == 200 and plan_name:
+            self.invalidate(("plan-names", user_id), ("plan", user_id, plan_name))
+        return res
+
+    def delete_plan(self, user_id: str, plan_name: str) -> requests.Response:
+        res = self.session.delete(f"{self.base_url}/delete-plan/{user_id}/{plan_name}", timeout=30)
+        self.invalidate(("plan-names", user_id), ("plan", user_id, plan_name))
+        return res
+
+    def daily_plan(self, user_id: str, plan_name: str) -> requests.Response:
+        """
+        Today's part of a saved plan; usually pre-generated overnight, so this returns at once.
+        """
+        return self.session.get(f"{self.base_url}/daily-plan/{user_id}/{plan_name}", timeout=300)
+
+    def patch_plan(self, user_id: str, plan_name: str, sections: Dict, etag: Optional[str]) -> requests.Response:
+        """
+        Update only `sections`. With `etag`, the backend answers 412 if the plan changed since it was read.
+        """
+        key = ("plan", user_id, plan_name)
+        res = self.session.patch(
+            f"{self.base_url}/update-plan/{user_id}/{plan_name}",
+            json=sections,
+            headers={"If-Match": etag} if etag else {},
+            timeout=30
+        )
+        if res.status_code == 200:
+            # The response carries the merged plan and its new ETag: no reload needed
+            self._put(key, PLAN_TTL_SECONDS, res.headers.get("ETag"), res.json()["plan"])
+        else:
+            self.invalidate(key)
+        return res
+
+    # --- Chat ---
+    def chat_history(self, user_id: str) -> List[Dict]:
+        return self._cached_get(
+            ("chat-history", user_id), f"/chat-history/{user_id}",
+            CHAT_HISTORY_TTL_SECONDS, lambda body: body
+        ) or []
+
+    def record_chat(self, user_id: str, entry: Dict) -> None:
+        """
+        Append a turn the backend has already stored to the cached history instead of refetching it.
+        """
+        key = ("chat-history", user_id)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached:
+                self._cache[key] = (cached[0], cached[1], cached[2] + [entry])
+
+    def stream_chat(self, body: Dict) -> requests.Response:
+        return self.session.post(f"{self.base_url}/agent-chat/stream", json=body, stream=True)
+
+    # --- Search ---
+    def search(self, user_id: str, query: str, kind: Optional[str] = None, limit: int = 10) -> List[Dict]:
+        """
+        Ranked matches across saved plan sections and chat turns; not cached.
+        """
+        params = {"q": query, "limit": limit, **({"kind": kind} if kind else {})}
+        res = self.session.get(f"{self.base_url}/search/{user_id}", params=params, timeout=30)
+        res.raise_for_status()
+        return res.json()["results"]
+
+    def clear_chat(self, user_id: str) -> requests.Response:
+        res = self.session.delete(f"{self.base_url}/clear-chat/{user_id}", timeout=30)
+        self.invalidate(("chat-history", user_id))
+        return res
@@ -1,9 +1,18 @@
 
+import json
 import streamlit as st
-import requests
+
+from api_client import BackendClient
 
 st.set_page_config(page_title="LifeCoach AI", page_icon="🧠")
 
+@st.cache_resource
+def get_api() -> BackendClient:
+    # One client (connection pool + cache) shared by every rerun and session
+    return BackendClient()
+
+api = get_api()
+
 # custom CSS
 st.markdown("""
 <style>
@@ -37,18 +46,9 @@ if not user_id:
     st.warning("Please enter your ID to proceed.")
     st.stop()
 
-# --- Load Chat History ---
-if "chat_history" not in st.session_state:
-    try:
-        res = requests.get(f"http://localhost:8000/chat-history/{user_id}")
-        st.session_state.chat_history = res.json() if res.status_code == 200 else []
-    except:
-        st.session_state.chat_history = []
-
 # --- Load Saved Plans ---
 try:
-    plans_res = requests.get(f"http://localhost:8000/load-plan-names/{user_id}")
-    saved_plans = plans_res.json().get("plans", []) if plans_res.status_code == 200 else []
+    saved_plans = api.plan_names(user_id)
 except:
     saved_plans = []
 
@@ -60,22 +60,28 @@ with st.expander("📋 Generate a Custom Life Plan", expanded=True):
         income = st.text_input("💸 Monthly Income (in ₹)", placeholder="e.g., 100000")
         learning_goal = st.text_input("📚 Learning Goal", placeholder="e.g., Learn data science with Python")
         duration = st.slider("📆 Duration (Days)", min_value=1, max_value=7, value=1)
+        # Only day-by-day plans can be followed with "📅 Today" and get the next day prepared ahead
+        style = st.radio("🧭 Plan Style", ["Coach summary", "Day by day"], horizontal=True)
         submitted = st.form_submit_button("🧠 Generate My Plan")
 
     if submitted:
         with st.spinner("Generating plan..."):
             try:
-                response = requests.post(
-                    f"http://localhost:8000/life-plan?save_name={plan_name}&user_id={user_id}&v2=true",
-                    json={
+                response = api.generate_plan(
+                    user_id,
+                    plan_name,
+                    {
                         "goal": goal,
                         "income": income,
                         "learning_goal": learning_goal,
                         "duration": duration
-                    }
+                    },
+                    v2="true" if style == "Coach summary" else "false"
                 )
                 if response.status_code == 200:
-                    plan = response.json()["plan"]
+                    # A day-by-day plan comes back as its sections, a coach summary under "plan"
+                    body = response.json()
+                    plan = body.get("plan", body)
                     st.success(f"✅ Plan '{plan_name}' generated!")
 
                     if isinstance(plan, dict):
@@ -99,14 +105,13 @@ with st.expander("📋 Generate a Custom Life Plan", expanded=True):
 with st.expander("♻️ Load, Edit or Delete a Saved Plan"):
     if saved_plans:
         selected_plan = st.selectbox("📁 Choose a saved plan:", saved_plans)
-        col1, col2, col3 = st.columns(3)
+        col1, col2, col3, col4 = st.columns(4)
 
         with col1:
             if st.button("🔁 Load"):
                 try:
-                    res = requests.get(f"http://localhost:8000/load-plan/{user_id}/{selected_plan}")
-                    if res.status_code == 200:
-                        plan = res.json()["plan"]
+                    plan, _ = api.plan(user_id, selected_plan)
+                    if plan is not None:
                         st.session_state.loaded_plan = plan
                         st.session_state.plan_display_name = selected_plan
                         st.success("✅ Plan Loaded.")
@@ -118,7 +123,7 @@ with st.expander("♻️ Load, Edit or Delete a Saved Plan"):
         with col2:
             if st.button("🗑️ Delete"):
                 try:
-                    res = requests.delete(f"http://localhost:8000/delete-plan/{user_id}/{selected_plan}")
+                    res = api.delete_plan(user_id, selected_plan)
                     if res.status_code == 200:
                         st.success("✅ Plan deleted.")
                         st.rerun()
@@ -127,14 +132,31 @@ with st.expander("♻️ Load, Edit or Delete a Saved Plan"):
                 except:
                     st.error("❌ Could not connect to backend.")
 
+        with col4:
+            if st.button("📅 Today"):
+                try:
+                    res = api.daily_plan(user_id, selected_plan)
+                    if res.status_code == 200:
+                        today = res.json()
+                        st.markdown(f"### 📅 Day {today['day']} ({today['date']})")
+                        for key, value in today["sections"].items():
+                            st.markdown(f"**{key.replace('_', ' ').title()}**\n\n{value}")
+                    elif res.status_code == 409:
+                        st.warning("Daily plans are only available for plans generated with the \"Day by day\" style.")
+                    else:
+                        st.error("❌ Could not load today's plan.")
+                except:
+                    st.error("❌ Could not connect to backend.")
+
         with col3:
             if st.button("✏️ Edit"):
                 try:
-                    res = requests.get(f"http://localhost:8000/load-plan/{user_id}/{selected_plan}")
-                    if res.status_code == 200:
+                    plan, etag = api.plan(user_id, selected_plan)
+                    if plan is not None:
                         st.session_state.edit_mode = True
                         st.session_state.plan_to_edit = selected_plan
-                        st.session_state.plan_data = res.json()["plan"]
+                        st.session_state.plan_data = plan
+                        st.session_state.plan_etag = etag
                         st.rerun()
                 except:
                     st.error("❌ Could not load for editing.")
@@ -159,15 +181,21 @@ if st.session_state.get("edit_mode", False):
             edited[key] = st.text_area(label, plan_data.get(key, ""))
 
         if st.button("💾 Save Changes"):
+            # Send only the sections that changed; If-Match rejects the save if another tab saved first
+            changed = {k: v for k, v in edited.items() if v != plan_data.get(k, "")}
             try:
-                res = requests.put(
-                    f"http://localhost:8000/update-plan/{user_id}/{st.session_state.plan_to_edit}",
-                    json=edited
+                res = api.patch_plan(
+                    user_id,
+                    st.session_state.plan_to_edit,
+                    changed,
+                    st.session_state.get("plan_etag")
                 )
                 if res.status_code == 200:
                     st.success("✅ Plan updated!")
                     st.session_state.edit_mode = False
                     st.rerun()
+                elif res.status_code == 412:
+                    st.error("❌ This plan was changed in another tab. Reload it before saving.")
                 else:
                     st.error("❌ Failed to update.")
             except:
@@ -181,20 +209,40 @@ with st.expander("💬 Talk to a Life Coach Agent"):
     if st.button("Ask Agent"):
         if user_message.strip():
             try:
-                res = requests.post("http://localhost:8000/agent-chat", json={
+                res = api.stream_chat({
                     "user_id": user_id,
                     "agent": agent_choice.lower(),
                     "message": user_message
                 })
                 if res.status_code == 200:
-                    reply = res.json()["response"]
-                    st.session_state.chat_history.append({
-                        "user": user_message,
-                        "agent": reply,
-                        "type": agent_choice
-                    })
-                    st.success(f"{agent_choice} Coach replied:")
-                    st.markdown(f"🧍‍♂️ You: `{user_message}`\n\n🤖 {agent_choice}: {reply}")
+                    st.markdown(f"🧍‍♂️ You: `{user_message}`")
+                    reply_box = st.empty()
+                    reply, done = "", None
+                    for line in res.iter_lines(decode_unicode=True):
+                        if not line or not line.startswith("data: "):
+                            continue
+                        event = json.loads(line[len("data: "):])
+                        if event["event"] == "token":
+                            reply += event["token"]
+                            reply_box.markdown(f"🤖 {agent_choice}: {reply}▌")
+                        elif event["event"] in ("done", "error"):
+                            done = event
+
+                    if done and done["event"] == "done":
+                        reply = done["response"]
+                        # The backend may hand the question to a better-suited coach
+                        coach = done.get("agent", agent_choice).title()
+                        reply_box.markdown(f"🤖 {coach}: {reply}")
+                        # Only answered turns are stored by the backend, under its own agent name
+                        if "agent" in done:
+                            api.record_chat(user_id, {
+                                "user": user_message,
+                                "agent": reply,
+                                "type": done["agent"]
+                            })
+                        st.success(f"{coach} Coach replied.")
+                    else:
+                        st.error("❌ Agent failed.")
                 else:
                     st.error("❌ Agent failed.")
             except:
@@ -202,10 +250,34 @@ with st.expander("💬 Talk to a Life Coach Agent"):
         else:
             st.warning("Enter a question first.")
 
-# --- Display Chat History ---
-if st.session_state.get("chat_history"):
+# --- Search Plans & Chats ---
+with st.expander("🔎 Search Your Plans & Chats"):
+    search_query = st.text_input("Search for", key="search_query")
+    search_kind = st.radio("In", ["Everything", "Plans", "Chats"], horizontal=True)
+
+    if search_query.strip():
+        try:
+            kind = {"Plans": "plan", "Chats": "chat"}.get(search_kind)
+            results = api.search(user_id, search_query, kind)
+            if not results:
+                st.info("No matches.")
+            for hit in results:
+                if hit["kind"] == "plan":
+                    st.markdown(f"📋 **{hit['plan']}** · {hit['section'].replace('_', ' ').title()}")
+                else:
+                    st.markdown(f"💬 **{hit['message'].get('type', 'Coach')} chat** · {hit['message'].get('user', '')}")
+                st.caption(hit["snippet"])
+        except:
+            st.error("❌ Could not connect to backend.")
+
+# --- Display Chat History (cached per user; refetched only after it expires or is cleared) ---
+try:
+    chat_history = api.chat_history(user_id)
+except:
+    chat_history = []
+if chat_history:
     with st.expander("🧾 Chat History"):
-        for chat in reversed(st.session_state.chat_history):
+        for chat in reversed(chat_history):
             st.markdown(f"🧍‍♂️ **You ({chat['type']}):** {chat['user']}")
             st.markdown(f"🤖 **{chat['type']} Coach:** {chat['agent']}")
             st.markdown("---")
@@ -213,9 +285,8 @@ if st.session_state.get("chat_history"):
 # --- Clear Chat ---
 if st.button("🗑️ Clear Chat History"):
     try:
-        res = requests.delete(f"http://localhost:8000/clear-chat/{user_id}")
+        res = api.clear_chat(user_id)
         if res.status_code == 200:
-            st.session_state.chat_history = []
             st.success("✅ Chat history cleared.")
         else:
             st.error("❌ Failed to clear.")